@@ -0,0 +1,361 @@
+import glob
+import gzip
+import json
+import os
+import re
+import threading
+import zipfile
+from bisect import bisect_left
+from models.dependency import UNKNOWN_VULNERABILITIES
+from parsing.lockfiles import normalize_python_name
+from parsing.semver_range import version_key as semver_key
+
+# OSV ecosystem names for the ecosystems the parsers report.
+OSV_ECOSYSTEMS = {'npm': 'npm', 'PyPI': 'pypi', 'Maven': 'maven'}
+
+# CycloneDX severities for the GitHub advisory database's severity labels.
+SEVERITIES = {'CRITICAL': 'critical', 'HIGH': 'high', 'MODERATE': 'medium', 'MEDIUM': 'medium', 'LOW': 'low'}
+
+PEP440_PATTERN = re.compile(
+    r'^\s*v?(?:(\d+)!)?(\d+(?:\.\d+)*)'
+    r'(?:[-_.]?(a|b|c|rc|alpha|beta|pre|preview)[-_.]?(\d*))?'
+    r'(?:-(\d+)|[-_.]?(?:post|rev|r)[-_.]?(\d*))?'
+    r'(?:[-_.]?dev[-_.]?(\d*))?'
+    r'(?:\+[a-z0-9]+(?:[-_.][a-z0-9]+)*)?\s*$',
+    re.IGNORECASE
+)
+PEP440_PRERELEASES = {'a': 0, 'alpha': 0, 'b': 1, 'beta': 1, 'c': 2, 'rc': 2, 'pre': 2, 'preview': 2}
+
+MAVEN_TOKEN_PATTERN = re.compile(r'\d+|[a-z]+', re.IGNORECASE)
+MAVEN_QUALIFIERS = {'alpha': 0, 'a': 0, 'beta': 1, 'b': 1, 'milestone': 2, 'm': 2, 'rc': 3, 'cr': 3,
+                    'snapshot': 4, 'ga': 5, 'final': 5, 'release': 5, 'sp': 6}
+MAVEN_RELEASE = (1, 5, '')
+
+# Range ends that stand for "every version": OSV's "introduced": "0" and an
+# open upper end.
+LOWEST = object()
+HIGHEST = object()
+
+
+def pep440_key(version):
+    """
+    Turn a PEP 440 version into a tuple that sorts in PEP 440 order. Local
+    version labels are ignored.
+
+    :return: Tuple key, or None if the string isn't a valid version
+    """
+    match = PEP440_PATTERN.match(version)
+    if not match:
+        return None
+    epoch, release, pre_label, pre_number, post_implicit, post_number, dev_number = match.groups()
+    release = [int(part) for part in release.split('.')]
+    while len(release) > 1 and release[-1] == 0:
+        release.pop()
+    # Optional number groups are '' when the segment is there without a number.
+    post = post_implicit if post_implicit is not None else post_number
+    dev = dev_number
+
+    if pre_label:
+        pre = (0, PEP440_PRERELEASES[pre_label.lower()], int(pre_number or 0))
+    elif post is None and dev is not None:
+        # 1.0.dev0 sorts before 1.0a1.
+        pre = (-1, 0, 0)
+    else:
+        pre = (1, 0, 0)
+    return (int(epoch or 0), tuple(release), pre, -1 if post is None else int(post or 0),
+            (1, 0) if dev is None else (0, int(dev or 0)))
+
+
+def maven_key(version):
+    """
+    Turn a Maven version into a tuple that sorts roughly like Maven's
+    ComparableVersion: numbers compare numerically and above qualifiers,
+    known qualifiers in their release order (alpha < beta < milestone < rc
+    < snapshot < release < sp), unknown ones alphabetically after them.
+    Zeros before a qualifier or at the end and trailing release qualifiers
+    don't count, so 1.0 == 1 and 1.0-alpha == 1-alpha.
+    """
+    tokens = MAVEN_TOKEN_PATTERN.findall(version)
+    if not tokens or not tokens[0].isdigit():
+        return None
+    items = []
+    for token in tokens:
+        if token.isdigit():
+            items.append((3, int(token), ''))
+        else:
+            # 1.0-alpha is 1-alpha.
+            while len(items) > 1 and items[-1] == (3, 0, ''):
+                items.pop()
+            token = token.lower()
+            rank = MAVEN_QUALIFIERS.get(token)
+            items.append((1, rank, '') if rank is not None else (2, 0, token))
+    while items and (items[-1] == MAVEN_RELEASE or items[-1] == (3, 0, '')):
+        items.pop()
+    items.append(MAVEN_RELEASE)
+    return tuple(items)
+
+
+VERSION_KEYS = {'npm': semver_key, 'pypi': pep440_key, 'maven': maven_key}
+
+
+def package_key(ecosystem, name):
+    return (ecosystem, normalize_python_name(name) if ecosystem == 'pypi' else name)
+
+
+class Advisory:
+    """
+    The parts of an OSV advisory that end up in the output.
+    """
+
+    __slots__ = ('id', 'aliases', 'summary', 'severity', 'vector')
+
+    def __init__(self, id, aliases=(), summary=None, severity=None, vector=None):
+        self.id = id
+        self.aliases = tuple(aliases)
+        self.summary = summary
+        self.severity = severity
+        self.vector = vector
+
+    @classmethod
+    def from_osv(cls, record):
+        severity = SEVERITIES.get(str((record.get('database_specific') or {}).get('severity', '')).upper())
+        vector = next((entry.get('score') for entry in record.get('severity') or []
+                       if str(entry.get('type', '')).startswith('CVSS')), None)
+        return cls(record['id'], record.get('aliases') or (), record.get('summary'), severity, vector)
+
+    @property
+    def url(self):
+        return f"https://osv.dev/vulnerability/{self.id}"
+
+
+class PackageIntervals:
+    """
+    The affected version ranges of one package, as an interval index.
+
+    The distinct range ends are sorted into ``bounds``. A version falls
+    either exactly on a bound or in the gap before one, giving
+    ``2 * len(bounds) + 1`` slots, and every slot holds the advisories that
+    cover it. A lookup is one bisect plus a list index, however many
+    advisories the package has.
+
+    The index is built on the first match and published as one (bounds,
+    slots) tuple, so threads matching against a shared index never see half
+    of it.
+    """
+
+    _freeze_lock = threading.Lock()
+
+    def __init__(self):
+        self._ranges = []
+        self._versions = {}
+        self._index = None
+
+    def add_range(self, advisory, lower, upper, upper_inclusive):
+        self._ranges.append((advisory, lower, upper, upper_inclusive))
+        self._index = None
+
+    def add_version(self, advisory, version):
+        advisories = self._versions.setdefault(version, [])
+        if advisory not in advisories:
+            advisories.append(advisory)
+
+    @staticmethod
+    def _slot(bounds, key, inclusive, end):
+        if key is LOWEST:
+            return 0
+        if key is HIGHEST:
+            return 2 * len(bounds)
+        position = 2 * bisect_left(bounds, key) + 1
+        if inclusive:
+            return position
+        return position - 1 if end else position + 1
+
+    def freeze(self):
+        bounds = sorted({key for _, lower, upper, _ in self._ranges for key in (lower, upper)
+                         if key is not LOWEST and key is not HIGHEST})
+        starts = {}
+        for advisory, lower, upper, upper_inclusive in self._ranges:
+            first = self._slot(bounds, lower, True, False)
+            last = self._slot(bounds, upper, upper_inclusive, True)
+            if first <= last:
+                starts.setdefault(first, []).append((last, advisory))
+
+        # Sweep the slots, sharing one tuple between runs of slots with the
+        # same advisories.
+        slots = []
+        active = []
+        current = ()
+        for slot in range(2 * len(bounds) + 1):
+            expired = [entry for entry in active if entry[0] < slot]
+            if slot in starts or expired:
+                active = [entry for entry in active if entry[0] >= slot] + starts.get(slot, [])
+                current = tuple(dict.fromkeys(advisory for _, advisory in active))
+            slots.append(current)
+        self._index = (bounds, slots)
+        return self
+
+    def match(self, version, key):
+        matched = self._versions.get(version, ())
+        if key is None or not self._ranges:
+            return tuple(matched)
+        index = self._index
+        if index is None:
+            with self._freeze_lock:
+                if self._index is None:
+                    self.freeze()
+                index = self._index
+        bounds, slots = index
+        position = bisect_left(bounds, key)
+        slot = 2 * position + 1 if position < len(bounds) and bounds[position] == key else 2 * position
+        in_range = slots[slot]
+        if not matched:
+            return in_range
+        return tuple(dict.fromkeys(list(matched) + list(in_range)))
+
+
+class AdvisoryIndex:
+    """
+    OSV advisories loaded from disk, indexed per package by affected version
+    interval.
+
+    Reads OSV JSON files, directories of them, the per-ecosystem ``all.zip``
+    exports from osv.dev and JSON Lines files (optionally gzipped). Only
+    npm, PyPI and Maven advisories are kept, and withdrawn ones are skipped.
+
+    Each package's intervals are frozen into a lookup table on its first
+    match, so loading only parses the advisories.
+    """
+
+    _shared = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self):
+        self.packages = {}
+        self.advisory_count = 0
+
+    @classmethod
+    def load(cls, paths):
+        index = cls()
+        for path in paths:
+            for record in read_osv(path):
+                index.add(record)
+        return index
+
+    @classmethod
+    def shared(cls, paths):
+        """
+        :return: One AdvisoryIndex per set of paths for the whole process
+        """
+        key = tuple(os.path.abspath(path) for path in paths)
+        with cls._shared_lock:
+            if key not in cls._shared:
+                cls._shared[key] = cls.load(key)
+            return cls._shared[key]
+
+    def add(self, record):
+        if record.get('withdrawn'):
+            return
+        advisory = None
+        for affected in record.get('affected') or []:
+            package = affected.get('package') or {}
+            ecosystem = OSV_ECOSYSTEMS.get(package.get('ecosystem'))
+            if ecosystem is None or not package.get('name'):
+                continue
+            if advisory is None:
+                advisory = Advisory.from_osv(record)
+                self.advisory_count += 1
+            intervals = self.packages.get(package_key(ecosystem, package['name']))
+            if intervals is None:
+                intervals = self.packages[package_key(ecosystem, package['name'])] = PackageIntervals()
+            for version in affected.get('versions') or []:
+                intervals.add_version(advisory, version)
+            version_key = VERSION_KEYS[ecosystem]
+            for affected_range in affected.get('ranges') or []:
+                if affected_range.get('type') in ('SEMVER', 'ECOSYSTEM'):
+                    self._add_range(intervals, advisory, affected_range.get('events') or [], version_key)
+
+    @staticmethod
+    def _add_range(intervals, advisory, events, version_key):
+        def key(version):
+            return LOWEST if version == '0' else version_key(version)
+
+        lower = None
+        for event in events:
+            if 'introduced' in event:
+                lower = key(event['introduced'])
+            elif lower is None:
+                continue
+            elif 'fixed' in event or 'last_affected' in event or 'limit' in event:
+                inclusive = 'last_affected' in event
+                upper = key(event.get('fixed') or event.get('last_affected') or event.get('limit'))
+                if upper is not None:
+                    intervals.add_range(advisory, lower, upper, inclusive)
+                lower = None
+        if lower is not None:
+            intervals.add_range(advisory, lower, HIGHEST, True)
+
+    def match(self, ecosystem, name, version):
+        """
+        :return: Tuple of the Advisories affecting a package version. Versions
+                 that aren't exact (ranges, "Latest", "Unknown") only match
+                 advisories that list them verbatim; ``annotate`` resolves
+                 them first.
+        """
+        intervals = self.packages.get(package_key(ecosystem, name))
+        if intervals is None or not version:
+            return ()
+        return intervals.match(version, VERSION_KEYS[ecosystem](version))
+
+    def annotate(self, dependencies, parser=None):
+        """
+        Set ``vulnerabilities`` on each Dependency as it passes through.
+
+        :param parser: The parser of the dependencies, which resolves ranges
+                       to the version they install. A package with advisories
+                       whose version can't be resolved gets UNKNOWN_VULNERABILITIES.
+        """
+        for dep in dependencies:
+            dep.vulnerabilities = self._match_dependency(dep, parser)
+            yield dep
+
+    def annotate_groups(self, groups):
+        for path, manifest_name, parser, dependencies, graph in groups:
+            yield path, manifest_name, parser, self.annotate(dependencies, parser), graph
+
+    def _match_dependency(self, dep, parser):
+        if not dep.ecosystem or package_key(dep.ecosystem, dep.name) not in self.packages:
+            return ()
+        version = parser.resolved_version(dep) if parser is not None else dep.version
+        if not version or VERSION_KEYS[dep.ecosystem](version) is None:
+            return UNKNOWN_VULNERABILITIES
+        return self.match(dep.ecosystem, dep.name, version)
+
+
+def read_osv(path):
+    """
+    Yield the OSV records in a file or directory.
+    """
+    if os.path.isdir(path):
+        for file_path in sorted(glob.glob(os.path.join(path, '**', '*.json'), recursive=True)):
+            yield from read_osv(file_path)
+    elif path.endswith('.zip'):
+        with zipfile.ZipFile(path) as archive:
+            for name in archive.namelist():
+                if name.endswith('.json'):
+                    yield from _records(json.loads(archive.read(name)))
+    elif path.endswith(('.jsonl', '.jsonl.gz')):
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        with open(path, encoding='utf-8') as f:
+            yield from _records(json.load(f))
+
+
+def _records(document):
+    if isinstance(document, list):
+        yield from document
+    else:
+        yield document
@@ -0,0 +1,158 @@
+"""
+Benchmark for matching dependencies against a large OSV advisory dump.
+
+    python -m benchmarks.advisory_bench [--advisories 120000] [--matches 200000]
+
+Writes a synthetic OSV dump spread over npm, PyPI and Maven, with several
+advisories per package and a mix of fixed, last-affected and open ranges.
+It is written both as JSON Lines and as an osv.dev-style zip of one JSON
+file per advisory. Reports the load time of each, then the match
+throughput of the interval index, next to a scan of the advisory list on
+a small sample of the same queries.
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+import zipfile
+from advisories import VERSION_KEYS, AdvisoryIndex, package_key
+
+ECOSYSTEMS = [("npm", "npm"), ("PyPI", "pypi"), ("Maven", "maven")]
+ADVISORIES_PER_PACKAGE = 4
+SCAN_SAMPLE = 50
+
+
+def package_name(ecosystem, number):
+    if ecosystem == "Maven":
+        return f"org.example{number % 997}:artifact-{number}"
+    return f"package-{number}"
+
+
+def version(rng):
+    return f"{rng.randrange(6)}.{rng.randrange(20)}.{rng.randrange(10)}"
+
+
+def synthetic_advisories(count, seed=1):
+    rng = random.Random(seed)
+    for number in range(count):
+        package = number // ADVISORIES_PER_PACKAGE
+        ecosystem = ECOSYSTEMS[package % len(ECOSYSTEMS)][0]
+        introduced = rng.choice(["0", f"{rng.randrange(4)}.0.0"])
+        end = rng.random()
+        events = [{"introduced": introduced}]
+        if end < 0.8:
+            events.append({"fixed": f"{rng.randrange(3, 6)}.{rng.randrange(20)}.{rng.randrange(10)}"})
+        elif end < 0.95:
+            events.append({"last_affected": f"{rng.randrange(3, 6)}.{rng.randrange(20)}.0"})
+        yield {
+            "id": f"GHSA-bench-{number:06d}",
+            "aliases": [f"CVE-2024-{number}"],
+            "summary": f"Synthetic advisory {number}",
+            "database_specific": {"severity": rng.choice(["LOW", "MODERATE", "HIGH", "CRITICAL"])},
+            "affected": [{
+                "package": {"ecosystem": ecosystem, "name": package_name(ecosystem, package)},
+                "ranges": [{"type": "SEMVER" if ecosystem == "npm" else "ECOSYSTEM", "events": events}],
+            }],
+        }
+
+
+def linear_scan(records, ecosystem, name, version_string):
+    """
+    Match one dependency the way a second tool would without an index:
+    walk every advisory and compare against each of its ranges.
+    """
+    key = VERSION_KEYS[ecosystem](version_string)
+    matched = []
+    for record in records:
+        for affected in record["affected"]:
+            package = affected["package"]
+            if package_key(ecosystem, name) != package_key(ecosystem, package["name"]):
+                continue
+            for affected_range in affected["ranges"]:
+                lower = upper = None
+                inclusive = False
+                for event in affected_range["events"]:
+                    if "introduced" in event:
+                        lower = None if event["introduced"] == "0" else VERSION_KEYS[ecosystem](event["introduced"])
+                    else:
+                        inclusive = "last_affected" in event
+                        upper = VERSION_KEYS[ecosystem](event.get("fixed") or event.get("last_affected"))
+                if (lower is None or lower <= key) and (upper is None or key < upper or inclusive and key == upper):
+                    matched.append(record["id"])
+    return matched
+
+
+def run(advisory_count, match_count):
+    records = list(synthetic_advisories(advisory_count))
+    rng = random.Random(2)
+    packages = advisory_count // ADVISORIES_PER_PACKAGE
+    queries = []
+    for _ in range(match_count):
+        package = rng.randrange(packages * 2)  # half of them have no advisories
+        osv_ecosystem, ecosystem = ECOSYSTEMS[package % len(ECOSYSTEMS)]
+        queries.append((ecosystem, package_name(osv_ecosystem, package), version(rng)))
+
+    with tempfile.TemporaryDirectory() as directory:
+        jsonl_path = os.path.join(directory, "advisories.jsonl")
+        with open(jsonl_path, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+        zip_path = os.path.join(directory, "all.zip")
+        with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as archive:
+            for record in records:
+                archive.writestr(f"{record['id']}.json", json.dumps(record))
+
+        start = time.perf_counter()
+        AdvisoryIndex.load([zip_path])
+        zip_time = time.perf_counter() - start
+        start = time.perf_counter()
+        index = AdvisoryIndex.load([jsonl_path])
+        jsonl_time = time.perf_counter() - start
+
+    # The first pass also freezes the intervals of every package it touches.
+    start = time.perf_counter()
+    matched = sum(1 for query in queries if index.match(*query))
+    first_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for query in queries:
+        index.match(*query)
+    warm_time = time.perf_counter() - start
+
+    sample = queries[:SCAN_SAMPLE]
+    start = time.perf_counter()
+    scanned = [linear_scan(records, *query) for query in sample]
+    scan_time = time.perf_counter() - start
+    assert all(sorted(advisory.id for advisory in index.match(*query)) == sorted(ids)
+               for query, ids in zip(sample, scanned))
+
+    return {
+        "advisories": index.advisory_count,
+        "packages": len(index.packages),
+        "load_jsonl_s": jsonl_time,
+        "load_zip_s": zip_time,
+        "matched": matched,
+        "matches_per_s_first": match_count / first_time,
+        "matches_per_s": match_count / warm_time,
+        "scan_matches_per_s": len(sample) / scan_time,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark OSV advisory matching")
+    parser.add_argument("--advisories", type=int, default=120000)
+    parser.add_argument("--matches", type=int, default=200000)
+    args = parser.parse_args()
+
+    result = run(args.advisories, args.matches)
+    print(f"advisories:        {result['advisories']} over {result['packages']} packages")
+    print(f"load (JSON Lines): {result['load_jsonl_s']:.2f} s")
+    print(f"load (all.zip):    {result['load_zip_s']:.2f} s")
+    print(f"matches:           {result['matches_per_s_first']:,.0f}/s first pass, "
+          f"{result['matches_per_s']:,.0f}/s warm ({result['matched']} of {args.matches} vulnerable)")
+    print(f"list scan:         {result['scan_matches_per_s']:,.1f}/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Memory benchmark for holding fleet results: the plain Dependency class the
+parsers used to return, the slotted Dependency and DependencyBatch.
+
+    python -m benchmarks.dependency_memory_bench [--rows 1000000] [--packages 20000]
+
+Rows are decoded from JSON one at a time, like ``--batch`` output is, so
+every row starts out with its own copies of its strings. They are spread
+over a few thousand repositories with a skewed package popularity.
+Reports the traced memory per representation and the time to dedupe
+(ecosystem, name, version) and to count rows per license. Build times
+include the tracing overhead.
+"""
+import argparse
+import json
+import random
+import time
+import tracemalloc
+from collections import Counter
+from models.batch import DependencyBatch
+from models.dependency import Dependency
+
+LICENSES = ["MIT", "Apache-2.0", "ISC", "BSD-3-Clause", "BSD-2-Clause", "GPL-3.0-only", "MPL-2.0", "Unknown"]
+ECOSYSTEMS = ["npm", "pypi", "maven"]
+ROWS_PER_REPOSITORY = 300
+
+
+class LegacyDependency:
+    def __init__(self, name, version, license):
+        self.name = name
+        self.version = version
+        self.license = license
+
+
+def synthetic_lines(count, packages, seed=1):
+    rng = random.Random(seed)
+    lines = []
+    for row in range(count):
+        package = int(packages * rng.random() ** 3)
+        ecosystem = ECOSYSTEMS[package % len(ECOSYSTEMS)]
+        lines.append(json.dumps([f"repo-{row // ROWS_PER_REPOSITORY}", ecosystem, f"package-{package}",
+                                 f"{package % 7}.{rng.randrange(4)}.0", LICENSES[package % len(LICENSES)]]))
+    return lines
+
+
+def decoded(lines):
+    # Decoding inside the measurement gives every row fresh string objects,
+    # as reading --batch output does; the ones a representation doesn't
+    # keep are freed again.
+    return (json.loads(line) for line in lines)
+
+
+def measure(build, rows):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build(rows)
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size, elapsed
+
+
+def build_legacy(rows):
+    return [(repo, LegacyDependency(name, version, license)) for repo, _, name, version, license in rows]
+
+
+def build_slotted(rows):
+    return [(repo, Dependency(name, version, license, ecosystem)) for repo, ecosystem, name, version, license in rows]
+
+
+def build_batch(rows):
+    batch = DependencyBatch()
+    for repo, ecosystem, name, version, license in rows:
+        batch.add(repo, "", "package.json", ecosystem, name, version, license)
+    return batch
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def run(row_count, packages):
+    lines = synthetic_lines(row_count, packages)
+    results = {}
+    for label, build in (("legacy", build_legacy), ("slotted", build_slotted), ("batch", build_batch)):
+        value, size, elapsed = measure(build, decoded(lines))
+        results[label] = {"bytes_per_row": size / row_count, "mb": size / 1e6, "build_s": elapsed, "value": value}
+
+    legacy = results["legacy"].pop("value")
+    _, legacy_dedupe = timed(lambda: len({(dep.name, dep.version) for _, dep in legacy}))
+    _, legacy_group = timed(lambda: Counter(dep.license for _, dep in legacy))
+    del legacy
+    results["slotted"].pop("value")
+    batch = results["batch"].pop("value")
+    unique, batch_dedupe = timed(lambda: batch.unique("ecosystem", "name", "version"))
+    _, batch_group = timed(lambda: batch.count_by("license"))
+    results["legacy"].update(dedupe_s=legacy_dedupe, group_s=legacy_group)
+    results["batch"].update(dedupe_s=batch_dedupe, group_s=batch_group, unique_rows=len(unique))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the memory use of dependency representations")
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--packages", type=int, default=20000)
+    args = parser.parse_args()
+
+    results = run(args.rows, args.packages)
+    print(f"{args.rows} rows over {args.packages} packages:")
+    for label, result in results.items():
+        line = (f"  {label:<8} {result['mb']:8.1f} MB ({result['bytes_per_row']:.0f} B/row), "
+                f"built in {result['build_s']:.2f} s")
+        if "dedupe_s" in result:
+            line += f", dedupe {result['dedupe_s'] * 1000:.0f} ms, count by license {result['group_s'] * 1000:.0f} ms"
+        print(line)
+    print(f"  {results['batch']['unique_rows']} unique (ecosystem, name, version) rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+"""
+Local stand-ins for GitHub, the npm registry, PyPI and Maven Central, for
+benchmarks and offline testing.
+
+Each service listens on its own port, so the client sees four hosts, as
+it does in production, with their own connection pools and throttles.
+Every response is delayed by ``latency`` seconds (with ``jitter`` as a
+fraction of it) and a share of requests, ``error_rate``, fails with a 503
+that the client's transport retries. Every package exists, and has a
+license unless its name starts with "unlicensed". A ``pom_share`` of
+Maven search documents has no license, so those artifacts fall back to
+their POM.
+
+``script()`` queues responses for a service's next requests, such as a
+429 with ``Retry-After`` or rate-limit headers, and the stats count the
+connections each service accepted, for testing the transport.
+
+``environment()`` gives the variables that point sbomber at the services.
+"""
+import base64
+import hashlib
+import io
+import json
+import random
+import re
+import tarfile
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+SERVICES = ("github", "npm", "pypi", "maven")
+LICENSES = ["MIT", "Apache-2.0", "ISC", "BSD-3-Clause"]
+COORDINATE_PATTERN = re.compile(r'g:"([^"]+)" AND a:"([^"]+)"')
+
+
+class FakeRepository:
+    def __init__(self, language, files):
+        self.language = language
+        self.files = files
+
+    def blob_sha(self, path):
+        content = self.files[path].encode("utf-8")
+        return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+    def tarball(self, prefix):
+        data = io.BytesIO()
+        with tarfile.open(fileobj=data, mode="w:gz") as archive:
+            for path, content in self.files.items():
+                encoded = content.encode("utf-8")
+                member = tarfile.TarInfo(f"{prefix}/{path}")
+                member.size = len(encoded)
+                archive.addfile(member, io.BytesIO(encoded))
+        return data.getvalue()
+
+
+class ServiceStats:
+    def __init__(self):
+        self.statuses = {}
+        self.latencies = []
+        self.connections = 0
+
+    def record(self, status, seconds):
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.latencies.append(seconds)
+
+
+class FakeUpstream:
+    def __init__(self, latency=0.0, jitter=0.2, error_rate=0.0, pom_share=0.2, seed=1):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.pom_share = pom_share
+        self.repositories = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._stats = {service: ServiceStats() for service in SERVICES}
+        self._scripts = {service: deque() for service in SERVICES}
+        self._servers = {}
+        self._threads = []
+
+    def add_repository(self, full_name, language, files):
+        self.repositories[full_name] = FakeRepository(language, files)
+
+    def start(self):
+        for service in SERVICES:
+            server = ThreadingHTTPServer(("127.0.0.1", 0), _handler(self, service))
+            server.daemon_threads = True
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+            self._servers[service] = server
+            self._threads.append(thread)
+        return self
+
+    def stop(self):
+        for server in self._servers.values():
+            server.shutdown()
+            server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def url(self, service):
+        host, port = self._servers[service].server_address[:2]
+        return f"http://{host}:{port}"
+
+    def environment(self):
+        return {
+            "GITHUB_API_URL": self.url("github"),
+            "SBOMBER_NPM_REGISTRY_URL": self.url("npm"),
+            "SBOMBER_PYPI_URL": self.url("pypi"),
+            "SBOMBER_MAVEN_SEARCH_URL": f"{self.url('maven')}/solrsearch/select",
+            "SBOMBER_MAVEN_REPOSITORY_URL": f"{self.url('maven')}/maven2",
+        }
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats = {service: ServiceStats() for service in SERVICES}
+
+    def stats(self):
+        """
+        :return: Dict of {"statuses": {status: count}, "latencies": [seconds],
+                 "connections": count} per service
+        """
+        with self._lock:
+            return {service: {"statuses": dict(stats.statuses), "latencies": list(stats.latencies),
+                              "connections": stats.connections}
+                    for service, stats in self._stats.items()}
+
+    def script(self, service, *responses):
+        """
+        Answer the service's next requests with ``responses``, one each, then
+        go back to normal.
+
+        :param responses: (status, headers) pairs; a status of None keeps the
+                          normal response and only adds the headers
+        """
+        with self._lock:
+            self._scripts[service].extend(responses)
+
+    def _next_scripted(self, service):
+        with self._lock:
+            return self._scripts[service].popleft() if self._scripts[service] else (None, {})
+
+    def _record(self, service, status, seconds):
+        with self._lock:
+            self._stats[service].record(status, seconds)
+
+    def _connected(self, service):
+        with self._lock:
+            self._stats[service].connections += 1
+
+    def _delay_and_fail(self):
+        with self._lock:
+            delay = self.latency * (1 + self.jitter * (2 * self._random.random() - 1))
+            failed = self._random.random() < self.error_rate
+        if delay > 0:
+            time.sleep(delay)
+        return failed
+
+    def _license(self, name):
+        if name.split(":")[-1].startswith("unlicensed"):
+            return None
+        return LICENSES[int(hashlib.md5(name.encode("utf-8")).hexdigest(), 16) % len(LICENSES)]
+
+    def _has_search_license(self, name):
+        return int(hashlib.md5(name.encode("utf-8")).hexdigest()[:8], 16) / 0xFFFFFFFF >= self.pom_share
+
+    # Service responses: (status, body), with a dict body sent as JSON.
+
+    def respond(self, service, path, query):
+        return getattr(self, f"_{service}")(path, parse_qs(query))
+
+    def _github(self, path, query):
+        parts = [unquote(part) for part in path.strip("/").split("/")]
+        if len(parts) < 3 or parts[0] != "repos":
+            return 404, None
+        repository = self.repositories.get(f"{parts[1]}/{parts[2]}")
+        if repository is None:
+            return 404, None
+        rest = parts[3:]
+        if not rest:
+            return 200, {"name": parts[2], "full_name": f"{parts[1]}/{parts[2]}", "language": repository.language,
+                         "default_branch": "main"}
+        if rest[0] == "commits":
+            return 200, {"sha": hashlib.sha1(json.dumps(repository.files, sort_keys=True).encode()).hexdigest()}
+        if rest[0] == "contents":
+            file_path = "/".join(rest[1:])
+            if file_path not in repository.files:
+                return 404, None
+            return 200, {"content": base64.b64encode(repository.files[file_path].encode("utf-8")).decode("ascii")}
+        if rest[:2] == ["git", "trees"]:
+            return 200, {"truncated": False, "tree": [{"path": file_path, "type": "blob",
+                                                        "sha": repository.blob_sha(file_path)}
+                                                       for file_path in repository.files]}
+        if rest[:2] == ["git", "blobs"]:
+            for file_path, content in repository.files.items():
+                if repository.blob_sha(file_path) == rest[2]:
+                    return 200, {"content": base64.b64encode(content.encode("utf-8")).decode("ascii")}
+        if rest[0] == "tarball":
+            return 200, repository.tarball(f"{parts[1]}-{parts[2]}-{rest[1] if len(rest) > 1 else 'main'}")
+        return 404, None
+
+    def _npm(self, path, query):
+        name = unquote(path.strip("/"))
+        versions = [f"1.0.{patch}" for patch in range(5)] + ["2.0.0"]
+        license_info = self._license(name)
+        return 200, {
+            "name": name,
+            "license": license_info,
+            "dist-tags": {"latest": "2.0.0"},
+            "versions": {version: {"license": license_info, "description": f"Benchmark package {name}",
+                                   "homepage": f"https://example.com/{name}",
+                                   "repository": {"url": f"git+https://example.com/{name}.git"},
+                                   "bugs": {"url": f"https://example.com/{name}/issues"},
+                                   "dist": self._npm_dist(name, version)}
+                         for version in versions},
+        }
+
+    def _npm_dist(self, name, version):
+        tarball = f"{name}-{version}.tgz".encode("utf-8")
+        return {"shasum": hashlib.sha1(tarball).hexdigest(),
+                "integrity": "sha512-" + base64.b64encode(hashlib.sha512(tarball).digest()).decode("ascii"),
+                "tarball": f"{self.url('npm')}/{name}/-/{name.split('/')[-1]}-{version}.tgz"}
+
+    def _pypi(self, path, query):
+        parts = path.strip("/").split("/")
+        if len(parts) < 2 or parts[0] != "pypi":
+            return 404, None
+        name = unquote(parts[1])
+        # The harness pins 1.0.0 to 1.9.0.
+        releases = {f"1.{minor}.0": [{"packagetype": "sdist",
+                                      "url": f"{self.url('pypi')}/packages/{name}-1.{minor}.0.tar.gz",
+                                      "digests": {"sha256": hashlib.sha256(f"{name}-1.{minor}.0".encode()).hexdigest()}}]
+                    for minor in range(10)}
+        return 200, {"info": {"name": name, "version": "1.9.0", "license": self._license(name),
+                              "summary": f"Benchmark package {name}", "home_page": f"https://example.com/{name}",
+                              "project_urls": {"Source": f"https://example.com/{name}.git"}},
+                     "releases": releases}
+
+    def _maven(self, path, query):
+        if path.startswith("/solrsearch"):
+            docs = []
+            for group_id, artifact_id in COORDINATE_PATTERN.findall(query.get("q", [""])[0]):
+                name = f"{group_id}:{artifact_id}"
+                doc = {"id": name, "g": group_id, "a": artifact_id, "latestVersion": "1.0.0"}
+                if self._has_search_license(name) and self._license(name):
+                    doc["license"] = [self._license(name)]
+                docs.append(doc)
+            return 200, {"response": {"numFound": len(docs), "docs": docs}}
+        if path.startswith("/maven2/") and path.endswith(".pom"):
+            parts = path[len("/maven2/"):].split("/")
+            group_id, artifact_id = ".".join(parts[:-3]), parts[-3]
+            license_info = self._license(f"{group_id}:{artifact_id}")
+            licenses = f"<licenses><license><name>{license_info}</name></license></licenses>" if license_info else ""
+            return 200, (f"<project><groupId>{group_id}</groupId><artifactId>{artifact_id}</artifactId>"
+                         f"{licenses}</project>")
+        return 404, None
+
+
+def _handler(upstream, service):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body go out in separate writes; with Nagle's algorithm
+        # on, the body waits for a delayed ACK of the headers (~40 ms).
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def setup(self):
+            super().setup()
+            upstream._connected(service)
+
+        def do_GET(self):
+            start = time.perf_counter()
+            scripted_status, headers = upstream._next_scripted(service)
+            if upstream._delay_and_fail():
+                status, body = 503, {"message": "injected failure"}
+            elif scripted_status is not None:
+                status, body = scripted_status, {"message": "scripted response"}
+            else:
+                url = urlparse(self.path)
+                status, body = upstream.respond(service, url.path, url.query)
+
+            if isinstance(body, (dict, list)):
+                data, content_type = json.dumps(body).encode("utf-8"), "application/json"
+            elif isinstance(body, bytes):
+                data, content_type = body, "application/gzip"
+            else:
+                data, content_type = (body or "").encode("utf-8"), "application/xml"
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            # Recorded before the body goes out, so a client that has read
+            # the response always finds it in the stats.
+            upstream._record(service, status, time.perf_counter() - start)
+            self.wfile.write(data)
+
+    return Handler
@@ -0,0 +1,125 @@
+"""
+Benchmark for build file scanning on large generated Gradle and Maven
+builds.
+
+    python -m benchmarks.gradle_bench [--declarations 20000] [--subprojects 500]
+
+Scans a single build.gradle with many declarations in every supported
+notation, a pom.xml of the same size and a multi-module build with many
+subprojects, and reports throughput at doubling sizes so that the scaling
+is visible. The per-line regex the parser used to run is timed on the same
+build.gradle for comparison, along with how many declarations it finds.
+"""
+import argparse
+import re
+import time
+from parsing.gradle import scan_gradle_build
+from parsing.java import JavaBuildContext, JavaParser
+from parsing.maven import scan_pom_build
+
+LEGACY_PATTERN = re.compile(r'(implementation|api|compileOnly|runtimeOnly)\s*[\'\"]([^:]+):([^:]+)(?::([^\'\"]*))?[\'\"]')
+
+NOTATIONS = [
+    "    implementation 'org.example{i}:artifact-{i}:1.{i}.0'\n",
+    "    api \"org.example{i}:artifact-{i}:$version{i}\"\n",
+    "    testImplementation('org.example{i}:artifact-{i}:2.0') {{\n        exclude group: 'commons-logging'\n    }}\n",
+    "    implementation group: 'org.example{i}',\n        name: 'artifact-{i}',\n        version: '3.{i}'\n",
+    "    kapt platform(\"org.example{i}:bom-{i}:4.0\")\n",
+    "    runtimeOnly libs.example{i}  // from the catalog\n",
+]
+
+
+def generate_gradle_build(declarations):
+    lines = ["ext {\n"]
+    lines += [f"    version{i} = '5.{i}'\n" for i in range(1, declarations, len(NOTATIONS))]
+    lines.append("}\n\ndependencies {\n")
+    lines += [NOTATIONS[i % len(NOTATIONS)].format(i=i) for i in range(declarations)]
+    lines.append("}\n")
+    return "".join(lines)
+
+
+def generate_pom(declarations):
+    parts = ["<project xmlns=\"http://maven.apache.org/POM/4.0.0\">\n  <properties>\n"]
+    parts += [f"    <example{i}.version>1.{i}</example{i}.version>\n" for i in range(declarations)]
+    parts.append("  </properties>\n  <dependencies>\n")
+    parts += [f"    <dependency><groupId>org.example{i}</groupId><artifactId>artifact-{i}</artifactId>"
+              f"<version>${{example{i}.version}}</version></dependency>\n" for i in range(declarations)]
+    parts.append("  </dependencies>\n</project>\n")
+    return "".join(parts)
+
+
+def generate_multi_module(subprojects, declarations_per_project):
+    manifests = {"build.gradle": "ext { sharedVersion = '1.0' }\n"}
+    for project in range(subprojects):
+        body = "".join(f"    implementation \"org.module{project}:artifact-{i}:$sharedVersion\"\n"
+                       for i in range(declarations_per_project))
+        manifests[f"modules/module-{project}/build.gradle"] = f"dependencies {{\n{body}}}\n"
+    return manifests
+
+
+def legacy_scan(content):
+    return [match.groups() for line in content.split('\n') for match in [LEGACY_PATTERN.search(line)] if match]
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def scan_modules(manifests):
+    parser = JavaParser()
+    context = JavaBuildContext.from_manifests(manifests)
+    declarations = 0
+    for path in sorted(manifests, key=lambda path: path.count('/')):
+        directory = path.rpartition('/')[0]
+        declarations += len(context.scan(parser, directory, manifests[path]).declarations)
+    return declarations
+
+
+def run(declarations, subprojects):
+    results = []
+    for size in (declarations // 4, declarations // 2, declarations):
+        gradle = generate_gradle_build(size)
+        scan, gradle_time = timed(scan_gradle_build, gradle)
+        legacy, legacy_time = timed(legacy_scan, gradle)
+        pom_scan, pom_time = timed(scan_pom_build, generate_pom(size))
+        results.append({
+            "declarations": size,
+            "gradle_bytes": len(gradle),
+            "gradle_ms": gradle_time * 1000,
+            "gradle_found": len(scan.declarations),
+            "legacy_ms": legacy_time * 1000,
+            "legacy_found": len(legacy),
+            "pom_ms": pom_time * 1000,
+            "pom_found": len(pom_scan.declarations),
+        })
+
+    modules = []
+    for size in (subprojects // 4, subprojects // 2, subprojects):
+        found, module_time = timed(scan_modules, generate_multi_module(size, 20))
+        modules.append({"subprojects": size, "declarations": found, "ms": module_time * 1000})
+    return {"single_file": results, "multi_module": modules}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Gradle and Maven build file scanning")
+    parser.add_argument("--declarations", type=int, default=20000)
+    parser.add_argument("--subprojects", type=int, default=500)
+    args = parser.parse_args()
+
+    result = run(args.declarations, args.subprojects)
+    print("single build file (catalog references stay unresolved without a catalog):")
+    for row in result["single_file"]:
+        print(f"  {row['declarations']:>7} declarations, {row['gradle_bytes'] / 1024:.0f} KiB: "
+              f"gradle {row['gradle_ms']:.1f} ms ({row['gradle_found']} found, "
+              f"{row['declarations'] / row['gradle_ms'] * 1000:.0f}/s), "
+              f"per-line regex {row['legacy_ms']:.1f} ms ({row['legacy_found']} found), "
+              f"pom.xml {row['pom_ms']:.1f} ms ({row['pom_found']} found)")
+    print("multi-module build, 20 declarations per subproject:")
+    for row in result["multi_module"]:
+        print(f"  {row['subprojects']:>7} subprojects: {row['ms']:.1f} ms ({row['declarations']} declarations)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""
+End-to-end benchmark suite against local stand-ins for GitHub and the
+registries.
+
+    python -m benchmarks.harness [--sizes 10 1000 10000] [--ecosystems npm pypi maven]
+                                 [--modes main parser] [--repeat 3]
+                                 [--latency-ms 10] [--error-rate 0.0]
+                                 [--output results.json] [--compare baseline.json]
+
+For every ecosystem and size it generates a synthetic project: a
+package.json, a requirements.txt, or a build.gradle with a
+gradle.lockfile. It then serves the project and every package in it from
+FakeUpstream. Each scenario runs ``--repeat`` times as a fresh
+subprocess with the metadata cache disabled, so runs don't warm each
+other up. There are two modes:
+
+- ``main``: ``python main.py <repo> -o json``, from the GitHub calls to
+  the serialized output.
+- ``parser``: the ecosystem's parser on its own, fed the manifest from
+  disk.
+
+The results are JSON: wall time p50/p99 per scenario, dependencies per
+second, peak RSS of the subprocess, request counts per service and
+status, and the p50/p99 of the server-side request latency, which
+includes the injected latency. ``--compare`` prints the change in each of
+these against an earlier results file.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from benchmarks.fake_upstream import FakeUpstream
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FORMAT_VERSION = 1
+LANGUAGES = {"npm": "JavaScript", "pypi": "Python", "maven": "Java"}
+
+
+def generate_project(ecosystem, size):
+    """
+    :return: Dict mapping file names to contents
+    """
+    if ecosystem == "npm":
+        dependencies = {f"bench-package-{number}": f"^1.0.{number % 5}" for number in range(size)}
+        return {"package.json": json.dumps({"name": "bench", "version": "1.0.0", "dependencies": dependencies},
+                                           indent=2)}
+    if ecosystem == "pypi":
+        return {"requirements.txt": "".join(f"bench-package-{number}==1.{number % 10}.0\n" for number in range(size))}
+    lines = [f"    implementation 'org.bench{number % 50}:artifact-{number}:1.{number % 10}.0'\n"
+             for number in range(size)]
+    lockfile = [f"org.bench{number % 50}:artifact-{number}:1.{number % 10}.1=compileClasspath,runtimeClasspath\n"
+                for number in range(size)]
+    return {
+        "build.gradle": "plugins {\n    id 'java'\n}\n\ndependencies {\n" + "".join(lines) + "}\n",
+        "gradle.lockfile": "# Generated for benchmarking\n" + "".join(lockfile) + "empty=\n",
+    }
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def run_child(command, environment):
+    """
+    Run a subprocess to completion.
+
+    :return: Tuple of (stdout, wall seconds, peak RSS in MB)
+    """
+    start = time.perf_counter()
+    process = subprocess.Popen(command, cwd=ROOT, env=environment, stdout=subprocess.PIPE,
+                               stderr=subprocess.DEVNULL)
+    output = process.stdout.read()
+    process.stdout.close()
+    # wait4 gives the resource usage of this child alone.
+    _, status, usage = os.wait4(process.pid, 0)
+    elapsed = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode != 0:
+        raise RuntimeError(f"{' '.join(command)} exited with {process.returncode}")
+    peak_rss = usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    return output.decode("utf-8"), elapsed, peak_rss
+
+
+def count_dependencies(output):
+    # main.py prints progress lines before the JSON document.
+    document = output[output.index("\n[") + 1:] if not output.startswith("[") else output
+    return len(json.loads(document))
+
+
+def run_scenario(upstream, mode, ecosystem, size, repeat, directory):
+    files = generate_project(ecosystem, size)
+    repo = f"bench/{ecosystem}-{size}"
+    upstream.add_repository(repo, LANGUAGES[ecosystem], files)
+
+    environment = dict(os.environ, GITHUB_TOKEN="benchmark", **upstream.environment())
+    if mode == "main":
+        command = [sys.executable, "main.py", f"https://github.com/{repo}", "-o", "json", "--no-cache"]
+    else:
+        paths = []
+        for name, content in files.items():
+            path = os.path.join(directory, f"{ecosystem}-{size}-{name}")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(content)
+            paths.append(path)
+        command = [sys.executable, "-m", "benchmarks.harness", "--run-parser", ecosystem] + paths
+
+    runs = []
+    statuses = {}
+    latencies = []
+    for _ in range(repeat):
+        upstream.reset_stats()
+        output, elapsed, peak_rss = run_child(command, environment)
+        found = count_dependencies(output)
+        stats = upstream.stats()
+        requests = {service: values["statuses"] for service, values in stats.items() if values["statuses"]}
+        for service, counts in requests.items():
+            service_counts = statuses.setdefault(service, {})
+            for status, count in counts.items():
+                service_counts[str(status)] = service_counts.get(str(status), 0) + count
+        latencies += [seconds for values in stats.values() for seconds in values["latencies"]]
+        runs.append({"wall_s": elapsed, "peak_rss_mb": peak_rss, "dependencies": found,
+                     "requests": sum(sum(counts.values()) for counts in requests.values())})
+
+    walls = [run["wall_s"] for run in runs]
+    return {
+        "scenario": f"{mode}/{ecosystem}/{size}",
+        "mode": mode,
+        "ecosystem": ecosystem,
+        "size": size,
+        "runs": runs,
+        "wall_s": {"p50": percentile(walls, 0.5), "p99": percentile(walls, 0.99), "min": min(walls)},
+        "dependencies_per_s": runs[0]["dependencies"] / percentile(walls, 0.5),
+        "peak_rss_mb": max(run["peak_rss_mb"] for run in runs),
+        "requests_per_run": {service: {status: count / repeat for status, count in counts.items()}
+                             for service, counts in statuses.items()},
+        "request_latency_ms": {"p50": (percentile(latencies, 0.5) or 0) * 1000,
+                               "p99": (percentile(latencies, 0.99) or 0) * 1000},
+    }
+
+
+def run_parser(ecosystem, paths):
+    """
+    Child side of the parser mode: parse the manifest with the ecosystem's
+    parser and print the dependencies as JSON.
+    """
+    from client import RegistryClient
+    from main import get_parser
+
+    contents = {}
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            contents[path.rsplit("-", 1)[-1]] = f.read()
+    parser = get_parser(LANGUAGES[ecosystem], client=RegistryClient())
+    if ecosystem == "maven":
+        dependencies = parser.parse_dependencies(contents["build.gradle"], contents["gradle.lockfile"])
+    else:
+        dependencies = parser.parse_dependencies(contents[parser.get_dependency_file_name()])
+    parser.resolver.shutdown()
+    print(json.dumps([dep.to_dict() for dep in dependencies]))
+
+
+def run(args):
+    results = []
+    with FakeUpstream(latency=args.latency_ms / 1000, error_rate=args.error_rate) as upstream, \
+            tempfile.TemporaryDirectory() as directory:
+        for mode in args.modes:
+            for ecosystem in args.ecosystems:
+                for size in args.sizes:
+                    result = run_scenario(upstream, mode, ecosystem, size, args.repeat, directory)
+                    print(f"{result['scenario']:<20} p50 {result['wall_s']['p50']:7.2f} s, "
+                          f"{result['dependencies_per_s']:9.1f} deps/s, {result['peak_rss_mb']:6.1f} MB, "
+                          f"{sum(sum(counts.values()) for counts in result['requests_per_run'].values()):7.0f} "
+                          f"requests/run", file=sys.stderr)
+                    results.append(result)
+    return {
+        "format_version": FORMAT_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {"latency_ms": args.latency_ms, "error_rate": args.error_rate, "repeat": args.repeat},
+        "results": results,
+    }
+
+
+def compare(baseline, current):
+    """
+    :return: Lines describing the change of every scenario present in both
+    """
+    previous = {result["scenario"]: result for result in baseline["results"]}
+    lines = []
+    if baseline.get("config") != current.get("config"):
+        lines.append(f"note: configs differ, baseline {baseline.get('config')} vs {current.get('config')}")
+
+    def change(old, new):
+        return f"{old:.2f} -> {new:.2f} ({(new - old) / old * 100:+.1f}%)" if old else f"{old} -> {new}"
+
+    for result in current["results"]:
+        old = previous.get(result["scenario"])
+        if old is None:
+            continue
+        old_requests = sum(sum(counts.values()) for counts in old["requests_per_run"].values())
+        new_requests = sum(sum(counts.values()) for counts in result["requests_per_run"].values())
+        lines.append(f"{result['scenario']}: wall p50 {change(old['wall_s']['p50'], result['wall_s']['p50'])} s, "
+                     f"peak RSS {change(old['peak_rss_mb'], result['peak_rss_mb'])} MB, "
+                     f"requests {change(old_requests, new_requests)}")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the end-to-end benchmark suite")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 10000])
+    parser.add_argument("--ecosystems", nargs="+", choices=list(LANGUAGES), default=list(LANGUAGES))
+    parser.add_argument("--modes", nargs="+", choices=["main", "parser"], default=["main", "parser"])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--latency-ms", type=float, default=10.0, help="Latency added to every upstream response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of upstream requests that fail with 503")
+    parser.add_argument("--output", metavar="FILE", help="Write the results here instead of stdout")
+    parser.add_argument("--compare", metavar="FILE", help="Print the change against an earlier results file")
+    parser.add_argument("--run-parser", nargs="+", metavar="ARG", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_parser:
+        run_parser(args.run_parser[0], args.run_parser[1:])
+        return
+
+    results = run(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        for line in compare(baseline, results):
+            print(line, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
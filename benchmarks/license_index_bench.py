@@ -0,0 +1,100 @@
+"""
+Benchmark for the offline license index on millions of records.
+
+    python -m benchmarks.license_index_bench [--records 2000000] [--lookups 200000]
+
+Builds an index from a synthetic snapshot spread over npm, PyPI and Maven,
+then reports the build time, file size, time to open (which should not
+depend on the record count) and lookup throughput for hits, package-level
+fallbacks and misses.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from license_index import LicenseIndex, build_license_index
+
+LICENSES = ["MIT", "Apache-2.0", "ISC", "BSD-3-Clause", "BSD-2-Clause", "GPL-3.0-only", "MPL-2.0", "Unlicense"]
+VERSIONS_PER_PACKAGE = 10
+
+
+def package_name(ecosystem, number):
+    if ecosystem == "maven":
+        return f"org.example{number % 997}:artifact-{number}"
+    return f"package-{number}"
+
+
+def synthetic_records(count, seed=1):
+    rng = random.Random(seed)
+    ecosystems = ("npm", "pypi", "maven")
+    for number in range(count // VERSIONS_PER_PACKAGE):
+        ecosystem = ecosystems[number % len(ecosystems)]
+        name = package_name(ecosystem, number)
+        license_info = rng.choice(LICENSES)
+        for version in range(VERSIONS_PER_PACKAGE):
+            yield ecosystem, name, f"{version // 5}.{version % 5}.0", license_info
+
+
+def run(record_count, lookup_count):
+    rng = random.Random(2)
+    packages = record_count // VERSIONS_PER_PACKAGE
+    ecosystems = ("npm", "pypi", "maven")
+
+    def sample(number):
+        ecosystem = ecosystems[number % len(ecosystems)]
+        return ecosystem, package_name(ecosystem, number)
+
+    hits = [sample(rng.randrange(packages)) + (f"{rng.randrange(2)}.{rng.randrange(5)}.0",)
+            for _ in range(lookup_count)]
+    fallbacks = [sample(rng.randrange(packages)) + ("9.9.9",) for _ in range(lookup_count)]
+    misses = [("npm", f"missing-{number}", "1.0.0") for number in range(lookup_count)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "licenses.idx")
+        start = time.perf_counter()
+        written = build_license_index(synthetic_records(record_count), path)
+        build_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        index = LicenseIndex(path)
+        open_time = time.perf_counter() - start
+
+        timings = {}
+        for label, queries in (("hit", hits), ("fallback", fallbacks), ("miss", misses)):
+            start = time.perf_counter()
+            for ecosystem, name, version in queries:
+                index.get(ecosystem, name, version)
+            timings[label] = time.perf_counter() - start
+        assert all(index.get(*query) is not None for query in hits[:1000])
+        assert all(index.get(*query) is None for query in misses[:1000])
+
+        size = os.path.getsize(path)
+        index.close()
+
+    return {
+        "records": written,
+        "build_s": build_time,
+        "file_mb": size / 1e6,
+        "open_ms": open_time * 1000,
+        "lookups_per_s": {label: lookup_count / seconds for label, seconds in timings.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the offline license index")
+    parser.add_argument("--records", type=int, default=2000000)
+    parser.add_argument("--lookups", type=int, default=200000)
+    args = parser.parse_args()
+
+    result = run(args.records, args.lookups)
+    print(f"records:           {result['records']} (including package-level records)")
+    print(f"build:             {result['build_s']:.1f} s")
+    print(f"file size:         {result['file_mb']:.1f} MB")
+    print(f"open:              {result['open_ms']:.2f} ms")
+    for label, rate in result["lookups_per_s"].items():
+        print(f"{label + ' lookups:':<19}{rate:,.0f}/s")
+
+
+if __name__ == "__main__":
+    main()
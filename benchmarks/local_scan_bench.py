@@ -0,0 +1,106 @@
+"""
+Benchmark for finding manifests in a large local checkout.
+
+    python -m benchmarks.local_scan_bench [--files 200000] [--workers 16]
+
+Generates a monorepo of the given size in a temporary directory. Most of
+its files are sources, with a package.json or requirements.txt per
+package, and a third of the files sit in node_modules and build
+directories. Times LocalRepository's parallel scandir walk against a
+sequential os.walk that doesn't prune, and checks that both find the same
+manifests outside the pruned directories. Run it twice to see the effect
+of a warm page cache.
+"""
+import argparse
+import os
+import tempfile
+import time
+from local import PRUNED_DIRECTORIES, LocalRepository
+
+FILES_PER_PACKAGE = 50
+MANIFESTS = ["package.json", "requirements.txt", "build.gradle", "pom.xml", "gradle.lockfile"]
+
+
+def generate_monorepo(root, file_count):
+    """
+    :return: Number of files written
+    """
+    written = 0
+    package = 0
+    while written < file_count:
+        group = f"group-{package % 40}"
+        directory = os.path.join(root, "packages", group, f"package-{package}")
+        os.makedirs(os.path.join(directory, "src"), exist_ok=True)
+        if package % 2:
+            manifest = ("package.json", '{"dependencies": {"lodash": "^4.17.21"}}\n')
+        else:
+            manifest = ("requirements.txt", "requests==2.31.0\n")
+        with open(os.path.join(directory, manifest[0]), "w") as f:
+            f.write(manifest[1])
+        for number in range(FILES_PER_PACKAGE * 2 // 3):
+            with open(os.path.join(directory, "src", f"module_{number}.py"), "w") as f:
+                f.write("pass\n")
+        # Installed packages and build output, which the walk must not enter.
+        pruned = os.path.join(directory, "node_modules" if package % 2 else "build", "dep")
+        os.makedirs(pruned, exist_ok=True)
+        with open(os.path.join(pruned, "package.json"), "w") as f:
+            f.write("{}\n")
+        for number in range(FILES_PER_PACKAGE // 3 - 1):
+            with open(os.path.join(pruned, f"file_{number}.js"), "w") as f:
+                f.write("\n")
+        written += FILES_PER_PACKAGE
+        package += 1
+    return written
+
+
+def sequential_walk(root):
+    found = {}
+    for directory, _, files in os.walk(root):
+        for name in files:
+            if name in MANIFESTS:
+                path = os.path.relpath(os.path.join(directory, name), root).replace(os.sep, "/")
+                with open(os.path.join(directory, name), encoding="utf-8") as f:
+                    found[path] = f.read()
+    return found
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def run(file_count, workers):
+    with tempfile.TemporaryDirectory() as root:
+        written, generate_time = timed(generate_monorepo, root, file_count)
+        sequential, sequential_time = timed(sequential_walk, root)
+        parallel, parallel_time = timed(LocalRepository(root, workers=workers).walk, MANIFESTS)
+
+    expected = {path for path in sequential
+                if not any(part in PRUNED_DIRECTORIES for part in path.split("/")[:-1])}
+    assert set(parallel) == expected
+    return {
+        "files": written,
+        "generate_s": generate_time,
+        "sequential_s": sequential_time,
+        "sequential_found": len(sequential),
+        "parallel_s": parallel_time,
+        "parallel_found": len(parallel),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark scanning a local checkout for manifests")
+    parser.add_argument("--files", type=int, default=200000)
+    parser.add_argument("--workers", type=int, default=16)
+    args = parser.parse_args()
+
+    result = run(args.files, args.workers)
+    print(f"monorepo:        {result['files']} files (generated in {result['generate_s']:.1f} s)")
+    print(f"os.walk:         {result['sequential_s']:.2f} s ({result['sequential_found']} manifests, no pruning)")
+    print(f"LocalRepository: {result['parallel_s']:.2f} s ({result['parallel_found']} manifests, "
+          f"{args.workers} workers)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Benchmark for start-up time and CycloneDX generation per ecosystem.
+
+    python -m benchmarks.sbom_bench [--size 1000] [--repeat 5] [--ecosystems npm pypi maven]
+
+Start-up: for each ecosystem a fresh interpreter imports ``main`` and
+builds that ecosystem's parser. It reports the time that took and which
+of the other ecosystems' modules were loaded on the way, which should be
+none: a Python scan doesn't need the npm parser or the semver matcher.
+
+Throughput: for each ecosystem a repository of ``--size`` dependencies is
+analysed against FakeUpstream, with no metadata cache. The first pass
+resolves the licenses and writes the SBOM, fetching the registry metadata;
+the next ``--repeat`` passes write the SBOM again from what the parsers
+kept in memory, and give the components per second of the SBOM builder.
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import time
+from benchmarks.fake_upstream import FakeUpstream
+from benchmarks.harness import LANGUAGES, generate_project, percentile, run_child
+
+# Modules only some ecosystems need, and the ecosystems that need them.
+ECOSYSTEM_MODULES = {
+    "parsing.javascript": {"npm"},
+    "parsing.packument": {"npm"},
+    "parsing.semver_range": {"npm"},
+    "parsing.java": {"maven"},
+    "parsing.gradle": {"maven"},
+    "parsing.maven": {"maven"},
+    "parsing.python": {"pypi"},
+}
+
+
+def run_startup(ecosystem):
+    """
+    Child side of the start-up measurement.
+    """
+    start = time.perf_counter()
+    from main import get_parser
+    get_parser(LANGUAGES[ecosystem])
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"import_s": elapsed, "loaded": sorted(name for name in ECOSYSTEM_MODULES
+                                                            if name in sys.modules)}))
+
+
+def startup(ecosystem, repeat):
+    timings = []
+    for _ in range(repeat):
+        output, elapsed, _ = run_child([sys.executable, "-m", "benchmarks.sbom_bench", "--run-startup", ecosystem],
+                                       dict(os.environ))
+        result = json.loads(output)
+        timings.append(result["import_s"])
+    unexpected = [name for name in result["loaded"] if ecosystem not in ECOSYSTEM_MODULES[name]]
+    return {"ecosystem": ecosystem, "import_ms": {"p50": percentile(timings, 0.5) * 1000,
+                                                  "min": min(timings) * 1000},
+            "loaded": result["loaded"], "unexpected": unexpected}
+
+
+def throughput(upstream, ecosystem, size, repeat):
+    from github import GitHubAPI
+    from main import analyze_repository, close_services, create_services, parse_arguments
+    from output import create_sink
+
+    repo = f"bench/sbom-{ecosystem}-{size}"
+    upstream.add_repository(repo, LANGUAGES[ecosystem], generate_project(ecosystem, size))
+    args = parse_arguments([f"https://github.com/{repo}", "-o", "cyclonedx", "--no-cache"])
+    cache, transport, client, resolver = create_services(args)
+    try:
+        upstream.reset_stats()
+        start = time.perf_counter()
+        repo_info, groups = analyze_repository(args.repo_url, args, GitHubAPI("benchmark", client), resolver, client)
+        groups = [(path, manifest, parser, list(dependencies), graph)
+                  for path, manifest, parser, dependencies, graph in groups]
+        out = io.StringIO()
+        create_sink("cyclonedx", out).write_groups(repo_info, groups)
+        cold = time.perf_counter() - start
+        requests_made = sum(sum(stats["statuses"].values()) for stats in upstream.stats().values())
+        bom = json.loads(out.getvalue())
+
+        upstream.reset_stats()
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            create_sink("cyclonedx", io.StringIO()).write_groups(repo_info, groups)
+            timings.append(time.perf_counter() - start)
+        warm_requests = sum(sum(stats["statuses"].values()) for stats in upstream.stats().values())
+    finally:
+        close_services(cache, transport, client, resolver)
+
+    components = bom["components"]
+    return {
+        "ecosystem": ecosystem,
+        "components": len(components),
+        "with_hashes": sum(1 for component in components if component.get("hashes")),
+        "with_licenses": sum(1 for component in components if component.get("licenses")),
+        "cold_s": cold,
+        "cold_requests": requests_made,
+        "warm_requests": warm_requests,
+        "components_per_s": len(components) / percentile(timings, 0.5),
+    }
+
+
+def run(ecosystems, size, repeat, latency):
+    startups = [startup(ecosystem, repeat) for ecosystem in ecosystems]
+    with FakeUpstream(latency=latency) as upstream:
+        # The parsers read their registry URLs when they are imported.
+        os.environ.update(upstream.environment(), GITHUB_TOKEN="benchmark")
+        throughputs = [throughput(upstream, ecosystem, size, repeat) for ecosystem in ecosystems]
+    return startups, throughputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark start-up and CycloneDX generation per ecosystem")
+    parser.add_argument("--ecosystems", nargs="+", choices=list(LANGUAGES), default=list(LANGUAGES))
+    parser.add_argument("--size", type=int, default=1000, help="Dependencies per repository")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--run-startup", choices=list(LANGUAGES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_startup:
+        run_startup(args.run_startup)
+        return
+
+    startups, throughputs = run(args.ecosystems, args.size, args.repeat, args.latency_ms / 1000)
+    for result in startups:
+        print(f"start-up {result['ecosystem']:<6} {result['import_ms']['p50']:.1f} ms "
+              f"(min {result['import_ms']['min']:.1f}), loaded {', '.join(result['loaded']) or 'nothing'}"
+              + (f", UNEXPECTED: {', '.join(result['unexpected'])}" if result["unexpected"] else ""))
+    for result in throughputs:
+        print(f"sbom     {result['ecosystem']:<6} {result['components']} components "
+              f"({result['with_hashes']} with hashes, {result['with_licenses']} with licenses), "
+              f"cold {result['cold_s']:.2f} s with {result['cold_requests']} requests, "
+              f"warm {result['components_per_s']:.0f} components/s with {result['warm_requests']} requests")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Micro-benchmark for npm range matching on a packument with thousands of
+published versions.
+
+    python -m benchmarks.semver_bench [--versions 3500] [--rounds 200]
+
+Compares a linear scan (parse and test every version, then take the max,
+which is what fetch_npm_package_info used to do) against the sorted
+VersionIndex with bisect lookups.
+"""
+import argparse
+import random
+import time
+from parsing.semver_range import VersionIndex, VersionRange, version_key
+
+RANGES = ["^1.2.3", "~4.5.0", ">=2.0.0 <3.0.0", "1.x || 7.x", "3.1.0 - 5.2", "*", "^0.3.1", ">=9.0.0-rc.0 <9.0.0"]
+
+
+def synthetic_versions(count, seed=1):
+    rng = random.Random(seed)
+    versions = set()
+    while len(versions) < count:
+        version = f"{rng.randint(0, 10)}.{rng.randint(0, 30)}.{rng.randint(0, 40)}"
+        if rng.random() < 0.15:
+            version += rng.choice(["-alpha", "-beta", "-rc"]) + f".{rng.randint(0, 9)}"
+        versions.add(version)
+    versions = list(versions)
+    rng.shuffle(versions)
+    return versions
+
+
+def linear_scan(versions, range_str):
+    version_range = VersionRange(range_str)
+    matching = [version for version in versions if version_range.satisfies(version)]
+    return max(matching, key=version_key) if matching else None
+
+
+def run(version_count, rounds):
+    versions = synthetic_versions(version_count)
+
+    start = time.perf_counter()
+    index = VersionIndex(versions)
+    build_time = time.perf_counter() - start
+
+    for range_str in RANGES:
+        assert index.max_satisfying(range_str) == linear_scan(versions, range_str), range_str
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for range_str in RANGES:
+            linear_scan(versions, range_str)
+    scan_time = (time.perf_counter() - start) / (rounds * len(RANGES))
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for range_str in RANGES:
+            index.max_satisfying(range_str)
+    indexed_time = (time.perf_counter() - start) / (rounds * len(RANGES))
+
+    return {
+        "versions": len(versions),
+        "index_build_ms": build_time * 1000,
+        "linear_scan_us": scan_time * 1e6,
+        "indexed_us": indexed_time * 1e6,
+        "speedup": scan_time / indexed_time,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark npm version range matching")
+    parser.add_argument("--versions", type=int, default=3500)
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    result = run(args.versions, args.rounds)
+    print(f"versions:          {result['versions']}")
+    print(f"index build:       {result['index_build_ms']:.2f} ms (once per packument)")
+    print(f"linear scan:       {result['linear_scan_us']:.1f} us per lookup")
+    print(f"VersionIndex:      {result['indexed_us']:.1f} us per lookup")
+    print(f"speedup:           {result['speedup']:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
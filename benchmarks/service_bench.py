@@ -0,0 +1,145 @@
+"""
+Benchmark for the analysis service against stubbed upstreams.
+
+    python -m benchmarks.service_bench [--jobs 8] [--size 200] [--latency-ms 10] [--workers 4]
+
+Starts FakeUpstream and the service in-process, with the service on a
+free localhost port and its metadata cache in a temporary directory. It
+then goes through the service's HTTP API in three rounds:
+
+- cold: ``--jobs`` jobs for the same npm, PyPI and Gradle repositories,
+  all submitted at once, so their registry lookups overlap and are
+  coalesced;
+- warm: the same jobs again, served from the caches the first round
+  filled;
+- manifest: the same jobs with the manifests posted in the job body.
+
+For each round it reports the wall time and upstream requests per
+service, next to what ``--jobs`` separate runs would have needed. One job
+of the first round is followed through its event stream and the others
+are long-polled.
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+import requests
+from benchmarks.fake_upstream import FakeUpstream
+from benchmarks.harness import LANGUAGES, generate_project
+
+
+def submit_all(base_url, bodies):
+    return [requests.post(f"{base_url}/jobs", json=body).json()["id"] for body in bodies]
+
+
+def wait_all(base_url, job_ids, stream_first=True):
+    """
+    :return: List of finished job summaries, and the number of events streamed for the first job
+    """
+    events = 0
+    if stream_first:
+        with requests.get(f"{base_url}/jobs/{job_ids[0]}/events", stream=True) as response:
+            for line in response.iter_lines():
+                if line:
+                    events += 1
+    summaries = []
+    for job_id in job_ids:
+        while True:
+            summary = requests.get(f"{base_url}/jobs/{job_id}", params={"wait": 30}).json()
+            if summary["status"] in ("done", "failed", "cancelled"):
+                break
+        if summary["status"] != "done":
+            raise RuntimeError(f"Job {job_id} {summary['status']}: {summary.get('error')}")
+        summaries.append(summary)
+    return summaries, events
+
+
+def run_round(name, upstream, base_url, bodies):
+    upstream.reset_stats()
+    start = time.perf_counter()
+    job_ids = submit_all(base_url, bodies)
+    summaries, events = wait_all(base_url, job_ids)
+    elapsed = time.perf_counter() - start
+    requests_made = {service: sum(stats["statuses"].values()) for service, stats in upstream.stats().items()}
+    dependencies = sum(len(project["dependencies"]) for summary in summaries
+                       for project in summary["result"]["projects"])
+    return {"round": name, "jobs": len(bodies), "wall_s": elapsed, "dependencies": dependencies,
+            "requests": requests_made, "streamed_events": events}
+
+
+def standalone_requests(upstream, ecosystems):
+    """
+    :return: Upstream requests of one uncached standalone run per ecosystem
+    """
+    from github import GitHubAPI
+    from main import analyze_repository, close_services, create_services, group_records, parse_arguments
+
+    upstream.reset_stats()
+    for ecosystem in ecosystems:
+        args = parse_arguments([f"https://github.com/bench/service-{ecosystem}", "--no-cache"])
+        cache, transport, client, resolver = create_services(args)
+        repo_info, groups = analyze_repository(args.repo_url, args, GitHubAPI("benchmark", client), resolver, client)
+        group_records(groups)
+        close_services(cache, transport, client, resolver)
+    return sum(sum(stats["statuses"].values()) for stats in upstream.stats().values())
+
+
+def run(job_count, size, latency, workers):
+    results = []
+    with FakeUpstream(latency=latency) as upstream, tempfile.TemporaryDirectory() as cache_dir:
+        # The parsers read their registry URLs when they are imported.
+        os.environ.update(upstream.environment(), GITHUB_TOKEN="benchmark")
+        from main import parse_arguments
+        from service import AnalysisService, make_server
+
+        projects = {}
+        for ecosystem in LANGUAGES:
+            projects[ecosystem] = generate_project(ecosystem, size)
+            upstream.add_repository(f"bench/service-{ecosystem}", LANGUAGES[ecosystem], projects[ecosystem])
+        ecosystems = list(LANGUAGES)
+        repo_jobs = [{"repo": f"https://github.com/bench/service-{ecosystems[number % len(ecosystems)]}"}
+                     for number in range(job_count)]
+        manifest_jobs = [{"files": projects[ecosystems[number % len(ecosystems)]], "priority": number % 3}
+                         for number in range(job_count)]
+
+        args = parse_arguments(["--serve", "0", "--cache-dir", cache_dir, "--workers", str(workers)])
+        service = AnalysisService(args, workers=workers, jobs_per_host=args.jobs_per_host).start()
+        server = make_server(service)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://{server.server_address[0]}:{server.server_address[1]}"
+        try:
+            per_job = standalone_requests(upstream, ecosystems) / len(ecosystems)
+
+            for name, bodies in (("cold", repo_jobs), ("warm", repo_jobs), ("manifest", manifest_jobs)):
+                result = run_round(name, upstream, base_url, bodies)
+                result["separate_runs_requests"] = round(per_job * len(bodies))
+                results.append(result)
+            health = service.health()
+        finally:
+            server.shutdown()
+            server.server_close()
+            service.stop()
+    return results, health
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the analysis service against fake upstreams")
+    parser.add_argument("--jobs", type=int, default=8)
+    parser.add_argument("--size", type=int, default=200, help="Dependencies per repository")
+    parser.add_argument("--latency-ms", type=float, default=10.0)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    results, health = run(args.jobs, args.size, args.latency_ms / 1000, args.workers)
+    for result in results:
+        print(f"{result['round']:<9} {result['jobs']} jobs in {result['wall_s']:.2f} s, "
+              f"{result['dependencies']} dependencies, {sum(result['requests'].values())} upstream requests "
+              f"({json.dumps(result['requests'])}) vs {result['separate_runs_requests']} for separate runs, "
+              f"{result['streamed_events']} events streamed for the first job")
+    print(f"metadata cache: {json.dumps(health['cache'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+DEFAULT_CACHE_DIR = os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')), 'sbomber')
+DEFAULT_MAX_SIZE = 512 * 1024 * 1024
+
+# Published registry metadata rarely changes, so entries stay fresh for a
+# while and are revalidated with ETag / Last-Modified once they go stale.
+DEFAULT_TTLS = {
+    'npm': 24 * 3600,
+    'pypi': 24 * 3600,
+    'maven': 7 * 24 * 3600,
+    'github': 10 * 60,
+    'github-blob': 365 * 24 * 3600,
+}
+# Reads only note when an entry was used; the notes are written in batches
+# of this many, and before entries are evicted.
+ACCESS_BATCH_SIZE = 256
+
+
+class CacheEntry:
+    def __init__(self, key, ecosystem, body, etag, last_modified, fetched_at):
+        self.key = key
+        self.ecosystem = ecosystem
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = fetched_at
+
+    def is_fresh(self, ttl, now=None):
+        return ((now or time.time()) - self.fetched_at) < ttl
+
+
+class MetadataCache:
+    """
+    Persistent, size-bounded cache of registry responses backed by SQLite.
+
+    Bodies are stored zlib-compressed. When the total stored size goes over
+    ``max_size`` the least recently used entries are evicted. The database
+    runs in WAL mode so several processes can share one cache directory.
+
+    The total size is kept in the ``totals`` table by triggers, so it stays
+    right whichever process writes, and checking it costs one lookup
+    rather than a scan of every entry.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_size=DEFAULT_MAX_SIZE, ttls=None):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.cache_dir = cache_dir
+        self.path = os.path.join(cache_dir, 'metadata.sqlite')
+        self.max_size = max_size
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self._lock = threading.Lock()
+        # Key -> time of the last read not yet written to accessed_at.
+        self._accessed = {}
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('BEGIN IMMEDIATE')
+        try:
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS entries ('
+                ' key TEXT PRIMARY KEY,'
+                ' ecosystem TEXT NOT NULL,'
+                ' body BLOB NOT NULL,'
+                ' etag TEXT,'
+                ' last_modified TEXT,'
+                ' fetched_at REAL NOT NULL,'
+                ' accessed_at REAL NOT NULL,'
+                ' size INTEGER NOT NULL)'
+            )
+            self._conn.execute('CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at)')
+            self._conn.execute('CREATE TABLE IF NOT EXISTS totals (id INTEGER PRIMARY KEY, size INTEGER NOT NULL)')
+            # Caches written before the totals table existed are summed once.
+            self._conn.execute('INSERT OR IGNORE INTO totals (id, size) SELECT 0, COALESCE(SUM(size), 0) FROM entries')
+            self._conn.execute(
+                'CREATE TRIGGER IF NOT EXISTS entries_size_insert AFTER INSERT ON entries'
+                ' BEGIN UPDATE totals SET size = size + new.size WHERE id = 0; END'
+            )
+            self._conn.execute(
+                'CREATE TRIGGER IF NOT EXISTS entries_size_update AFTER UPDATE OF size ON entries'
+                ' BEGIN UPDATE totals SET size = size + new.size - old.size WHERE id = 0; END'
+            )
+            self._conn.execute(
+                'CREATE TRIGGER IF NOT EXISTS entries_size_delete AFTER DELETE ON entries'
+                ' BEGIN UPDATE totals SET size = size - old.size WHERE id = 0; END'
+            )
+            self._conn.execute('COMMIT')
+        except BaseException:
+            self._conn.execute('ROLLBACK')
+            raise
+
+    def ttl(self, ecosystem):
+        return self.ttls.get(ecosystem, 0)
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT ecosystem, body, etag, last_modified, fetched_at FROM entries WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._accessed[key] = time.time()
+            if len(self._accessed) >= ACCESS_BATCH_SIZE:
+                self._flush_accessed()
+
+        ecosystem, body, etag, last_modified, fetched_at = row
+        return CacheEntry(key, ecosystem, zlib.decompress(body), etag, last_modified, fetched_at)
+
+    def put(self, key, ecosystem, body, etag=None, last_modified=None):
+        compressed = zlib.compress(body, 1)
+        now = time.time()
+        with self._lock:
+            # An upsert rather than INSERT OR REPLACE: the rows REPLACE deletes
+            # don't fire the delete trigger, so the total would drift.
+            self._conn.execute(
+                'INSERT INTO entries'
+                ' (key, ecosystem, body, etag, last_modified, fetched_at, accessed_at, size)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?, ?)'
+                ' ON CONFLICT (key) DO UPDATE SET ecosystem = excluded.ecosystem, body = excluded.body,'
+                ' etag = excluded.etag, last_modified = excluded.last_modified, fetched_at = excluded.fetched_at,'
+                ' accessed_at = excluded.accessed_at, size = excluded.size',
+                (key, ecosystem, compressed, etag, last_modified, now, now, len(compressed))
+            )
+            self._evict()
+
+    def touch(self, key):
+        """
+        Mark an entry as fresh again after the registry answered 304.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute('UPDATE entries SET fetched_at = ?, accessed_at = ? WHERE key = ?', (now, now, key))
+
+    def size(self):
+        with self._lock:
+            return self._total_size()
+
+    def clear(self):
+        with self._lock:
+            self._accessed.clear()
+            self._conn.execute('DELETE FROM entries')
+
+    def close(self):
+        with self._lock:
+            self._flush_accessed()
+            self._conn.close()
+
+    def _total_size(self):
+        return self._conn.execute('SELECT size FROM totals WHERE id = 0').fetchone()[0]
+
+    def _flush_accessed(self):
+        if not self._accessed:
+            return
+        # MAX keeps a later touch() or put() from being rolled back by an older read.
+        self._conn.executemany('UPDATE entries SET accessed_at = MAX(accessed_at, ?) WHERE key = ?',
+                               [(accessed_at, key) for key, accessed_at in self._accessed.items()])
+        self._accessed.clear()
+
+    def _evict(self):
+        total = self._total_size()
+        if total <= self.max_size:
+            return
+
+        # The reads since the last flush decide what is least recently used.
+        self._flush_accessed()
+        # Trim a little below the limit so we don't evict on every insert.
+        target = self.max_size * 0.9
+        evicted = []
+        for key, size in self._conn.execute('SELECT key, size FROM entries ORDER BY accessed_at'):
+            if total <= target:
+                break
+            evicted.append((key,))
+            total -= size
+        self._conn.executemany('DELETE FROM entries WHERE key = ?', evicted)
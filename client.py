@@ -0,0 +1,148 @@
+import json
+import threading
+from urllib.parse import urlencode
+import requests
+from instrumentation import recorder
+from transport import Transport
+
+
+class OfflineCacheMiss(requests.RequestException):
+    pass
+
+
+class _Call:
+    __slots__ = ('done', 'value', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls for the same key into one: the first caller
+    runs the function and everyone who asks for the key while it is in
+    flight waits for, and shares, its result or exception. Nothing is kept
+    once the call completes.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func):
+        """
+        :return: Tuple of (result, whether it came from another caller's call)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value, True
+
+        try:
+            call.value = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value, False
+
+
+class RegistryClient:
+    """
+    Fetches JSON metadata (and the odd XML document, such as Maven POMs)
+    from registries and GitHub through the on-disk cache.
+
+    Fresh entries are served straight from the cache. Stale entries are
+    revalidated with If-None-Match / If-Modified-Since, so an unchanged
+    document costs a 304 instead of a full download. In offline mode the
+    network is never touched and anything not cached raises
+    ``OfflineCacheMiss``.
+
+    Concurrent requests for the same URL are coalesced, so threads that ask
+    for a document another thread is already fetching wait for that fetch
+    instead of sending their own.
+    """
+
+    def __init__(self, cache=None, offline=False, transport=None):
+        self.cache = cache
+        self.offline = offline
+        self.transport = transport or Transport()
+        self.stats = {'hits': 0, 'misses': 0, 'revalidated': 0, 'coalesced': 0}
+        self._stats_lock = threading.Lock()
+        self._flights = SingleFlight()
+
+    def get_json(self, url, ecosystem, params=None, headers=None):
+        return json.loads(self.get_bytes(url, ecosystem, params, headers))
+
+    def get_text(self, url, ecosystem, params=None, headers=None):
+        return self.get_bytes(url, ecosystem, params, headers).decode('utf-8')
+
+    def cached(self, url, ecosystem, params=None):
+        """
+        :return: Whether ``get_bytes`` would answer from the cache, without
+                 a request
+        """
+        if self.cache is None:
+            return False
+        entry = self.cache.get(self.cache_key(url, params))
+        return entry is not None and (self.offline or entry.is_fresh(self.cache.ttl(ecosystem)))
+
+    def get_bytes(self, url, ecosystem, params=None, headers=None):
+        key = self.cache_key(url, params)
+        entry = self.cache.get(key) if self.cache is not None else None
+
+        if entry is not None and (self.offline or entry.is_fresh(self.cache.ttl(ecosystem))):
+            self._count('hits')
+            return entry.body
+
+        if self.offline:
+            raise OfflineCacheMiss(f"{key} is not in the metadata cache and offline mode is enabled")
+
+        body, shared = self._flights.do(key, lambda: self._fetch(key, url, ecosystem, params, headers, entry))
+        if shared:
+            self._count('coalesced')
+        return body
+
+    def _fetch(self, key, url, ecosystem, params, headers, entry):
+        request_headers = dict(headers or {})
+        if entry is not None:
+            if entry.etag:
+                request_headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                request_headers['If-Modified-Since'] = entry.last_modified
+
+        response = self.transport.get(url, params=params, headers=request_headers)
+        if response.status_code == 304 and entry is not None:
+            self._count('revalidated')
+            self.cache.touch(key)
+            return entry.body
+
+        response.raise_for_status()
+        self._count('misses')
+        if self.cache is not None:
+            self.cache.put(key, ecosystem, response.content,
+                           response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        return response.content
+
+    @staticmethod
+    def cache_key(url, params=None):
+        if not params:
+            return url
+        return f"{url}?{urlencode(sorted(params.items()))}"
+
+    def _count(self, name):
+        with self._stats_lock:
+            self.stats[name] += 1
+        recorder.count("cache", name)
@@ -0,0 +1,131 @@
+import json
+import logging
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from instrumentation import configure_logging, recorder
+
+# Per-process state, set up once by _init_worker and reused for every
+# repository the worker analyzes so the cache and connections stay warm.
+_worker = {}
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_repo_url(repo_url):
+    repo_url = repo_url.strip().rstrip('/')
+    if repo_url.endswith('.git'):
+        repo_url = repo_url[:-4]
+    return repo_url
+
+
+def read_repo_urls(lines):
+    """
+    Read repository URLs, one per line, skipping blank lines, comments and
+    repositories that are listed more than once.
+    """
+    seen = set()
+    repo_urls = []
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        repo_url = normalize_repo_url(line)
+        key = repo_url.lower()
+        if key not in seen:
+            seen.add(key)
+            repo_urls.append(repo_url)
+    return repo_urls
+
+
+def run_fleet(repo_urls, args, out):
+    """
+    Analyze many repositories on a process pool and write one JSON record per
+    repository to ``out`` as soon as it finishes. Failures are recorded and
+    don't stop the batch.
+
+    All workers share the on-disk metadata cache, so a package looked up by
+    one worker is served from the cache to the others. Each repository gets
+    fresh parsers, so their in-memory stores, failed lookups included, don't
+    outlive it. With --stats or --trace, each worker sends its spans and
+    counters back with every result, to be reported together with the
+    parent's.
+
+    :return: Number of repositories that failed
+    """
+    failures = 0
+    workers = max(1, min(args.workers, len(repo_urls)))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(args,)) as pool:
+        futures = {pool.submit(_analyze, repo_url): repo_url for repo_url in repo_urls}
+        for future in as_completed(futures):
+            try:
+                record, instrumentation = future.result()
+                recorder.merge(instrumentation)
+            except Exception as e:
+                record = _error_record(futures[future], e)
+            if record['status'] != 'ok':
+                failures += 1
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+
+    logger.info("Analyzed %s repositories, %s failed", len(repo_urls), failures)
+    return failures
+
+
+def _init_worker(args):
+    import os
+    from main import create_services
+    from github import GitHubAPI
+    from incremental import AnalysisStore
+
+    # Diagnostics from the parsers must not end up in the result stream.
+    sys.stdout = sys.stderr
+    configure_logging(args.verbose)
+    # A forked worker starts with a copy of the parent's recorder.
+    if args.stats or args.trace:
+        recorder.enable(f"worker {os.getpid()}")
+    else:
+        recorder.reset()
+
+    cache, transport, client, resolver = create_services(args)
+    _worker.update({
+        'args': args,
+        'client': client,
+        'resolver': resolver,
+        'github_api': GitHubAPI(os.environ.get('GITHUB_TOKEN'), client),
+        'store': AnalysisStore(args.cache_dir) if args.incremental else None,
+    })
+
+
+def _analyze(repo_url):
+    """
+    :return: Tuple of (result record, spans and counters drained from the
+             worker's recorder or None)
+    """
+    with recorder.span("repository", repo=repo_url):
+        record = _analyze_repository(repo_url)
+    return record, recorder.drain()
+
+
+def _analyze_repository(repo_url):
+    from main import analyze_repository, group_records, repository_source
+
+    try:
+        source = repository_source(repo_url, _worker['github_api'], _worker['args'])
+        repo_info, groups = analyze_repository(repo_url, _worker['args'], source,
+                                               _worker['resolver'], _worker['client'], {}, _worker['store'])
+    except Exception as e:
+        return _error_record(repo_url, e)
+
+    record = {
+        "repo": repo_url,
+        "status": "ok",
+        "language": repo_info.get('language'),
+        "projects": group_records(groups),
+    }
+    if 'incremental' in repo_info:
+        record["incremental"] = repo_info['incremental']
+    return record
+
+
+def _error_record(repo_url, error):
+    return {"repo": repo_url, "status": "error", "error": f"{type(error).__name__}: {error}"}
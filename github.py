@@ -1,10 +1,25 @@
-import requests
 import base64
+import hashlib
+import json
+import logging
+import os
+import posixpath
+import tarfile
+from client import OfflineCacheMiss, RegistryClient
+
+# GitHub Actions sets this, pointing at GitHub Enterprise Server where that's used.
+GITHUB_API_URL = os.environ.get("GITHUB_API_URL", "https://api.github.com").rstrip("/")
+
+# Past this many blobs to download, tree discovery streams the tarball instead.
+TARBALL_THRESHOLD = 20
+
+logger = logging.getLogger(__name__)
 
 class GitHubAPI:
-    def __init__(self, token):
+    def __init__(self, token, client=None):
         self.token = token
-        self.base_url = "https://api.github.com"
+        self.client = client or RegistryClient()
+        self.base_url = GITHUB_API_URL
         self.headers = {
             "Authorization": f"token {self.token}",
             "Accept": "application/vnd.github.v3+json"
@@ -13,16 +28,121 @@ class GitHubAPI:
     def get_repo_info(self, repo_url):
         owner, repo = repo_url.split('/')[-2:]
         url = f"{self.base_url}/repos/{owner}/{repo}"
-        response = requests.get(url, headers=self.headers)
-        response.raise_for_status()
-        return response.json()
+        return self.client.get_json(url, 'github', headers=self.headers)
 
-    # this could be better - need to search for the file and pick a result instead of looking for something in the project root. How to habdle multiple results? 
     def get_dependency_file(self, repo_url, file_name):
         owner, repo = repo_url.split('/')[-2:]
         url = f"{self.base_url}/repos/{owner}/{repo}/contents/{file_name}"
-        print('searching for ' + url)
-        response = requests.get(url, headers=self.headers)
+        logger.debug("Fetching %s", url)
+        content = self.client.get_json(url, 'github', headers=self.headers)['content']
+        return base64.b64decode(content).decode('utf-8')
+
+    def get_commit_sha(self, repo_url, ref):
+        owner, repo = repo_url.split('/')[-2:]
+        url = f"{self.base_url}/repos/{owner}/{repo}/commits/{ref}"
+        return self.client.get_json(url, 'github', headers=self.headers)['sha']
+
+    def get_tree(self, repo_url, ref):
+        owner, repo = repo_url.split('/')[-2:]
+        url = f"{self.base_url}/repos/{owner}/{repo}/git/trees/{ref}"
+        return self.client.get_json(url, 'github', params={'recursive': '1'}, headers=self.headers)
+
+    def get_blob(self, repo_url, sha):
+        # Blobs are addressed by content, so a cached copy never goes stale.
+        content = self.client.get_json(self._blob_url(repo_url, sha), 'github-blob', headers=self.headers)['content']
+        return base64.b64decode(content).decode('utf-8')
+
+    def _blob_url(self, repo_url, sha):
+        owner, repo = repo_url.split('/')[-2:]
+        return f"{self.base_url}/repos/{owner}/{repo}/git/blobs/{sha}"
+
+    def find_manifests(self, repo_url, ref, file_names, resolver):
+        """
+        Find every file called one of ``file_names`` anywhere in the repository
+        with a single recursive tree listing, then fetch them in parallel.
+
+        Falls back to the tarball when GitHub truncates the tree listing, or
+        when more than ``TARBALL_THRESHOLD`` of the blobs aren't cached, since
+        one tarball then costs less than a call per blob.
+
+        :return: Dict mapping repository paths to file contents
+        """
+        tree = self.get_tree(repo_url, ref)
+        if tree.get('truncated'):
+            logger.info("Repository tree listing was truncated, falling back to the tarball")
+            return self.find_manifests_in_tarball(repo_url, ref, file_names)
+
+        file_names = set(file_names)
+        entries = [entry for entry in tree['tree']
+                   if entry['type'] == 'blob' and posixpath.basename(entry['path']) in file_names]
+        missing = sum(1 for entry in entries
+                      if not self.client.cached(self._blob_url(repo_url, entry['sha']), 'github-blob'))
+        if missing > TARBALL_THRESHOLD and not self.client.offline:
+            logger.info("%s manifests to download, fetching the tarball instead", missing)
+            manifests = self.find_manifests_in_tarball(repo_url, ref, file_names)
+            self._cache_blobs(repo_url, entries, manifests)
+            return manifests
+        contents = resolver.map(self.base_url, lambda entry: self.get_blob(repo_url, entry['sha']), entries)
+        return {entry['path']: content for entry, content in zip(entries, contents)}
+
+    def _cache_blobs(self, repo_url, entries, manifests):
+        """
+        Cache the tarball's files as the blobs of the tree listing, so the
+        next listing only downloads the manifests that changed.
+        """
+        if self.client.cache is None:
+            return
+        for entry in entries:
+            content = manifests.get(entry['path'])
+            if content is None:
+                continue
+            data = content.encode('utf-8')
+            # The branch may have moved between the listing and the tarball.
+            if hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest() != entry['sha']:
+                continue
+            body = json.dumps({'content': base64.b64encode(data).decode('ascii')}).encode('utf-8')
+            self.client.cache.put(self.client.cache_key(self._blob_url(repo_url, entry['sha'])), 'github-blob', body)
+
+    def find_manifests_in_tarball(self, repo_url, ref, file_names):
+        """
+        Stream the repository tarball and pick out every file called one of
+        ``file_names``. This costs a single API call regardless of how many
+        manifests the repository has.
+
+        :return: Dict mapping repository paths to file contents
+        """
+        if self.client.offline:
+            raise OfflineCacheMiss("Repository tarballs are not cached and offline mode is enabled")
+
+        owner, repo = repo_url.split('/')[-2:]
+        url = f"{self.base_url}/repos/{owner}/{repo}/tarball/{ref}"
+        response = self.client.transport.get(url, headers=self.headers, stream=True)
         response.raise_for_status()
-        content = response.json()['content']
-        return base64.b64decode(content).decode('utf-8')
\ No newline at end of file
+
+        file_names = set(file_names)
+        manifests = {}
+        try:
+            with tarfile.open(fileobj=response.raw, mode='r|gz') as archive:
+                for member in archive:
+                    if not member.isfile() or posixpath.basename(member.name) not in file_names:
+                        continue
+                    # Members are prefixed with an "<owner>-<repo>-<sha>/" directory.
+                    path = member.name.split('/', 1)[1] if '/' in member.name else member.name
+                    manifests[path] = archive.extractfile(member).read().decode('utf-8')
+        finally:
+            response.close()
+        return manifests
+
+    @staticmethod
+    def group_by_directory(manifests):
+        """
+        Group manifest contents by the directory they live in.
+
+        :param manifests: Dict mapping repository paths to file contents
+        :return: Dict mapping directories ("" for the root) to {file name: content}
+        """
+        groups = {}
+        for path in sorted(manifests, key=posixpath.split):
+            directory, file_name = posixpath.split(path)
+            groups.setdefault(directory, {})[file_name] = manifests[path]
+        return groups
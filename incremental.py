@@ -0,0 +1,224 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from models.dependency import LOOKUP_FAILED, Dependency
+
+
+def content_hash(files, *extra):
+    """
+    Hash the files a manifest is analyzed from (the manifest itself and
+    anything next to it that feeds into the result, such as lockfiles),
+    plus any extra inputs.
+
+    :param files: Dict mapping file names to contents
+    """
+    digest = hashlib.sha256()
+    for name in sorted(files):
+        digest.update(name.encode('utf-8') + b'\0' + (files[name] or '').encode('utf-8') + b'\0')
+    for value in extra:
+        digest.update(json.dumps(value, sort_keys=True, default=str).encode('utf-8') + b'\0')
+    return digest.hexdigest()
+
+
+class AnalysisStore:
+    """
+    Remembers, per repository, the commit that was analyzed and for every
+    manifest its content hash and resolved dependencies, so that the next
+    run can skip what hasn't changed. Results are keyed on the analysis
+    options too, since e.g. --transitive changes what a manifest resolves to.
+
+    Backed by SQLite in the cache directory, like MetadataCache, so that
+    batch workers can share it.
+    """
+
+    def __init__(self, cache_dir):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, 'analysis.sqlite')
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS repositories ('
+            ' repo TEXT NOT NULL,'
+            ' options TEXT NOT NULL,'
+            ' commit_sha TEXT,'
+            ' analyzed_at REAL NOT NULL,'
+            ' PRIMARY KEY (repo, options))'
+        )
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS manifests ('
+            ' repo TEXT NOT NULL,'
+            ' options TEXT NOT NULL,'
+            ' path TEXT NOT NULL,'
+            ' manifest TEXT NOT NULL,'
+            ' position INTEGER NOT NULL,'
+            ' content_hash TEXT NOT NULL,'
+            ' dependencies BLOB NOT NULL,'
+            ' PRIMARY KEY (repo, options, path, manifest))'
+        )
+
+    def begin(self, repo, options, commit_sha):
+        """
+        :return: RepositoryRun comparing this run of ``repo`` against the last one
+        """
+        with self._lock:
+            row = self._conn.execute('SELECT commit_sha FROM repositories WHERE repo = ? AND options = ?',
+                                     (repo, options)).fetchone()
+            manifests = self._conn.execute(
+                'SELECT path, manifest, content_hash, dependencies FROM manifests'
+                ' WHERE repo = ? AND options = ? ORDER BY position', (repo, options)
+            ).fetchall()
+
+        previous = {(path, manifest): (digest, json.loads(zlib.decompress(dependencies)))
+                    for path, manifest, digest, dependencies in manifests}
+        return RepositoryRun(self, repo, options, commit_sha, row[0] if row else None, previous)
+
+    def save(self, run):
+        with self._lock:
+            self._conn.execute('BEGIN')
+            try:
+                self._conn.execute('DELETE FROM manifests WHERE repo = ? AND options = ?', (run.repo, run.options))
+                self._conn.executemany(
+                    'INSERT INTO manifests (repo, options, path, manifest, position, content_hash, dependencies)'
+                    ' VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    [(run.repo, run.options, path, manifest, position, digest,
+                      zlib.compress(json.dumps(dependencies).encode('utf-8'), 1))
+                     for position, ((path, manifest), (digest, dependencies)) in enumerate(run.current.items())]
+                )
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO repositories (repo, options, commit_sha, analyzed_at) VALUES (?, ?, ?, ?)',
+                    (run.repo, run.options, run.commit_sha, time.time())
+                )
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class RepositoryRun:
+    """
+    Incremental state for one analysis of one repository.
+
+    ``stats`` counts the skipped work: whether the whole repository was
+    unchanged, how many manifests were reused as they were, and how many
+    dependency licenses were reused rather than looked up again.
+    """
+
+    def __init__(self, store, repo, options, commit_sha, previous_commit_sha, previous):
+        self.store = store
+        self.repo = repo
+        self.options = options
+        self.commit_sha = commit_sha
+        self.previous_commit_sha = previous_commit_sha
+        self.previous = previous
+        self.current = {}
+        self.stats = {
+            "commit_unchanged": False,
+            "manifests_unchanged": 0,
+            "manifests_changed": 0,
+            "manifests_new": 0,
+            "dependencies_reused": 0,
+            "dependencies_resolved": 0,
+        }
+
+    def commit_unchanged(self):
+        """
+        :return: Whether the whole stored result can be replayed: the commit is
+                 the same and every license in it was settled
+        """
+        return (self.commit_sha is not None and self.commit_sha == self.previous_commit_sha
+                and bool(self.previous) and all(_settled(records) for _, records in self.previous.values()))
+
+    def replay(self):
+        """
+        Yield (path, manifest name, dependencies) for every manifest stored
+        by the last run, for a repository whose commit hasn't changed.
+        """
+        self.stats["commit_unchanged"] = True
+        for (path, manifest), (digest, dependencies) in self.previous.items():
+            self.stats["manifests_unchanged"] += 1
+            self.stats["dependencies_reused"] += len(dependencies)
+            yield path, manifest, self._record(path, manifest, digest, self._dependencies(dependencies))
+
+    def unchanged(self, path, manifest, digest):
+        """
+        :return: The stored dependencies if the manifest's content hash is
+                 the same as last time, otherwise None. A manifest with a
+                 license lookup that failed last time counts as changed, so
+                 that those dependencies are looked up again.
+        """
+        previous = self.previous.get((path, manifest))
+        if previous is None:
+            self.stats["manifests_new"] += 1
+            return None
+        if previous[0] != digest or not _settled(previous[1]):
+            self.stats["manifests_changed"] += 1
+            return None
+        self.stats["manifests_unchanged"] += 1
+        self.stats["dependencies_reused"] += len(previous[1])
+        return self._record(path, manifest, digest, self._dependencies(previous[1]))
+
+    def known_licenses(self, path, manifest):
+        """
+        :return: Dict mapping (name, version) to the license stored for the
+                 manifest, for reuse on dependencies that didn't change
+        """
+        previous = self.previous.get((path, manifest))
+        if previous is None:
+            return {}
+        return {(record[0], record[1]): record[2] for record in previous[1] if _settled_license(record[2])}
+
+    def track(self, path, manifest, digest, dependencies, known=None):
+        """
+        Wrap a stream of freshly resolved dependencies so that they are stored
+        once it has been consumed, counting those whose license came from
+        ``known``.
+        """
+        known = known or {}
+        for dep in self._record(path, manifest, digest, dependencies):
+            if known.get((dep.name, dep.version)) == dep.license:
+                self.stats["dependencies_reused"] += 1
+            else:
+                self.stats["dependencies_resolved"] += 1
+            yield dep
+
+    def finish(self):
+        self.store.save(self)
+
+    def report(self):
+        stats = self.stats
+        if stats["commit_unchanged"]:
+            return (f"{self.repo}: commit {self.commit_sha[:12]} unchanged, reused {stats['manifests_unchanged']} "
+                    f"manifests and {stats['dependencies_reused']} dependencies without any lookups")
+        return (f"{self.repo}: {stats['manifests_unchanged']} manifests unchanged, {stats['manifests_changed']} "
+                f"changed, {stats['manifests_new']} new; reused {stats['dependencies_reused']} dependency "
+                f"licenses, resolved {stats['dependencies_resolved']}")
+
+    def _record(self, path, manifest, digest, dependencies):
+        resolved = []
+        self.current[(path, manifest)] = (digest, resolved)
+        for dep in dependencies:
+            resolved.append([dep.name, dep.version, dep.license, dep.ecosystem])
+            yield dep
+
+    @staticmethod
+    def _dependencies(records):
+        # Records are [name, version, license, ecosystem]; older ones lack the ecosystem.
+        return [Dependency(*record) for record in records]
+
+
+def _settled_license(license_info):
+    return license_info is not None and license_info != LOOKUP_FAILED
+
+
+def _settled(records):
+    return all(_settled_license(record[2]) for record in records)
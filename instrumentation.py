@@ -0,0 +1,255 @@
+"""
+Timing spans and counters behind ``--stats`` and ``--trace``, and the
+logging set-up for the command line.
+
+Code under measurement wraps its work in ``recorder.span(name, category)``
+and bumps ``recorder.count(...)``. Until the recorder is enabled a span is
+a shared no-op object and counting returns straight away, so the hooks
+cost next to nothing in normal runs.
+"""
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+LOG_FORMAT = "%(message)s"
+VERBOSE_LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+
+def configure_logging(verbose=False):
+    """
+    Send diagnostics to stderr, so they never mix with the report on stdout:
+    INFO and up by default, everything with ``verbose``.
+    """
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(logging.Formatter(VERBOSE_LOG_FORMAT if verbose else LOG_FORMAT))
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(logging.DEBUG if verbose else logging.INFO)
+    # Connection pool chatter would drown out our own debug output.
+    logging.getLogger("urllib3").setLevel(logging.WARNING)
+
+
+class Span:
+    __slots__ = ('recorder', 'name', 'category', 'args', 'start')
+
+    def __init__(self, recorder, name, category, args):
+        self.recorder = recorder
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = None
+
+    def set(self, key, value):
+        self.args[key] = value
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is not None:
+            self.args['error'] = exc_type.__name__
+        self.recorder._finish(self, time.perf_counter_ns())
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def set(self, key, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Recorder:
+    """
+    Thread-safe collection of finished spans and counters for one process.
+
+    Spans are kept as ``(name, category, start_ns, duration_ns, pid, tid,
+    args)`` tuples on the ``perf_counter_ns`` clock, which is monotonic and
+    shared by every process on Linux, so the spans drained from batch workers
+    line up with the parent's on one timeline. Counters are keyed by tuples
+    such as ``("http", host, status)``.
+
+    A long-running process sets ``limit`` so that only its most recent spans
+    are kept; counters are bounded by their keys already.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.pid = os.getpid()
+        self.origin = time.perf_counter_ns()
+        self.max_spans = None
+        self.dropped = 0
+        self.spans = []
+        self.counters = {}
+        self.threads = {}
+        self.processes = {}
+        self._lock = threading.Lock()
+
+    def enable(self, process_name="sbomber"):
+        self.reset()
+        self.enabled = True
+        self.processes[self.pid] = process_name
+
+    def reset(self):
+        """
+        Drop everything recorded so far, e.g. what a forked worker inherited
+        from its parent, and stop recording.
+        """
+        with self._lock:
+            self.enabled = False
+            self.pid = os.getpid()
+            self.origin = time.perf_counter_ns()
+            self.dropped = 0
+            self.spans = self._new_spans()
+            self.counters = {}
+            self.threads = {}
+            self.processes = {}
+
+    def limit(self, max_spans):
+        """
+        Keep only the last ``max_spans`` spans from now on, dropping the oldest.
+        """
+        with self._lock:
+            self.max_spans = max_spans
+            self.spans = self._new_spans(self.spans)
+
+    def span(self, name, category="phase", **args):
+        """
+        :return: Context manager timing the block; ``set`` adds arguments,
+                 such as a response status, to it along the way
+        """
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, category, args)
+
+    def count(self, *key, amount=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def _finish(self, span, end):
+        thread = threading.current_thread()
+        with self._lock:
+            if self.max_spans is not None and len(self.spans) == self.max_spans:
+                self.dropped += 1
+            self.spans.append((span.name, span.category, span.start, end - span.start, self.pid, thread.ident,
+                               span.args))
+            self.threads[(self.pid, thread.ident)] = thread.name
+
+    def drain(self):
+        """
+        :return: Everything recorded since the last drain, in a picklable form
+                 for ``merge``, or None when disabled
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            drained = {'spans': list(self.spans), 'counters': self.counters, 'threads': self.threads,
+                       'processes': self.processes}
+            self.spans, self.counters, self.threads = self._new_spans(), {}, {}
+            return drained
+
+    def merge(self, drained):
+        if drained is None:
+            return
+        with self._lock:
+            self.spans.extend(drained['spans'])
+            for key, amount in drained['counters'].items():
+                self.counters[key] = self.counters.get(key, 0) + amount
+            self.threads.update(drained['threads'])
+            self.processes.update(drained['processes'])
+
+    def write_trace(self, path):
+        """
+        Write the spans in Chrome's trace event format, for chrome://tracing
+        or https://ui.perfetto.dev. Counter totals go under ``otherData``.
+        """
+        with self._lock:
+            events = [{"name": "process_name", "ph": "M", "pid": pid, "args": {"name": name}}
+                      for pid, name in self.processes.items()]
+            events += [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+                       for (pid, tid), name in self.threads.items()]
+            events += [{"name": name, "cat": category, "ph": "X", "ts": (start - self.origin) / 1000,
+                        "dur": duration / 1000, "pid": pid, "tid": tid, "args": args}
+                       for name, category, start, duration, pid, tid, args in self.spans]
+            counters = {" ".join(map(str, key)): amount for key, amount in sorted(self.counters.items(), key=str)}
+
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"counters": counters}}, f)
+
+    def summary(self):
+        """
+        :return: Lines of the ``--stats`` table: time per span name, then
+                 requests, statuses and retries per host, then the cache
+        """
+        with self._lock:
+            durations = {}
+            for name, category, _, duration, _, _, _ in self.spans:
+                durations.setdefault((category, name), []).append(duration / 1e6)
+            counters = dict(self.counters)
+
+        lines = [f"{'span':<40} {'count':>7} {'total s':>9} {'mean ms':>9} {'p50 ms':>9} {'p99 ms':>9} "
+                 f"{'max ms':>9}"]
+        if self.dropped:
+            lines.insert(0, f"(the last {self.max_spans} spans; {self.dropped} earlier ones were dropped)")
+        for (category, name), values in sorted(durations.items(), key=lambda item: (item[0][0] != "phase", item[0])):
+            values.sort()
+            lines.append(f"{f'{category}: {name}':<40.40} {len(values):>7} {sum(values) / 1000:>9.3f} "
+                         f"{sum(values) / len(values):>9.2f} {_percentile(values, 0.5):>9.2f} "
+                         f"{_percentile(values, 0.99):>9.2f} {values[-1]:>9.2f}")
+
+        hosts = {}
+        for key, amount in counters.items():
+            if key[0] in ("http", "retry", "throttle_wait"):
+                host = hosts.setdefault(key[1], {"statuses": {}, "retry": 0, "throttle_wait": 0})
+                if key[0] == "http":
+                    host["statuses"][key[2]] = host["statuses"].get(key[2], 0) + amount
+                else:
+                    host[key[0]] += amount
+        if hosts:
+            lines.append("")
+            lines.append(f"{'host':<40} {'requests':>9} {'retries':>8} {'throttled s':>12}  statuses")
+            for host, stats in sorted(hosts.items()):
+                statuses = ", ".join(f"{status}: {count}" for status, count in sorted(stats["statuses"].items(),
+                                                                                      key=str))
+                lines.append(f"{host:<40.40} {sum(stats['statuses'].values()):>9} {stats['retry']:>8} "
+                             f"{stats['throttle_wait']:>12.2f}  {statuses}")
+
+        hits = counters.get(("cache", "hits"), 0)
+        revalidated = counters.get(("cache", "revalidated"), 0)
+        misses = counters.get(("cache", "misses"), 0)
+        coalesced = counters.get(("cache", "coalesced"), 0)
+        if hits or revalidated or misses:
+            lines.append("")
+            lines.append(f"metadata cache: {hits} hits, {revalidated} revalidated, {misses} fetched, "
+                         f"{coalesced} coalesced with a fetch in flight "
+                         f"({(hits + revalidated) / (hits + revalidated + misses):.1%} served from cache)")
+        return lines
+
+
+    def _new_spans(self, spans=()):
+        if self.max_spans is None:
+            return list(spans)
+        return deque(spans, maxlen=self.max_spans)
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+recorder = Recorder()
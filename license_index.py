@@ -0,0 +1,238 @@
+import csv
+import gzip
+import io
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+from array import array
+from parsing.lockfiles import normalize_python_name
+
+MAGIC = b'SBLI'
+FORMAT_VERSION = 1
+# magic, format version, reserved, record count, license count and the file
+# offsets of the key offsets, license ids, key data, license offsets and
+# license data sections.
+HEADER = struct.Struct('<4sHHQQQQQQQ')
+ECOSYSTEMS = ('npm', 'pypi', 'maven')
+SNAPSHOT_FIELDS = ('ecosystem', 'name', 'version', 'license')
+
+
+def index_key(ecosystem, name, version=''):
+    """
+    Sort key of a record. The package-level record of a name has an empty
+    version, so it sorts right before that name's versions.
+    """
+    if ecosystem == 'pypi':
+        name = normalize_python_name(name)
+    return f"{ecosystem}\0{name}\0{version or ''}".encode('utf-8')
+
+
+class LicenseIndex:
+    """
+    Read-only license index memory-mapped from a file written by
+    ``build_license_index``.
+
+    Opening only reads the header; lookups binary-search the sorted keys
+    in place, so there is no parsing at startup and pages are loaded
+    lazily by the OS. Instances are safe to share between threads.
+
+    File format (version 1, little-endian, sections 8-byte aligned)::
+
+        header        HEADER
+        key offsets   uint64[record count + 1], into the key data
+        license ids   uint32[record count], into the license table
+        key data      "<ecosystem>\\0<name>\\0<version>" per record, sorted
+        license offsets uint32[license count + 1], into the license data
+        license data  UTF-8 license strings, deduplicated
+    """
+
+    _shared = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._mmap) < HEADER.size:
+            raise ValueError(f"{path} is not a license index")
+        (magic, version, _, self.record_count, self.license_count, key_offsets, license_ids,
+         keys, license_offsets, licenses) = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a license index")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{path} uses license index format {version}, this version reads format "
+                             f"{FORMAT_VERSION}; rebuild it with --build-license-index")
+
+        view = memoryview(self._mmap)
+        self._key_offsets = self._array(view, key_offsets, 'Q', self.record_count + 1)
+        self._license_ids = self._array(view, license_ids, 'I', self.record_count)
+        self._license_offsets = self._array(view, license_offsets, 'I', self.license_count + 1)
+        self._keys = keys
+        self._licenses = licenses
+        self._license_cache = {}
+
+    @classmethod
+    def shared(cls, path):
+        """
+        :return: One LicenseIndex per path for the whole process
+        """
+        path = os.path.abspath(path)
+        with cls._shared_lock:
+            if path not in cls._shared:
+                cls._shared[path] = cls(path)
+            return cls._shared[path]
+
+    @staticmethod
+    def _array(view, offset, typecode, count):
+        itemsize = struct.calcsize(typecode)
+        section = view[offset:offset + itemsize * count]
+        if sys.byteorder == 'little':
+            return section.cast(typecode)
+        values = array(typecode, section.tobytes())
+        values.byteswap()
+        return values
+
+    def __len__(self):
+        return self.record_count
+
+    def get(self, ecosystem, name, version=None):
+        """
+        Look up the license of a package version, falling back to the
+        package-level license when that version isn't in the index.
+
+        :return: License string, or None if the package isn't indexed
+        """
+        if version:
+            position = self._find(index_key(ecosystem, name, version))
+            if position is not None:
+                return self._license(self._license_ids[position])
+        position = self._find(index_key(ecosystem, name))
+        if position is not None:
+            return self._license(self._license_ids[position])
+        return None
+
+    def _find(self, key):
+        offsets = self._key_offsets
+        base = self._keys
+        data = self._mmap
+        low, high = 0, self.record_count
+        while low < high:
+            middle = (low + high) // 2
+            candidate = data[base + offsets[middle]:base + offsets[middle + 1]]
+            if candidate < key:
+                low = middle + 1
+            elif candidate > key:
+                high = middle
+            else:
+                return middle
+        return None
+
+    def _license(self, license_id):
+        license_info = self._license_cache.get(license_id)
+        if license_info is None:
+            start = self._licenses + self._license_offsets[license_id]
+            end = self._licenses + self._license_offsets[license_id + 1]
+            license_info = self._mmap[start:end].decode('utf-8')
+            self._license_cache[license_id] = license_info
+        return license_info
+
+    def close(self):
+        for values in (self._key_offsets, self._license_ids, self._license_offsets):
+            if isinstance(values, memoryview):
+                values.release()
+        self._mmap.close()
+
+
+def read_snapshot(path):
+    """
+    Read (ecosystem, name, version, license) records from a snapshot file:
+    JSON Lines with those keys or CSV with those columns, optionally
+    gzip-compressed. An empty version gives the package-level license.
+    """
+    opener = gzip.open if path.endswith('.gz') else open
+    base_name = path[:-3] if path.endswith('.gz') else path
+    with opener(path, 'rt', encoding='utf-8', newline='') as f:
+        if base_name.endswith('.csv'):
+            for row in csv.DictReader(f):
+                yield tuple(row.get(field) or '' for field in SNAPSHOT_FIELDS)
+        else:
+            for line in f:
+                line = line.strip()
+                if line:
+                    record = json.loads(line)
+                    yield tuple(record.get(field) or '' for field in SNAPSHOT_FIELDS)
+
+
+def build_license_index(records, path):
+    """
+    Write a license index from (ecosystem, name, version, license) records.
+
+    Later records win over earlier ones for the same key. Every package
+    gets a package-level record: the one given explicitly with an empty
+    version, or else the license of the package's last record.
+
+    :return: Number of records written
+    """
+    license_ids = {}
+    entries = []
+    package_licenses = {}
+    explicit_packages = set()
+    for sequence, (ecosystem, name, version, license_info) in enumerate(records):
+        if ecosystem not in ECOSYSTEMS or not name or not license_info:
+            continue
+        license_id = license_ids.setdefault(license_info, len(license_ids))
+        package_key = index_key(ecosystem, name)
+        if version:
+            entries.append((index_key(ecosystem, name, version), sequence, license_id))
+            if package_key not in explicit_packages:
+                package_licenses[package_key] = license_id
+        else:
+            package_licenses[package_key] = license_id
+            explicit_packages.add(package_key)
+
+    entries.extend((key, -1, license_id) for key, license_id in package_licenses.items())
+    entries.sort()
+
+    keys = io.BytesIO()
+    key_offsets = array('Q', [0])
+    record_licenses = array('I')
+    for position, (key, _, license_id) in enumerate(entries):
+        # Keep the last record for duplicate keys.
+        if position + 1 < len(entries) and entries[position + 1][0] == key:
+            continue
+        keys.write(key)
+        key_offsets.append(keys.tell())
+        record_licenses.append(license_id)
+    del entries
+
+    licenses = io.BytesIO()
+    license_offsets = array('I', [0])
+    for license_info in license_ids:
+        licenses.write(license_info.encode('utf-8'))
+        license_offsets.append(licenses.tell())
+
+    sections = [key_offsets, record_licenses, keys.getvalue(), license_offsets, licenses.getvalue()]
+    if sys.byteorder != 'little':
+        for section in sections:
+            if isinstance(section, array):
+                section.byteswap()
+
+    offsets = []
+    position = HEADER.size
+    for section in sections:
+        position += -position % 8
+        offsets.append(position)
+        position += len(section) * (section.itemsize if isinstance(section, array) else 1)
+
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(record_licenses), len(license_ids), *offsets))
+        for offset, section in zip(offsets, sections):
+            f.write(b'\0' * (offset - f.tell()))
+            f.write(section.tobytes() if isinstance(section, array) else section)
+    os.replace(temporary_path, path)
+    return len(record_licenses)
@@ -0,0 +1,224 @@
+import logging
+import mmap
+import os
+import posixpath
+import tarfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from github import GitHubAPI
+
+# Directories that hold installed packages, VCS data or build output rather
+# than sources; they are never descended into.
+PRUNED_DIRECTORIES = {'node_modules', 'bower_components', '.git', '.hg', '.svn', 'venv', '.venv', '.tox', '.nox',
+                      '__pycache__', '.gradle', 'build', 'target'}
+TARBALL_SUFFIXES = ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tar.xz')
+
+logger = logging.getLogger(__name__)
+
+# Manifests at least this large are memory-mapped instead of read.
+MMAP_THRESHOLD = 1 << 20
+
+# Root manifests that give away the language of a checkout, in order of
+# preference, for root-only discovery.
+LANGUAGE_MANIFESTS = [
+    ("package.json", "JavaScript"),
+    ("requirements.txt", "Python"),
+    ("build.gradle.kts", "Kotlin"),
+    ("build.gradle", "Java"),
+    ("pom.xml", "Java"),
+]
+
+# Every root file root-only discovery may ask for: the manifests, their
+# lockfiles and the Gradle build context. Only these are read from a
+# tarball's root.
+ROOT_FILES = {file_name for file_name, _ in LANGUAGE_MANIFESTS} | {
+    "gradle.lockfile", "package-lock.json", "yarn.lock", "poetry.lock",
+    "gradle.properties", "gradle/libs.versions.toml",
+}
+
+
+def is_local(repo_url):
+    """
+    :return: Whether ``repo_url`` names a directory or tarball on disk rather
+             than a GitHub repository
+    """
+    return os.path.isdir(repo_url) or (repo_url.endswith(TARBALL_SUFFIXES) and os.path.isfile(repo_url))
+
+
+def read_text(path):
+    """
+    Read a UTF-8 file, memory-mapping it when it is large so that the bytes
+    are decoded straight from the page cache.
+    """
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < MMAP_THRESHOLD:
+            return f.read().decode('utf-8')
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return str(mapped, 'utf-8')
+
+
+def is_pruned(path):
+    return any(part in PRUNED_DIRECTORIES for part in path.split('/')[:-1])
+
+
+class LocalRepository:
+    """
+    Stands in for GitHubAPI when the code is already on disk: a checked-out
+    directory or a tarball of one. Nothing goes through GitHub, so no token
+    is needed.
+
+    Directories are walked with ``os.scandir`` on a thread pool, one task
+    per directory, skipping PRUNED_DIRECTORIES and symlinked directories.
+    Tarballs are streamed member by member. Either way only files with one
+    of the requested names are read.
+    """
+
+    group_by_directory = staticmethod(GitHubAPI.group_by_directory)
+
+    def __init__(self, path, workers=16):
+        self.path = path
+        self.workers = workers
+        self.is_tarball = not os.path.isdir(path)
+        self._tarball_files = None
+
+    def get_repo_info(self, repo_url=None):
+        name = os.path.basename(os.path.normpath(self.path))
+        for suffix in TARBALL_SUFFIXES:
+            if name.endswith(suffix):
+                name = name[:-len(suffix)]
+                break
+        return {
+            "name": name,
+            "full_name": os.path.abspath(self.path),
+            "language": self._detect_language(),
+            "default_branch": None,
+        }
+
+    def get_commit_sha(self, repo_url=None, ref=None):
+        """
+        :return: The checked-out commit, read from ``.git`` without running
+                 git, or None for a tarball or a directory that isn't a checkout
+        """
+        if self.is_tarball:
+            return None
+        git_dir = os.path.join(self.path, '.git')
+        try:
+            if os.path.isfile(git_dir):
+                # A worktree or submodule: ".git" points at the real directory.
+                with open(git_dir, encoding='utf-8') as f:
+                    git_dir = os.path.join(self.path, f.read().split('gitdir:', 1)[1].strip())
+            with open(os.path.join(git_dir, 'HEAD'), encoding='utf-8') as f:
+                head = f.read().strip()
+            if not head.startswith('ref:'):
+                return head
+            ref = head[len('ref:'):].strip()
+            ref_path = os.path.join(git_dir, *ref.split('/'))
+            if os.path.isfile(ref_path):
+                with open(ref_path, encoding='utf-8') as f:
+                    return f.read().strip()
+            with open(os.path.join(git_dir, 'packed-refs'), encoding='utf-8') as f:
+                for line in f:
+                    sha, _, name = line.strip().partition(' ')
+                    if name == ref:
+                        return sha
+        except (OSError, IndexError):
+            pass
+        return None
+
+    def get_dependency_file(self, repo_url, file_name):
+        if self.is_tarball:
+            files = self._tarball_root_files()
+            if file_name not in files:
+                raise FileNotFoundError(f"{file_name} not found in {self.path}")
+            return files[file_name]
+        return read_text(os.path.join(self.path, *file_name.split('/')))
+
+    def find_manifests(self, repo_url, ref, file_names, resolver=None):
+        """
+        :return: Dict mapping paths relative to the root ("/"-separated) to
+                 file contents
+        """
+        if self.is_tarball:
+            return self.find_manifests_in_tarball(repo_url, ref, file_names)
+        return self.walk(file_names)
+
+    def find_manifests_in_tarball(self, repo_url, ref, file_names):
+        if not self.is_tarball:
+            return self.walk(file_names)
+        file_names = set(file_names)
+        return self.read_tarball(lambda name: posixpath.basename(name) in file_names and not is_pruned(name))
+
+    def walk(self, file_names):
+        file_names = set(file_names)
+        manifests = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            pending = {pool.submit(self._scan_directory, "", file_names)}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    subdirectories, files = future.result()
+                    manifests.update(files)
+                    pending.update(pool.submit(self._scan_directory, subdirectory, file_names)
+                                   for subdirectory in subdirectories)
+        return manifests
+
+    def _scan_directory(self, relative, file_names):
+        subdirectories = []
+        files = {}
+        try:
+            with os.scandir(os.path.join(self.path, relative) if relative else self.path) as entries:
+                for entry in entries:
+                    path = f"{relative}/{entry.name}" if relative else entry.name
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in PRUNED_DIRECTORIES:
+                            subdirectories.append(path)
+                    elif entry.name in file_names and entry.is_file():
+                        try:
+                            files[path] = read_text(entry.path)
+                        except (OSError, UnicodeDecodeError) as e:
+                            logger.warning("Skipping %s: %s", path, e)
+        except OSError as e:
+            logger.warning("Skipping %s: %s", relative or '.', e)
+        return subdirectories, files
+
+    def read_tarball(self, wanted):
+        """
+        Stream the tarball and read the files whose path ``wanted`` accepts.
+        A single top-level directory, as in GitHub and ``git archive
+        --prefix`` tarballs, is stripped from the paths.
+        """
+        manifests = {}
+        top_levels = set()
+        with tarfile.open(self.path, mode='r|*') as archive:
+            for member in archive:
+                name = member.name[2:] if member.name.startswith('./') else member.name
+                if not name or name == '.':
+                    continue
+                top_levels.add(name.split('/', 1)[0] if '/' in name or member.isdir() else None)
+                if member.isfile() and wanted(name):
+                    try:
+                        manifests[name] = archive.extractfile(member).read().decode('utf-8')
+                    except UnicodeDecodeError as e:
+                        logger.warning("Skipping %s: %s", name, e)
+
+        if len(top_levels) == 1 and None not in top_levels:
+            prefix = f"{top_levels.pop()}/"
+            manifests = {path[len(prefix):]: content for path, content in manifests.items()}
+        return manifests
+
+    def _tarball_root_files(self):
+        # Root files are read once, at the path they'd have with or without
+        # a top-level directory.
+        if self._tarball_files is None:
+            files = self.read_tarball(lambda name: name in ROOT_FILES or name.split('/', 1)[-1] in ROOT_FILES)
+            self._tarball_files = {path: content for path, content in files.items() if path in ROOT_FILES}
+        return self._tarball_files
+
+    def _detect_language(self):
+        for file_name, language in LANGUAGE_MANIFESTS:
+            if self.is_tarball:
+                if file_name in self._tarball_root_files():
+                    return language
+            elif os.path.isfile(os.path.join(self.path, file_name)):
+                return language
+        return None
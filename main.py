@@ -2,86 +2,470 @@ import sys
 import os
 import argparse
 import json
-import csv
+import logging
+import posixpath
+from cache import DEFAULT_CACHE_DIR, MetadataCache
+from client import RegistryClient
 from github import GitHubAPI
-from parsing.java import JavaParser
-from parsing.python import PythonParser
-from parsing.javascript import JavaScriptParser
+from incremental import AnalysisStore, content_hash
+from instrumentation import configure_logging, recorder
+from local import LocalRepository, is_local
+from license_index import LicenseIndex, build_license_index, read_snapshot
+from output import create_sink
+from transport import Transport
+from parsing.registry import parser_class, parser_target
+from parsing.resolver import LicenseResolver
 
-def parse_arguments():
+MANIFEST_LANGUAGES = {
+    "package.json": "javascript",
+    "requirements.txt": "python",
+    "build.gradle.kts": "java",
+    "build.gradle": "java",
+    "pom.xml": "java",
+}
+LOCKFILE_LANGUAGES = {
+    "gradle.lockfile": "java",
+    "package-lock.json": "javascript",
+    "yarn.lock": "javascript",
+    "poetry.lock": "python",
+}
+# Files that don't declare dependencies themselves but feed into a Gradle
+# build: properties and the version catalog in gradle/libs.versions.toml.
+BUILD_CONTEXT_FILES = ["gradle.properties", "libs.versions.toml"]
+GRADLE_CATALOG_PATH = "gradle/libs.versions.toml"
+
+logger = logging.getLogger(__name__)
+
+def parse_arguments(argv=None):
     parser = argparse.ArgumentParser(description="Analyze dependencies of a GitHub repository")
-    parser.add_argument("repo_url", help="URL of the GitHub repository to analyze")
-    parser.add_argument("-o", "--output", choices=["console", "json", "csv", "cyclonedx"], default="console", help="Output format")
-    parser.add_argument("-v", "--verbose", action="store_true", help="Increase output verbosity")
+    parser.add_argument("repo_url", nargs="?",
+                        help="URL of the GitHub repository to analyze, or a local checkout or tarball")
+    parser.add_argument("-o", "--output", choices=["console", "json", "jsonl", "csv", "cyclonedx"], default="console", help="Output format")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Log debug diagnostics to stderr")
+    parser.add_argument("--stats", action="store_true",
+                        help="Print time per phase, span and host, request counts and cache hits to stderr at the end")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="Write timing spans of every phase and request to FILE in Chrome trace event format")
     parser.add_argument("--internal-packages", nargs='+', default=None, help="List of internal package names")
-    return parser.parse_args()
-
-def get_parser(language):
-    if language.lower() == 'java':
-        return JavaParser()
-    elif language.lower() == 'python':
-        return PythonParser()
-    elif language.lower() == 'javascript' or language.lower() == 'typescript':
-        return JavaScriptParser()
-    else:
-        raise ValueError(f"Unsupported language: {language}")
-
-def main(repo_url):
-    args = parse_arguments()
-    
-    github_token = os.environ.get('GITHUB_TOKEN')
-    if not github_token:
-        print("Please set the GITHUB_TOKEN environment variable.")
-        sys.exit(1)
+    parser.add_argument("--concurrency", type=int, default=16, help="Maximum number of registry lookups in flight")
+    parser.add_argument("--per-host-limit", type=int, default=8, help="Maximum number of concurrent lookups per registry host")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="Directory for the persistent registry metadata cache")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the persistent registry metadata cache")
+    parser.add_argument("--offline", action="store_true", help="Serve all metadata from the cache and never touch the network")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Reuse the last run's results for unchanged commits and manifests, and its licenses "
+                             "for unchanged dependencies (stored in --cache-dir)")
+    parser.add_argument("--license-index", metavar="PATH",
+                        help="Offline license index consulted before any registry request")
+    parser.add_argument("--build-license-index", nargs="+", metavar="SNAPSHOT",
+                        help="Build the --license-index file from snapshot files (JSON Lines or CSV records of "
+                             "ecosystem, name, version and license, optionally gzipped) and exit")
+    parser.add_argument("--advisories", nargs="+", metavar="PATH",
+                        help="Match every dependency against OSV advisories read from these files or directories "
+                             "(OSV JSON, osv.dev all.zip exports or JSON Lines)")
+    parser.add_argument("--discovery", choices=["root", "tree", "tarball"],
+                        help="Where to look for manifests: the repository root only, the whole repository via one "
+                             "recursive tree listing, or the whole repository via a streamed tarball (default: "
+                             "root for GitHub repositories, the whole tree for local ones)")
+    parser.add_argument("--transitive", action="store_true",
+                        help="Read lockfiles (package-lock.json, yarn.lock, poetry.lock, gradle.lockfile) and "
+                             "report the full transitive dependency graph")
+    parser.add_argument("--batch", metavar="FILE",
+                        help="Analyze every repository URL listed in FILE (one per line, '-' for stdin) "
+                             "and write one JSON result per line")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Number of worker processes in batch mode, or of job threads with --serve")
+    parser.add_argument("--serve", metavar="[HOST:]PORT",
+                        help="Run as a service with an HTTP API for analysis jobs, listening on HOST (default "
+                             "127.0.0.1) and PORT")
+    parser.add_argument("--jobs-per-host", type=int, default=4,
+                        help="With --serve, maximum number of jobs running at once against one source host")
+    parser.add_argument("--serve-root", metavar="DIR",
+                        help="With --serve, let jobs analyze local checkouts and tarballs under DIR; without it "
+                             "jobs can only name GitHub repositories or post their files")
+    args = parser.parse_args(argv)
+    if args.offline and args.no_cache:
+        parser.error("--offline cannot be combined with --no-cache")
+    if args.incremental and args.no_cache:
+        parser.error("--incremental cannot be combined with --no-cache, since its results are kept in the cache "
+                     "directory")
+    if args.build_license_index and not args.license_index:
+        parser.error("--build-license-index needs --license-index to say where to write the index")
+    if not args.repo_url and not args.batch and not args.build_license_index and not args.serve:
+        parser.error("either repo_url, --batch or --serve is required")
+    if args.serve_root and not args.serve:
+        parser.error("--serve-root needs --serve")
+    # With --serve the default is decided per job.
+    if args.discovery is None and not args.serve:
+        args.discovery = "tree" if args.repo_url and not args.batch and is_local(args.repo_url) else "root"
+    return args
 
-    github_api = GitHubAPI(github_token)
+def get_parser(language, resolver=None, client=None, license_index=None):
+    # The parser's module is only imported here, see parsing/registry.py.
+    return parser_class(language)(resolver=resolver, client=client, license_index=license_index)
 
-    try:
-        repo_info = github_api.get_repo_info(repo_url)
-        language = repo_info['language']
-        print(f"Detected language: {language}")
+def parse_java_dependencies(parser, gradle_file, lockfile, scan=None, known_licenses=None):
+    if lockfile is not None:
+        try:
+            return parser.iter_dependencies(gradle_file, lockfile, scan, known_licenses)
+        except Exception as e:
+            logger.debug("Lockfile couldn't be parsed. Falling back to gradle file only. Error: %s", e)
+    return parser.iter_dependencies(gradle_file, scan=scan, known_licenses=known_licenses)
+
+def create_services(args):
+    cache = None if args.no_cache else MetadataCache(args.cache_dir)
+    transport = Transport(pool_size=args.per_host_limit)
+    client = RegistryClient(cache, offline=args.offline, transport=transport)
+    resolver = LicenseResolver(max_workers=args.concurrency, per_host_limit=args.per_host_limit)
+    return cache, transport, client, resolver
 
-        parser = get_parser(language)
-        
-        if isinstance(parser, JavaParser) and args.internal_packages:
-            parser.set_internal_packages(args.internal_packages)
+def close_services(cache, transport, client, resolver):
+    resolver.shutdown()
+    logger.debug("Metadata cache: %s hits, %s revalidated, %s fetched, %s coalesced",
+                 client.stats['hits'], client.stats['revalidated'], client.stats['misses'], client.stats['coalesced'])
+    for host, stats in transport.stats().items():
+        logger.debug("%s: %s requests over %s connections, %s retries, throttled %s times (%ss), statuses %s",
+                     host, stats['requests'], stats['connections'], stats['retries'], stats['throttled'],
+                     stats['throttle_wait'], stats['statuses'])
+    transport.close()
+    if cache is not None:
+        cache.close()
 
-        if isinstance(parser, JavaParser):
-            gradle_file = github_api.get_dependency_file(repo_url, parser.get_dependency_file_name())
+def get_language_parser(language, parsers, args, resolver, client):
+    # Languages with the same parser (TypeScript and JavaScript, Kotlin and Java) share it.
+    key = parser_target(language)
+    if key not in parsers:
+        license_index = LicenseIndex.shared(args.license_index) if args.license_index else None
+        parsers[key] = get_parser(language, resolver, client, license_index)
+        if hasattr(parsers[key], 'set_internal_packages') and args.internal_packages:
+            parsers[key].set_internal_packages(args.internal_packages)
+    return parsers[key]
+
+def is_java(parser):
+    return parser.ecosystem == 'maven'
+
+def java_build_context(manifests=None, catalogs=None):
+    """
+    :param manifests: Dict mapping repository paths to contents, to pick the
+                      version catalogs from
+    :return: JavaBuildContext, or None if there are manifests but no Java
+             build among them, so that other scans don't import the Java parser
+    """
+    if manifests is not None and not any(MANIFEST_LANGUAGES.get(posixpath.basename(path)) == "java"
+                                         for path in manifests):
+        return None
+    from parsing.java import JavaBuildContext
+    if manifests is not None:
+        return JavaBuildContext.from_manifests(manifests)
+    return JavaBuildContext(catalogs)
+
+def wanted_lockfiles(parser, args):
+    # The gradle lockfile has always been used to pin versions; the others
+    # are only needed for the transitive graph.
+    if args.transitive:
+        return parser.get_lockfile_names()
+    if is_java(parser):
+        return [parser.get_lockfile_name()]
+    return []
+
+def analyze_project(parser, manifest, files, args, scan=None, known_licenses=None):
+    """
+    Analyze one parser's manifest, using a lockfile from ``files`` for the
+    transitive graph when requested.
+
+    :param manifest: Manifest content, or None if only a lockfile was found
+    :param files: Dict mapping file names to contents in the same directory
+    :param scan: BuildScan of a Java build file, from JavaBuildContext
+    :param known_licenses: Licenses by (name, version) that needn't be looked up again
+    :return: Tuple of (dependencies, graph) where dependencies is an iterator
+             that resolves licenses as it is consumed and graph is the
+             DependencyGraph or None
+    """
+    if args.transitive:
+        for lockfile_name in parser.get_lockfile_names():
+            if lockfile_name not in files:
+                continue
             try:
-                lockfile = github_api.get_dependency_file(repo_url, parser.get_lockfile_name())
-                dependencies = parser.parse_dependencies(gradle_file, lockfile)
+                with recorder.span("parse", lockfile=lockfile_name):
+                    graph = parser.build_graph(manifest, lockfile_name, files[lockfile_name])
+                    return parser.iter_resolved(graph.to_dependencies(parser.ecosystem), known_licenses), graph
             except Exception as e:
-                if args.verbose:
-                    print(f"Lockfile not found or couldn't be parsed. Falling back to gradle file only. Error: {str(e)}")
-                dependencies = parser.parse_dependencies(gradle_file)
+                logger.debug("%s couldn't be parsed. Falling back to the manifest only. Error: %s", lockfile_name, e)
+
+    if manifest is None:
+        return iter(()), None
+    with recorder.span("parse", ecosystem=parser.ecosystem):
+        if is_java(parser):
+            return parse_java_dependencies(parser, manifest, files.get(parser.get_lockfile_name()),
+                                           scan, known_licenses), None
+        return parser.iter_dependencies(manifest, known_licenses), None
+
+def analyze_directory(files, parsers, args, resolver, client, directory="", build_context=None, run=None):
+    """
+    Run every parser that has a manifest (or, with --transitive, a lockfile)
+    in one directory.
+
+    :param files: Dict mapping file names to contents for a single directory
+    :param parsers: Dict of parsers by language, reused across directories
+    :param build_context: JavaBuildContext shared by the directories of one repository
+    :param run: RepositoryRun for --incremental; unchanged manifests are served
+                from it and changed ones reuse its licenses
+    :return: List of (manifest name, parser, dependencies, graph) tuples, see analyze_project
+    """
+    languages = {}
+    for file_name, language in MANIFEST_LANGUAGES.items():
+        if file_name in files:
+            languages.setdefault(language, file_name)
+    if args.transitive:
+        for file_name, language in LOCKFILE_LANGUAGES.items():
+            if file_name in files:
+                languages.setdefault(language, None)
+
+    results = []
+    for language, manifest_name in languages.items():
+        parser = get_language_parser(language, parsers, args, resolver, client)
+        manifest = files[manifest_name] if manifest_name else None
+        scan = None
+        if is_java(parser) and manifest is not None:
+            build_context = build_context or java_build_context()
+            scan = build_context.scan(parser, directory, manifest, files.get("gradle.properties"))
+        label = manifest_name or parser.get_dependency_file_name()
+
+        if run is None:
+            dependencies, graph = analyze_project(parser, manifest, files, args, scan)
+            results.append((label, parser, dependencies, graph))
+            continue
+
+        # Only this parser's own files count, so editing requirements.txt leaves
+        # the package.json next to it alone. A Java build also depends on what
+        # it inherits, which the scan captures.
+        inputs = {name: files[name] for name in [manifest_name] + wanted_lockfiles(parser, args) if name in files}
+        digest = content_hash(inputs, scan_fingerprint(scan) if scan is not None else None)
+        # Stored results have no graph, so --transitive always rebuilds it.
+        stored = None if args.transitive else run.unchanged(directory, label, digest)
+        if stored is not None:
+            results.append((label, parser, stored, None))
+            continue
+        known = run.known_licenses(directory, label)
+        dependencies, graph = analyze_project(parser, manifest, files, args, scan, known)
+        results.append((label, parser, run.track(directory, label, digest, dependencies, known), graph))
+    return results
+
+def scan_fingerprint(scan):
+    return [scan.properties, sorted(map(list, scan.managed.items())),
+            [(declaration.name, declaration.version) for declaration in scan.declarations]]
+
+def analysis_options(args):
+    # Options that change what a manifest resolves to; results from runs with
+    # different options are kept apart.
+    return json.dumps({
+        "discovery": args.discovery,
+        "transitive": args.transitive,
+        "internal_packages": sorted(args.internal_packages or []),
+        "license_index": os.path.abspath(args.license_index) if args.license_index else None,
+    }, sort_keys=True)
+
+def begin_run(repo_url, repo_info, args, github_api, store):
+    try:
+        commit_sha = github_api.get_commit_sha(repo_url, repo_info['default_branch'])
+    except Exception as e:
+        commit_sha = None
+        logger.debug("Could not read the head commit, comparing manifests only. Error: %s", e)
+    run = store.begin(repo_info.get('full_name') or repo_url, analysis_options(args), commit_sha)
+    repo_info['incremental'] = run.stats
+    return run
+
+def finish_run(run, groups):
+    """
+    Pass the groups through and store the run once they have all been consumed.
+    """
+    yield from groups
+    run.finish()
+    logger.info(run.report())
+
+def fetch_root_manifest(github_api, repo_url, parser):
+    """
+    :return: Tuple of (file name, content) for the first of the parser's
+             manifest files that exists at the repository root
+    """
+    file_names = parser.get_dependency_file_names()
+    for file_name in file_names[:-1]:
+        try:
+            return file_name, github_api.get_dependency_file(repo_url, file_name)
+        except Exception:
+            continue
+    return file_names[-1], github_api.get_dependency_file(repo_url, file_names[-1])
+
+def analyze_repository(repo_url, args, github_api, resolver, client, parsers=None, store=None):
+    """
+    Fetch and analyze the manifests of one repository.
+
+    :param parsers: Dict of parsers by language; pass the same dict for several
+                    repositories to share their per-run state
+    :param store: AnalysisStore for --incremental runs
+    :return: Tuple of (repo_info, groups) where groups is an iterable of
+             (path, manifest name, parser, dependencies, graph) tuples. Dependencies are
+             resolved lazily as the groups are consumed, and matched against
+             --advisories on the way out.
+    """
+    repo_info, groups = find_groups(repo_url, args, github_api, resolver, client, parsers, store)
+    if args.advisories:
+        from advisories import AdvisoryIndex
+        with recorder.span("load advisories"):
+            index = AdvisoryIndex.shared(args.advisories)
+        groups = index.annotate_groups(groups)
+    return repo_info, groups
+
+def find_groups(repo_url, args, github_api, resolver, client, parsers=None, store=None):
+    """
+    Fetch the manifests of one repository and set up their analysis, see
+    analyze_repository.
+    """
+    parsers = {} if parsers is None else parsers
+    with recorder.span("repository info", repo=repo_url):
+        repo_info = github_api.get_repo_info(repo_url)
+    language = repo_info['language']
+    logger.info("Detected language: %s", language)
+
+    run = begin_run(repo_url, repo_info, args, github_api, store) if store is not None else None
+    if run is not None and run.commit_unchanged() and not args.transitive:
+        return repo_info, finish_run(run, (
+            (path, manifest_name, get_language_parser(MANIFEST_LANGUAGES[manifest_name], parsers, args, resolver, client),
+             dependencies, None)
+            for path, manifest_name, dependencies in run.replay()))
+
+    if args.discovery == "root":
+        if not language:
+            raise ValueError("Could not detect the repository language")
+        parser = get_language_parser(language, parsers, args, resolver, client)
+
+        with recorder.span("discover", discovery=args.discovery):
+            manifest_name, manifest = fetch_root_manifest(github_api, repo_url, parser)
+            files = {}
+            extra_files = wanted_lockfiles(parser, args)
+            if is_java(parser):
+                extra_files += ["gradle.properties", GRADLE_CATALOG_PATH]
+            for file_name in extra_files:
+                try:
+                    files[file_name] = github_api.get_dependency_file(repo_url, file_name)
+                except Exception as e:
+                    logger.debug("%s not found. Error: %s", file_name, e)
+
+        build_context = (java_build_context(catalogs={"": files.pop(GRADLE_CATALOG_PATH)} if GRADLE_CATALOG_PATH in files
+                                            else None) if is_java(parser) else None)
+        _, parser, dependencies, graph = analyze_directory({manifest_name: manifest, **files},
+                                                           parsers, args, resolver, client,
+                                                           "", build_context, run)[0]
+        groups = [("", manifest_name, parser, dependencies, graph)]
+        return repo_info, finish_run(run, groups) if run is not None else groups
+
+    file_names = list(MANIFEST_LANGUAGES) + BUILD_CONTEXT_FILES
+    file_names += [name for name, lockfile_language in LOCKFILE_LANGUAGES.items()
+                   if args.transitive or lockfile_language == "java"]
+    ref = repo_info['default_branch']
+    with recorder.span("discover", discovery=args.discovery):
+        if args.discovery == "tree":
+            manifests = github_api.find_manifests(repo_url, ref, file_names, resolver)
+        else:
+            manifests = github_api.find_manifests_in_tarball(repo_url, ref, file_names)
+    logger.info("Found %s manifest files", len(manifests))
+
+    build_context = java_build_context(manifests)
+
+    def groups():
+        for directory, files in github_api.group_by_directory(manifests).items():
+            for manifest_name, parser, dependencies, graph in analyze_directory(files, parsers, args, resolver, client,
+                                                                                directory, build_context, run):
+                yield directory, manifest_name, parser, dependencies, graph
+
+    return repo_info, finish_run(run, groups()) if run is not None else groups()
+
+def group_records(groups):
+    return [{"path": path, "manifest": manifest_name, "ecosystem": parser.ecosystem,
+             "dependencies": [dep.to_dict() for dep in dependencies]}
+            for path, manifest_name, parser, dependencies, _ in groups]
+
+def repository_source(repo_url, github_api, args):
+    """
+    :return: A LocalRepository for a path on disk, otherwise ``github_api``
+    """
+    if is_local(repo_url):
+        return LocalRepository(repo_url, workers=args.concurrency)
+    return github_api
+
+def write_output(args, repo_info, groups):
+    sink = create_sink(args.output, sys.stdout, grouped=args.discovery != "root",
+                       vulnerabilities=bool(args.advisories))
+    # Licenses are looked up as the sink consumes the groups, so this span
+    # contains the resolution of every dependency.
+    with recorder.span("resolve and write", output=args.output):
+        sink.write_groups(repo_info, groups)
+
+def report_instrumentation(args):
+    if args.stats:
+        print("\n".join(recorder.summary()), file=sys.stderr)
+    if args.trace:
+        recorder.write_trace(args.trace)
+        logger.info("Wrote trace to %s", args.trace)
+
+def build_index(args):
+    records = (record for path in args.build_license_index for record in read_snapshot(path))
+    count = build_license_index(records, args.license_index)
+    print(f"Wrote {count} records to {args.license_index}")
+
+def main():
+    args = parse_arguments()
+    configure_logging(args.verbose)
+    if args.stats or args.trace:
+        recorder.enable()
+
+    if args.build_license_index:
+        build_index(args)
+        return
+
+    # Local checkouts and tarballs are read from disk and need no token.
+    github_token = os.environ.get('GITHUB_TOKEN')
+
+    if args.serve:
+        from service import serve
+        serve(args)
+        report_instrumentation(args)
+        return
+
+    if args.batch:
+        from fleet import read_repo_urls, run_fleet
+        if args.batch == "-":
+            repo_urls = read_repo_urls(sys.stdin)
         else:
-            dependency_file = github_api.get_dependency_file(repo_url, parser.get_dependency_file_name())
-            dependencies = parser.parse_dependencies(dependency_file)
-
-        if args.output == "console":
-            for dep in dependencies:
-                print(f"Name: {dep.name}, Version: {dep.version}, License: {dep.license}")
-        elif args.output == "json":
-            print(json.dumps([dep.__dict__ for dep in dependencies], indent=2))
-        elif args.output == "csv":
-            writer = csv.writer(sys.stdout)
-            writer.writerow(["Name", "Version", "License"])
-            for dep in dependencies:
-                writer.writerow([dep.name, dep.version, dep.license])
-        elif args.output == "cyclonedx":
-            if isinstance(parser, JavaScriptParser):
-                print(parser.generate_cyclonedx_sbom(repo_info, dependencies))
-            else:
-                print("CycloneDX SBOM generation is currently only supported for JavaScript projects.")
+            with open(args.batch) as f:
+                repo_urls = read_repo_urls(f)
+        if not github_token and not all(is_local(repo_url) for repo_url in repo_urls):
+            logger.error("Please set the GITHUB_TOKEN environment variable.")
+            sys.exit(1)
+        failures = run_fleet(repo_urls, args, sys.stdout)
+        report_instrumentation(args)
+        sys.exit(1 if failures else 0)
+
+    if not github_token and not is_local(args.repo_url):
+        logger.error("Please set the GITHUB_TOKEN environment variable.")
+        sys.exit(1)
+
+    cache, transport, client, resolver = create_services(args)
+    github_api = repository_source(args.repo_url, GitHubAPI(github_token, client), args)
+    store = AnalysisStore(args.cache_dir) if args.incremental else None
+
+    try:
+        repo_info, groups = analyze_repository(args.repo_url, args, github_api, resolver, client, store=store)
+        write_output(args, repo_info, groups)
 
     except Exception as e:
-        print(f"An error occurred: {str(e)}")
-        if args.verbose:
-            import traceback
-            print(traceback.format_exc())
+        logger.error("An error occurred: %s", e, exc_info=args.verbose)
         sys.exit(1)
+    finally:
+        close_services(cache, transport, client, resolver)
+        if store is not None:
+            store.close()
+        report_instrumentation(args)
 
 if __name__ == "__main__":
-    args = parse_arguments()
-    main(args.repo_url)
\ No newline at end of file
+    main()
@@ -0,0 +1,152 @@
+import json
+from array import array
+from collections import Counter
+from models.dependency import Dependency
+from models.strings import StringTable
+
+COLUMNS = ('repo', 'path', 'manifest', 'ecosystem', 'name', 'version', 'license')
+
+
+class DependencyBatch:
+    """
+    Columnar, array-backed table of dependency rows across many
+    repositories, for aggregating fleet results.
+
+    Like DependencyGraph, every string goes into a shared StringTable and
+    each column is an ``array('I')`` of string ids, so a row
+    costs 28 bytes however often its strings repeat. Dedupe and group-by
+    work on the integer ids and only turn them back into strings for the
+    result.
+    """
+
+    def __init__(self, strings=None):
+        """
+        :param strings: StringTable to share, e.g. with the batch rows are taken from
+        """
+        self._table = StringTable() if strings is None else strings
+        # The bare list, for indexing in the loops below.
+        self._strings = self._table.strings
+        self._columns = {column: array('I') for column in COLUMNS}
+
+    @classmethod
+    def from_records(cls, records):
+        """
+        Build a batch from ``--batch`` output records. Failed repositories
+        are skipped.
+        """
+        batch = cls()
+        for record in records:
+            if record.get('status', 'ok') != 'ok':
+                continue
+            for project in record.get('projects', []):
+                for dep in project['dependencies']:
+                    batch.add(record['repo'], project['path'], project['manifest'], project.get('ecosystem'),
+                              dep['name'], dep['version'], dep['license'])
+        return batch
+
+    @classmethod
+    def from_jsonl(cls, path):
+        """
+        Build a batch from a file of ``--batch`` output, one record at a
+        time.
+        """
+        with open(path, encoding='utf-8') as f:
+            return cls.from_records(json.loads(line) for line in f if line.strip())
+
+    def __len__(self):
+        return len(self._columns['name'])
+
+    def intern(self, value):
+        return self._table.intern(value)
+
+    def add(self, repo, path, manifest, ecosystem, name, version, license):
+        for column, value in zip(COLUMNS, (repo, path, manifest, ecosystem, name, version, license)):
+            self._columns[column].append(self.intern(value))
+
+    def extend(self, repo, path, manifest, dependencies):
+        """
+        Add the Dependency objects of one manifest.
+        """
+        for dep in dependencies:
+            self.add(repo, path, manifest, dep.ecosystem, dep.name, dep.version, dep.license)
+
+    def column(self, column):
+        """
+        :return: The values of one column, as strings
+        """
+        strings = self._strings
+        return [strings[string_id] for string_id in self._columns[column]]
+
+    def row(self, position):
+        return {column: self._strings[self._columns[column][position]] for column in COLUMNS}
+
+    def dependencies(self):
+        """
+        Yield a Dependency per row.
+        """
+        strings = self._strings
+        columns = self._columns
+        for ecosystem, name, version, license in zip(columns['ecosystem'], columns['name'], columns['version'],
+                                                     columns['license']):
+            yield Dependency(strings[name], strings[version], strings[license], strings[ecosystem])
+
+    def _keys(self, columns):
+        if len(columns) == 1:
+            return self._columns[columns[0]]
+        return zip(*(self._columns[column] for column in columns))
+
+    def _decode(self, key, columns):
+        if len(columns) == 1:
+            return self._strings[key]
+        return tuple(self._strings[string_id] for string_id in key)
+
+    def group_by(self, *columns):
+        """
+        :return: Dict mapping each distinct value of ``columns`` (a tuple
+                 when several are given) to an array of its row positions,
+                 in order of first appearance
+        """
+        groups = {}
+        for position, key in enumerate(self._keys(columns)):
+            rows = groups.get(key)
+            if rows is None:
+                rows = groups[key] = array('I')
+            rows.append(position)
+        return {self._decode(key, columns): rows for key, rows in groups.items()}
+
+    def count_by(self, *columns):
+        """
+        :return: Counter of rows per distinct value of ``columns``
+        """
+        counts = Counter(self._keys(columns))
+        return Counter({self._decode(key, columns): count for key, count in counts.items()})
+
+    def unique(self, *columns):
+        """
+        Dedupe on ``columns`` (all of them by default), keeping the first row
+        of every distinct value.
+
+        :return: A new DependencyBatch
+        """
+        columns = columns or COLUMNS
+        seen = {}
+        for position, key in enumerate(self._keys(columns)):
+            seen.setdefault(key, position)
+        return self.take(seen.values())
+
+    def take(self, positions):
+        """
+        :return: A new DependencyBatch with the rows at ``positions``, sharing
+                 this batch's string table
+        """
+        positions = array('I', positions)
+        batch = DependencyBatch(self._table)
+        for column, values in self._columns.items():
+            batch._columns[column] = array('I', (values[position] for position in positions))
+        return batch
+
+    def memory_usage(self):
+        """
+        :return: Approximate bytes used by the batch, including the string table
+        """
+        return sum(values.itemsize * len(values) for values in self._columns.values()) + self._table.memory_usage()
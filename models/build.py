@@ -0,0 +1,37 @@
+class Declaration:
+    """
+    One dependency declared in a build file, before license resolution.
+
+    ``version`` is None when the build file doesn't give one (e.g. when a
+    platform BOM manages it).
+    """
+
+    def __init__(self, group_id, artifact_id, version=None, configuration=None, platform=False):
+        self.group_id = group_id
+        self.artifact_id = artifact_id
+        self.version = version
+        self.configuration = configuration
+        self.platform = platform
+
+    @property
+    def name(self):
+        return f"{self.group_id}:{self.artifact_id}"
+
+
+class BuildScan:
+    """
+    What a Gradle or Maven build file contributes: its dependency
+    declarations, the properties visible to it (its own merged over those
+    it inherits) and managed versions from ``dependencyManagement``.
+
+    A subproject's scan starts from its parent's, so properties and managed
+    versions flow down a multi-module build.
+    """
+
+    def __init__(self, parent=None):
+        self.declarations = []
+        self.properties = dict(parent.properties) if parent is not None else {}
+        self.managed = dict(parent.managed) if parent is not None else {}
+
+    def managed_version(self, group_id, artifact_id):
+        return self.managed.get((group_id, artifact_id))
@@ -1,5 +1,112 @@
+import re
+import sys
+
+# Versions that stand for "not pinned" rather than a real version; they are
+# left out of package URLs.
+UNPINNED_VERSIONS = {'', 'Unknown', 'Latest'}
+
+# License of a dependency whose registry lookup failed, as opposed to one the
+# registry has no license for ("Unknown"). Only these are looked up again by
+# the next incremental run.
+LOOKUP_FAILED = 'Error fetching information'
+
+_PYTHON_NAME_SEPARATORS = re.compile(r'[-_.]+')
+
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+
+def package_url(ecosystem, name, version=None):
+    """
+    Package URL (purl) of a package, also used as its CycloneDX bom-ref.
+
+    npm keeps the name as written, scope included, matching the bom-refs of
+    earlier SBOMs. PyPI names are normalized and Maven ``group:artifact``
+    names become ``group/artifact``.
+    """
+    if ecosystem == 'npm':
+        return f"pkg:npm/{name}@{version}"
+    if ecosystem == 'pypi':
+        name = _PYTHON_NAME_SEPARATORS.sub('-', name).lower()
+    elif ecosystem == 'maven':
+        name = name.replace(':', '/', 1)
+    elif ecosystem is None:
+        return None
+    purl = f"pkg:{ecosystem}/{name}"
+    return purl if version in UNPINNED_VERSIONS or version is None else f"{purl}@{version}"
+
+
+class _UnknownVulnerabilities(tuple):
+    """
+    Type of UNKNOWN_VULNERABILITIES: empty, so code that lists the matched
+    advisories lists none, but told apart from a clean result by identity.
+    """
+
+    __slots__ = ()
+
+    def __reduce__(self):
+        return 'UNKNOWN_VULNERABILITIES'
+
+    def __repr__(self):
+        return 'UNKNOWN_VULNERABILITIES'
+
+
+# ``vulnerabilities`` of a dependency whose version couldn't be resolved to
+# check it against the advisories, e.g. a range no published version meets.
+UNKNOWN_VULNERABILITIES = _UnknownVulnerabilities()
+
+
 class Dependency:
-    def __init__(self, name, version, license):
-        self.name = name
-        self.version = version
-        self.license = license
\ No newline at end of file
+    """
+    One package with its resolved license.
+
+    Slotted, with the name, version, license and ecosystem interned, since a
+    fleet run holds millions of these and most of them share those strings.
+    ``purl`` is computed on first use and cached; ``ecosystem`` is None for
+    dependencies of unknown origin, which have no purl. ``vulnerabilities``
+    is None unless advisories were checked, and then a tuple of Advisories,
+    or UNKNOWN_VULNERABILITIES if the version couldn't be resolved.
+    """
+
+    __slots__ = ('name', 'version', '_license', 'ecosystem', '_purl', 'vulnerabilities')
+
+    def __init__(self, name, version, license, ecosystem=None):
+        self.name = _intern(name)
+        self.version = _intern(version)
+        self._license = _intern(license)
+        self.ecosystem = _intern(ecosystem)
+        self._purl = None
+        self.vulnerabilities = None
+
+    @property
+    def license(self):
+        return self._license
+
+    @license.setter
+    def license(self, value):
+        self._license = _intern(value)
+
+    @property
+    def purl(self):
+        if self._purl is None:
+            self._purl = package_url(self.ecosystem, self.name, self.version)
+        return self._purl
+
+    @property
+    def bom_ref(self):
+        return self.purl
+
+    def to_dict(self):
+        """
+        :return: The fields written by the JSON outputs
+        """
+        record = {"name": self.name, "version": self.version, "license": self.license}
+        if self.vulnerabilities is UNKNOWN_VULNERABILITIES:
+            record["vulnerabilities"] = None
+        elif self.vulnerabilities is not None:
+            record["vulnerabilities"] = [advisory.id for advisory in self.vulnerabilities]
+        return record
+
+    def __repr__(self):
+        return f"Dependency({self.name!r}, {self.version!r}, {self.license!r}, {self.ecosystem!r})"
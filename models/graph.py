@@ -0,0 +1,145 @@
+import sys
+from array import array
+from models.dependency import Dependency
+from models.strings import StringTable
+
+DIRECT = 1
+DEV = 2
+OPTIONAL = 4
+
+
+class DependencyGraph:
+    """
+    Compact, array-backed dependency graph.
+
+    Names, versions and licenses are interned into a shared string table and
+    nodes only store integer ids. Edges are collected in two flat arrays and
+    packed into CSR form (an offsets array plus a targets array) by
+    ``freeze``, so a 20k-node npm tree fits in a few MB.
+
+    Node 0 is the root project; its edges point at the direct dependencies.
+    """
+
+    ROOT = 0
+
+    def __init__(self, root_name="", root_version=""):
+        self._table = StringTable()
+        self._strings = self._table.strings
+        self._node_ids = {}
+        self.names = array('I')
+        self.versions = array('I')
+        self.licenses = array('I')
+        self.flags = array('B')
+        self._sources = array('I')
+        self._targets = array('I')
+        self._offsets = None
+        self._adjacency = None
+        self.add_node(root_name, root_version)
+
+    def __len__(self):
+        return len(self.names)
+
+    def intern(self, value):
+        return self._table.intern(value)
+
+    def string(self, string_id):
+        return self._strings[string_id]
+
+    def add_node(self, name, version, license=None, flags=0):
+        """
+        Add a package, or return the existing node for the same name and
+        version. Flags and a license are merged into an existing node.
+        """
+        key = (self.intern(name), self.intern(version))
+        node = self._node_ids.get(key)
+        if node is None:
+            node = len(self.names)
+            self._node_ids[key] = node
+            self.names.append(key[0])
+            self.versions.append(key[1])
+            self.licenses.append(self.intern(license))
+            self.flags.append(flags)
+        else:
+            self.flags[node] |= flags
+            if license and not self.licenses[node]:
+                self.licenses[node] = self.intern(license)
+        return node
+
+    def find(self, name, version):
+        return self._node_ids.get((self._table.find(name), self._table.find(version)))
+
+    def add_edge(self, source, target):
+        self._sources.append(source)
+        self._targets.append(target)
+        self._offsets = None
+
+    def freeze(self):
+        """
+        Pack the collected edges into CSR arrays, dropping duplicates.
+        """
+        node_count = len(self.names)
+        counts = array('I', bytes(4 * (node_count + 1)))
+        edges = sorted(set(zip(self._sources, self._targets)))
+        for source, _ in edges:
+            counts[source + 1] += 1
+        for node in range(node_count):
+            counts[node + 1] += counts[node]
+        self._offsets = counts
+        self._adjacency = array('I', (target for _, target in edges))
+        self._sources = array('I', (source for source, _ in edges))
+        self._targets = self._adjacency
+        return self
+
+    def dependencies_of(self, node):
+        if self._offsets is None:
+            self.freeze()
+        return self._adjacency[self._offsets[node]:self._offsets[node + 1]]
+
+    def edge_count(self):
+        return len(self._sources)
+
+    def name(self, node):
+        return self._strings[self.names[node]]
+
+    def version(self, node):
+        return self._strings[self.versions[node]]
+
+    def license(self, node):
+        return self._strings[self.licenses[node]]
+
+    def is_direct(self, node):
+        return bool(self.flags[node] & DIRECT)
+
+    def mark_direct(self, node, flags=0):
+        self.add_edge(self.ROOT, node)
+        self.flags[node] |= DIRECT | flags
+
+    def mark_unreferenced_as_direct(self):
+        """
+        For lockfiles that don't record the root's dependencies, treat every
+        package nothing else depends on as a direct dependency.
+        """
+        referenced = set(self._targets)
+        for node in range(1, len(self.names)):
+            if node not in referenced:
+                self.mark_direct(node)
+
+    def nodes(self):
+        return range(1, len(self.names))
+
+    def to_dependencies(self, ecosystem=None):
+        """
+        :return: A Dependency for every package in the graph, direct
+                 dependencies first, in insertion order otherwise
+        """
+        ordered = sorted(self.nodes(), key=lambda node: not self.is_direct(node))
+        return [Dependency(self.name(node), self.version(node), self.license(node), ecosystem) for node in ordered]
+
+    def memory_usage(self):
+        """
+        :return: Approximate bytes used by the graph, including the string table
+        """
+        arrays = {id(a): a for a in (self.names, self.versions, self.licenses, self.flags, self._sources,
+                                     self._targets, self._offsets, self._adjacency) if a is not None}
+        total = sum(a.itemsize * len(a) for a in arrays.values())
+        return total + sys.getsizeof(self._node_ids) + self._table.memory_usage()
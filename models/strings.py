@@ -0,0 +1,41 @@
+import sys
+
+
+class StringTable:
+    """
+    Interned strings shared by the array-backed models, DependencyGraph and
+    DependencyBatch: every distinct string is stored once and referred to
+    by its index in ``strings``. Id 0 stands for None.
+    """
+
+    __slots__ = ('strings', 'ids')
+
+    def __init__(self):
+        self.strings = [None]
+        self.ids = {}
+
+    def __len__(self):
+        return len(self.strings)
+
+    def intern(self, value):
+        if value is None:
+            return 0
+        string_id = self.ids.get(value)
+        if string_id is None:
+            string_id = len(self.strings)
+            self.strings.append(sys.intern(value))
+            self.ids[value] = string_id
+        return string_id
+
+    def find(self, value):
+        """
+        :return: The id of ``value``, or -1 if it was never interned
+        """
+        return self.ids.get(value, -1)
+
+    def memory_usage(self):
+        """
+        :return: Approximate bytes used by the table and its strings
+        """
+        total = sys.getsizeof(self.strings) + sys.getsizeof(self.ids)
+        return total + sum(sys.getsizeof(value) for value in self.strings if value is not None)
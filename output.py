@@ -0,0 +1,286 @@
+import csv
+import json
+import sys
+import textwrap
+from abc import ABC, abstractmethod
+from datetime import datetime
+from uuid import uuid4
+from models.dependency import UNKNOWN_VULNERABILITIES
+from sbom import SbomBuilder
+
+
+class OutputSink(ABC):
+    """
+    Receives dependencies one at a time and writes them out as they arrive,
+    so output starts with the first resolved dependency and nothing has to
+    be held until the end of the run.
+
+    ``grouped`` output (whole-repository discovery) keeps the per-path
+    grouping of the results. ``vulnerabilities`` adds the advisories matched
+    against each dependency.
+    """
+
+    def __init__(self, out=None, grouped=False, vulnerabilities=False):
+        self.out = out or sys.stdout
+        self.grouped = grouped
+        self.vulnerabilities = vulnerabilities
+        self.path = None
+        self.manifest = None
+        self.parser = None
+        self.graph = None
+
+    def begin(self, repo_info):
+        pass
+
+    def begin_group(self, path, manifest, parser, graph=None):
+        self.path = path
+        self.manifest = manifest
+        self.parser = parser
+        self.graph = graph
+
+    @abstractmethod
+    def write(self, dep):
+        pass
+
+    def end_group(self):
+        pass
+
+    def close(self):
+        self.out.flush()
+
+    def write_groups(self, repo_info, groups):
+        """
+        Drain ``groups``, an iterable of (path, manifest name, parser,
+        dependencies, graph) tuples, into the sink. ``graph`` is the
+        DependencyGraph the dependencies came from, or None.
+        """
+        self.begin(repo_info)
+        for path, manifest, parser, dependencies, graph in groups:
+            self.begin_group(path, manifest, parser, graph)
+            for dep in dependencies:
+                self.write(dep)
+            self.end_group()
+        self.close()
+
+    def _emit(self, text):
+        self.out.write(text)
+        self.out.flush()
+
+
+class ConsoleSink(OutputSink):
+    def begin_group(self, path, manifest, parser, graph=None):
+        super().begin_group(path, manifest, parser, graph)
+        if self.grouped:
+            self._emit(f"== {path or '.'} ({manifest}) ==\n")
+
+    def write(self, dep):
+        line = f"Name: {dep.name}, Version: {dep.version}, License: {dep.license}"
+        if dep.vulnerabilities is UNKNOWN_VULNERABILITIES:
+            line += ", Vulnerabilities: unknown (version not resolved)"
+        elif dep.vulnerabilities:
+            line += f", Vulnerabilities: {', '.join(advisory.id for advisory in dep.vulnerabilities)}"
+        self._emit(line + "\n")
+
+
+class CsvSink(OutputSink):
+    def begin(self, repo_info):
+        self.writer = csv.writer(self.out)
+        header = ["Name", "Version", "License"] + (["Vulnerabilities"] if self.vulnerabilities else [])
+        self.writer.writerow(["Path"] + header if self.grouped else header)
+
+    def write(self, dep):
+        row = [dep.name, dep.version, dep.license]
+        if self.vulnerabilities:
+            row.append("unknown" if dep.vulnerabilities is UNKNOWN_VULNERABILITIES
+                       else ";".join(advisory.id for advisory in dep.vulnerabilities or ()))
+        self.writer.writerow([self.path] + row if self.grouped else row)
+        self.out.flush()
+
+
+class JsonLinesSink(OutputSink):
+    def write(self, dep):
+        record = dep.to_dict()
+        if self.grouped:
+            record = dict({"path": self.path, "manifest": self.manifest}, **record)
+        self._emit(json.dumps(record) + "\n")
+
+
+class JsonSink(OutputSink):
+    """
+    Streams the same document ``json.dumps(..., indent=2)`` would produce:
+    a list of dependencies, or a list of per-path groups when grouped.
+    """
+
+    def begin(self, repo_info):
+        self._groups = 0
+        self._items = 0
+        if not self.grouped:
+            self._emit("[")
+
+    def begin_group(self, path, manifest, parser, graph=None):
+        super().begin_group(path, manifest, parser, graph)
+        self._items = 0
+        if self.grouped:
+            header = json.dumps({"path": path, "manifest": manifest}, indent=2)
+            self._emit(("[\n" if self._groups == 0 else ",\n") + textwrap.indent(header[:-2], "  ")
+                       + ',\n    "dependencies": [')
+            self._groups += 1
+
+    def write(self, dep):
+        indent = "      " if self.grouped else "  "
+        text = textwrap.indent(json.dumps(dep.to_dict(), indent=2), indent)
+        self._emit(("\n" if self._items == 0 else ",\n") + text)
+        self._items += 1
+
+    def end_group(self):
+        if self.grouped:
+            self._emit("\n    ]\n  }" if self._items else "]\n  }")
+
+    def close(self):
+        if self.grouped:
+            self._emit("\n]\n" if self._groups else "[]\n")
+        else:
+            self._emit("\n]\n" if self._items else "]\n")
+        super().close()
+
+
+class CycloneDxSink(OutputSink):
+    """
+    Streams a CycloneDX SBOM. The header is written when the first component
+    is ready and each component is written as soon as it is generated, so
+    memory use does not grow with the number of components.
+
+    Components of every ecosystem come from one SbomBuilder. A package that
+    appears in several manifests is listed once, under its first bom-ref.
+    Groups that come with a dependency graph also contribute to the
+    ``dependencies`` section, and matched advisories are listed in
+    ``vulnerabilities`` at the end, each with the components it affects.
+    """
+
+    def begin(self, repo_info):
+        self.repo_info = repo_info
+        self.builder = SbomBuilder()
+        self._started = False
+        self._components = 0
+        self._refs = set()
+        self._graphs = []
+        self._advisories = {}
+
+    def begin_group(self, path, manifest, parser, graph=None):
+        super().begin_group(path, manifest, parser, graph)
+        if graph is not None:
+            self._graphs.append((parser, graph))
+
+    def write(self, dep):
+        component = self.builder.component(self.parser, dep)
+        if dep.vulnerabilities is UNKNOWN_VULNERABILITIES:
+            component["properties"] = [{"name": "sbomber:vulnerabilities", "value": "unknown"}]
+        if not self._started:
+            self._emit(self._header())
+            self._started = True
+        for advisory in dep.vulnerabilities or ():
+            self._advisories.setdefault(advisory.id, (advisory, {}))[1][component["bom-ref"]] = None
+        if component["bom-ref"] in self._refs:
+            return
+        self._refs.add(component["bom-ref"])
+        text = textwrap.indent(json.dumps(component, indent=2), "    ")
+        self._emit(("\n" if self._components == 0 else ",\n") + text)
+        self._components += 1
+
+    def close(self):
+        if not self._started:
+            self._emit(self._header())
+        self._emit("\n  ]" if self._components else "]")
+        if self._graphs:
+            self._write_dependencies()
+        if self._advisories:
+            self._write_vulnerabilities()
+        self._emit("\n}\n")
+        super().close()
+
+    def _write_dependencies(self):
+        root_ref = self._root_ref()
+        depends_on = {}
+        for parser, graph in self._graphs:
+            refs = [root_ref] + [self.builder.bom_ref(parser, graph.name(node), graph.version(node))
+                                 for node in graph.nodes()]
+            for node in range(len(graph)):
+                targets = depends_on.setdefault(refs[node], {})
+                for target in graph.dependencies_of(node):
+                    targets[refs[target]] = None
+
+        self._emit(',\n  "dependencies": [')
+        for position, (ref, targets) in enumerate(depends_on.items()):
+            entry = json.dumps({"ref": ref, "dependsOn": list(targets)}, indent=2)
+            self._emit(("\n" if position == 0 else ",\n") + textwrap.indent(entry, "    "))
+        self._emit("\n  ]")
+
+    def _write_vulnerabilities(self):
+        self._emit(',\n  "vulnerabilities": [')
+        for position, (advisory, refs) in enumerate(self._advisories.values()):
+            entry = json.dumps(self._vulnerability(advisory, refs), indent=2)
+            self._emit(("\n" if position == 0 else ",\n") + textwrap.indent(entry, "    "))
+        self._emit("\n  ]")
+
+    @staticmethod
+    def _vulnerability(advisory, refs):
+        rating = {"severity": advisory.severity or "unknown"}
+        if advisory.vector:
+            rating.update(method=CVSS_METHODS.get(advisory.vector.split("/", 1)[0], "other"), vector=advisory.vector)
+        vulnerability = {
+            "id": advisory.id,
+            "source": {"name": "OSV", "url": advisory.url},
+            "references": [{"id": alias, "source": {"name": "OSV", "url": f"https://osv.dev/vulnerability/{alias}"}}
+                           for alias in advisory.aliases],
+            "ratings": [rating],
+            "affects": [{"ref": ref} for ref in refs],
+        }
+        if advisory.summary:
+            vulnerability["description"] = advisory.summary
+        return vulnerability
+
+    def _root_ref(self):
+        return self.repo_info.get('full_name') or self.repo_info['name']
+
+    def _header(self):
+        sbom = {
+            "bomFormat": "CycloneDX",
+            "specVersion": "1.6",
+            "serialNumber": f"urn:uuid:{uuid4()}",
+            "version": 1,
+            "metadata": {
+                "timestamp": datetime.utcnow().isoformat() + "Z",
+                "tools": [
+                    {
+                        "vendor": "Your Tool Name",
+                        "name": "Your Tool Name",
+                        "version": "1.0.0"
+                    }
+                ],
+                "component": {
+                    "type": "application",
+                    "name": self.repo_info['name'],
+                    "version": "1.0.0",
+                    "bom-ref": self._root_ref()
+                }
+            },
+            "components": []
+        }
+        header = json.dumps(sbom, indent=2)
+        # Reopen the trailing empty components array so components can be appended.
+        return header[:-len("[]\n}")] + "["
+
+
+CVSS_METHODS = {"CVSS:2.0": "CVSSv2", "CVSS:3.0": "CVSSv3", "CVSS:3.1": "CVSSv31", "CVSS:4.0": "CVSSv4"}
+
+SINKS = {
+    "console": ConsoleSink,
+    "csv": CsvSink,
+    "json": JsonSink,
+    "jsonl": JsonLinesSink,
+    "cyclonedx": CycloneDxSink,
+}
+
+
+def create_sink(output_format, out=None, grouped=False, vulnerabilities=False):
+    return SINKS[output_format](out, grouped, vulnerabilities)
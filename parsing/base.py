@@ -1,10 +1,122 @@
+import io
 from abc import ABC, abstractmethod
+from client import RegistryClient
+from instrumentation import recorder
+from models.dependency import UNPINNED_VERSIONS
+from models.graph import DependencyGraph
+from output import CycloneDxSink
+from parsing.resolver import LicenseResolver
+from sbom import SbomBuilder
 
 class BaseParser(ABC):
+    registry_url = None
+    # Package ecosystem of the parsed dependencies, as used in package URLs
+    # and the license index.
+    ecosystem = None
+
+    def __init__(self, resolver=None, client=None, license_index=None):
+        self.resolver = resolver or LicenseResolver()
+        self.client = client or RegistryClient()
+        self.license_index = license_index
+
     @abstractmethod
     def get_dependency_file_name(self):
         pass
 
+    def get_dependency_file_names(self):
+        """
+        :return: Manifest file names the parser understands, in order of preference
+        """
+        return [self.get_dependency_file_name()]
+
     @abstractmethod
     def parse_dependencies(self, file_content):
-        pass
\ No newline at end of file
+        pass
+
+    @abstractmethod
+    def lookup_license(self, dependency):
+        pass
+
+    def get_lockfile_names(self):
+        return []
+
+    def build_graph(self, file_content, lockfile_name, lockfile_content):
+        """
+        Build the full dependency graph, transitive dependencies included, from
+        a lockfile named in ``get_lockfile_names``.
+
+        Parsers that read lockfiles override this. Without that, the graph is
+        flat: the manifest's dependencies, all direct.
+
+        :param file_content: The manifest next to the lockfile, or None
+        :return: DependencyGraph
+        """
+        graph = DependencyGraph()
+        if file_content is not None:
+            for dep in self.parse_dependencies(file_content):
+                graph.mark_direct(graph.add_node(dep.name, dep.version, dep.license))
+        return graph.freeze()
+
+    def iter_resolved(self, dependencies, known_licenses=None):
+        """
+        Yield the dependencies in order as their licenses are resolved.
+        Dependencies that already carry a license (e.g. from a lockfile) are
+        not looked up again.
+
+        :param known_licenses: Dict mapping (name, version) to a license
+                               that is already known, e.g. from the last run
+        """
+        self.apply_known_licenses(dependencies, known_licenses)
+        return self._iter_resolved(dependencies)
+
+    def apply_known_licenses(self, dependencies, known_licenses):
+        if known_licenses:
+            for dep in dependencies:
+                if dep.license is None:
+                    dep.license = known_licenses.get((dep.name, dep.version))
+
+    def _iter_resolved(self, dependencies):
+        licenses = self.resolver.imap(self.registry_url, self._license_or_lookup, dependencies)
+        for dep, license_info in zip(dependencies, licenses):
+            dep.license = license_info
+            yield dep
+
+    def _license_or_lookup(self, dependency):
+        if dependency.license is not None:
+            return dependency.license
+        with recorder.span(self.ecosystem or type(self).__name__, "license", package=dependency.name):
+            return self.lookup_license(dependency)
+
+    def resolved_version(self, dependency):
+        """
+        :return: The exact version ``dependency`` stands for, e.g. the one its
+                 range resolves to, or None if that can't be told
+        """
+        if dependency.version is None or dependency.version in UNPINNED_VERSIONS:
+            return None
+        return dependency.version
+
+    def indexed_license(self, ecosystem, name, version=None):
+        """
+        :return: License from the offline license index, or None if there is
+                 no index or it doesn't know the package
+        """
+        if self.license_index is None:
+            return None
+        return self.license_index.get(ecosystem, name, version)
+
+    def resolve_licenses(self, dependencies):
+        for _ in self.iter_resolved(dependencies):
+            pass
+        return dependencies
+
+    def generate_component(self, dep):
+        """
+        :return: CycloneDX component of a resolved dependency, see sbom.py
+        """
+        return SbomBuilder().component(self, dep)
+
+    def generate_cyclonedx_sbom(self, repo_info, dependencies):
+        out = io.StringIO()
+        CycloneDxSink(out).write_groups(repo_info, [("", self.get_dependency_file_name(), self, dependencies, None)])
+        return out.getvalue().rstrip("\n")
@@ -0,0 +1,357 @@
+import re
+from models.build import BuildScan, Declaration
+
+try:
+    import tomllib
+except ImportError:
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+TOKEN_PATTERN = re.compile(r'''
+    (?P<comment>//[^\n]*|/\*.*?\*/)
+  | (?P<string>"""(?:.|\n)*?"""|\'\'\'(?:.|\n)*?\'\'\'|"(?:\\.|\$\{[^}\n]*\}|[^"\\\n])*"|'(?:\\.|[^'\\\n])*')
+  | (?P<ident>[A-Za-z_$][\w$]*)
+  | (?P<number>\d[\w.]*)
+  | (?P<symbol>[{}()\[\],:=.])
+  | (?P<other>\S)
+''', re.VERBOSE | re.DOTALL)
+INTERPOLATION_PATTERN = re.compile(r'\$\{([^}]*)\}|\$(\w+(?:\.\w+)*)')
+QUOTED_PATTERN = re.compile(r'[\'"]([^\'"]+)[\'"]')
+
+IDENT = 'ident'
+STRING = 'string'
+SYMBOL = 'symbol'
+
+PLATFORM_FUNCTIONS = ('platform', 'enforcedPlatform')
+# Qualifiers that can appear in a property reference without being part of
+# the property name, as in "${rootProject.ext.springVersion}".
+PROPERTY_QUALIFIERS = {'project', 'rootProject', 'ext', 'extra', 'properties', 'get'}
+# Dependency notations that don't refer to an external module.
+LOCAL_NOTATIONS = {'project', 'files', 'fileTree', 'gradleApi', 'localGroovy', 'gradleTestKit'}
+
+
+def tokenize(content):
+    """
+    Split a Groovy or Kotlin build script into (kind, value) tokens in a
+    single pass. Comments and whitespace are dropped and string values are
+    unquoted.
+    """
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(content):
+        kind = match.lastgroup
+        if kind == 'comment':
+            continue
+        value = match.group()
+        if kind == STRING:
+            quote = 3 if value[:3] in ('"""', "'''") else 1
+            value = value[quote:-quote]
+        tokens.append((kind, value))
+    return tokens
+
+
+class VersionCatalog:
+    """
+    A ``gradle/libs.versions.toml`` version catalog, indexed by the accessor
+    build scripts use (``libs.spring.core``, ``libs.bundles.spring``).
+    """
+
+    def __init__(self, content):
+        if tomllib is None:
+            raise ValueError("Reading version catalogs needs Python 3.11 or the tomli package")
+        catalog = tomllib.loads(content)
+        versions = {alias: self._version(value) for alias, value in catalog.get('versions', {}).items()}
+
+        self.libraries = {}
+        for alias, library in catalog.get('libraries', {}).items():
+            if isinstance(library, str):
+                group_id, artifact_id, version = (library.split(':') + [None])[:3]
+            else:
+                if 'module' in library:
+                    group_id, artifact_id = library['module'].split(':', 1)
+                else:
+                    group_id, artifact_id = library.get('group'), library.get('name')
+                version = library.get('version')
+                if isinstance(version, dict) and 'ref' in version:
+                    version = versions.get(version['ref'])
+                else:
+                    version = self._version(version)
+            self.libraries[self.accessor(alias)] = (group_id, artifact_id, version)
+
+        self.bundles = {self.accessor(alias): [self.accessor(library) for library in libraries]
+                        for alias, libraries in catalog.get('bundles', {}).items()}
+
+    def resolve(self, reference):
+        """
+        :param reference: Accessor path without the catalog name, e.g. "spring.core"
+        :return: List of (group, artifact, version) tuples, empty if unknown
+        """
+        reference = self.accessor(reference)
+        if reference.startswith('bundles.'):
+            return [self.libraries[alias] for alias in self.bundles.get(reference[len('bundles.'):], [])
+                    if alias in self.libraries]
+        library = self.libraries.get(reference)
+        return [library] if library else []
+
+    @staticmethod
+    def accessor(alias):
+        return re.sub(r'[-_.]', '.', alias).lower()
+
+    @staticmethod
+    def _version(value):
+        if isinstance(value, dict):
+            return value.get('strictly') or value.get('require') or value.get('prefer')
+        return value
+
+
+def parse_gradle_properties(content):
+    properties = {}
+    for line in content.splitlines():
+        line = line.strip()
+        if not line or line[0] in '#!':
+            continue
+        match = re.match(r'([^=:\s]+)\s*[=:]\s*(.*)', line)
+        if match:
+            properties[match.group(1)] = match.group(2).strip()
+    return properties
+
+
+def scan_gradle_build(content, parent=None, catalog=None, gradle_properties=None):
+    """
+    Scan a ``build.gradle`` or ``build.gradle.kts`` in one pass over its
+    tokens.
+
+    Collects extra properties (``ext`` blocks and ``ext.x =`` in Groovy,
+    ``val x =``, ``by extra(...)`` and ``extra["x"] =`` in Kotlin) and every
+    declaration in a ``dependencies`` block, whatever its configuration:
+    string, map and named-argument notations, ``platform(...)`` BOMs and
+    version catalog references. Declarations may span several lines.
+    ``buildscript`` dependencies are build tooling and are skipped.
+
+    :param parent: BuildScan of the enclosing project, whose properties are inherited
+    :param catalog: VersionCatalog used to resolve ``libs.*`` references
+    :param gradle_properties: Content of the project's gradle.properties
+    :return: BuildScan
+    """
+    scan = BuildScan(parent)
+    if gradle_properties:
+        scan.properties.update(parse_gradle_properties(gradle_properties))
+
+    tokens = tokenize(content)
+    scanner = _GradleScanner(tokens, scan, catalog)
+    scanner.run()
+    for declaration in scan.declarations:
+        if declaration.version is not None:
+            declaration.version = interpolate(declaration.version, scan.properties)
+    return scan
+
+
+def interpolate(value, properties):
+    """
+    Substitute ``$name`` and ``${...}`` references from ``properties``.
+
+    :return: The interpolated string, or None if a reference can't be resolved
+    """
+    unresolved = False
+
+    def substitute(match):
+        nonlocal unresolved
+        resolved = _lookup_property(match.group(1) or match.group(2), properties)
+        if resolved is None:
+            unresolved = True
+            return match.group()
+        return resolved
+
+    result = INTERPOLATION_PATTERN.sub(substitute, value)
+    return None if unresolved else result
+
+
+def _lookup_property(expression, properties):
+    quoted = QUOTED_PATTERN.search(expression)
+    if quoted:
+        # property("x"), findProperty("x"), extra["x"], ext['x']
+        return properties.get(quoted.group(1))
+    parts = [part.strip('()') for part in expression.split('.')]
+    if parts[0] == 'libs':
+        return None
+    parts = [part for part in parts if part not in PROPERTY_QUALIFIERS]
+    return properties.get(parts[-1]) if parts else None
+
+
+class _GradleScanner:
+    def __init__(self, tokens, scan, catalog):
+        self.tokens = tokens
+        self.scan = scan
+        self.catalog = catalog
+        self.blocks = []
+
+    def kind(self, position):
+        return self.tokens[position][0] if position < len(self.tokens) else None
+
+    def value(self, position):
+        return self.tokens[position][1] if position < len(self.tokens) else None
+
+    def is_symbol(self, position, symbol):
+        return self.kind(position) == SYMBOL and self.value(position) == symbol
+
+    def run(self):
+        position = 0
+        while position < len(self.tokens):
+            kind, value = self.tokens[position]
+            if kind == SYMBOL and value == '{':
+                previous = position - 1
+                # Skip over call arguments, as in "configure(subprojects) {".
+                if self.is_symbol(previous, ')'):
+                    previous = self._matching_open(previous) - 1
+                self.blocks.append(self.value(previous) if self.kind(previous) == IDENT else None)
+                position += 1
+            elif kind == SYMBOL and value == '}':
+                if self.blocks:
+                    self.blocks.pop()
+                position += 1
+            elif kind == IDENT and self._in_dependencies():
+                position = self._declaration(position)
+            elif kind == IDENT:
+                position = self._property(position)
+            else:
+                position += 1
+
+    def _in_dependencies(self):
+        return bool(self.blocks) and self.blocks[-1] == 'dependencies' and 'buildscript' not in self.blocks
+
+    def _matching_open(self, position):
+        depth = 0
+        while position >= 0:
+            if self.is_symbol(position, ')'):
+                depth += 1
+            elif self.is_symbol(position, '('):
+                depth -= 1
+                if depth == 0:
+                    return position
+            position -= 1
+        return 0
+
+    def _property(self, position):
+        """
+        Recognise a property assignment starting at ``position`` and return
+        the position to continue from.
+        """
+        value = self.value(position)
+        in_ext = bool(self.blocks) and self.blocks[-1] in ('ext', 'extra')
+
+        # ext { springVersion = '5.3.0' } / ext.springVersion = '5.3.0'
+        if in_ext and self.is_symbol(position + 1, '=') and self.kind(position + 2) == STRING:
+            self.scan.properties[value] = self.value(position + 2)
+            return position + 3
+        if value in ('ext', 'extra') and self.is_symbol(position + 1, '.') and self.kind(position + 2) == IDENT:
+            if self.value(position + 2) == 'set':
+                return self._set_call(position + 3)
+            if self.is_symbol(position + 3, '=') and self.kind(position + 4) == STRING:
+                self.scan.properties[self.value(position + 2)] = self.value(position + 4)
+                return position + 5
+        # ext['springVersion'] = '5.3.0' / extra["springVersion"] = "5.3.0"
+        if (value in ('ext', 'extra') and self.is_symbol(position + 1, '[') and self.kind(position + 2) == STRING
+                and self.is_symbol(position + 3, ']') and self.is_symbol(position + 4, '=')
+                and self.kind(position + 5) == STRING):
+            self.scan.properties[self.value(position + 2)] = self.value(position + 5)
+            return position + 6
+        # ext { set('springVersion', '5.3.0') }
+        if in_ext and value == 'set':
+            return self._set_call(position + 1)
+        # val springVersion = "5.3.0" / def springVersion = '5.3.0'
+        if value in ('val', 'def', 'var') and self.kind(position + 1) == IDENT:
+            name = self.value(position + 1)
+            if self.is_symbol(position + 2, '=') and self.kind(position + 3) == STRING:
+                self.scan.properties[name] = self.value(position + 3)
+                return position + 4
+            # val springVersion by extra("5.3.0")
+            if (self.value(position + 2) == 'by' and self.value(position + 3) == 'extra'
+                    and self.is_symbol(position + 4, '(') and self.kind(position + 5) == STRING):
+                self.scan.properties[name] = self.value(position + 5)
+                return position + 6
+        return position + 1
+
+    def _set_call(self, position):
+        if (self.is_symbol(position, '(') and self.kind(position + 1) == STRING
+                and self.is_symbol(position + 2, ',') and self.kind(position + 3) == STRING):
+            self.scan.properties[self.value(position + 1)] = self.value(position + 3)
+            return position + 4
+        return position
+
+    def _declaration(self, position):
+        """
+        Parse ``<configuration> <notation>`` starting at ``position`` and
+        return the position to continue from.
+        """
+        configuration = self.value(position)
+        position += 1
+        parenthesized = self.is_symbol(position, '(')
+        if parenthesized:
+            position += 1
+        if self.kind(position) not in (STRING, IDENT):
+            return position
+        return self._notation(position, configuration, platform=False)
+
+    def _notation(self, position, configuration, platform):
+        kind, value = self.tokens[position]
+        if kind == STRING:
+            self._add_coordinates(value, configuration, platform)
+            return position + 1
+        if value in PLATFORM_FUNCTIONS and self.is_symbol(position + 1, '('):
+            if self.kind(position + 2) in (STRING, IDENT):
+                return self._notation(position + 2, configuration, platform=True)
+            return position + 2
+        if value == 'kotlin' and self.is_symbol(position + 1, '(') and self.kind(position + 2) == STRING:
+            self._add(Declaration('org.jetbrains.kotlin', f"kotlin-{self.value(position + 2)}", None,
+                                  configuration, platform))
+            return position + 3
+        if value in LOCAL_NOTATIONS:
+            return position + 1
+        if self.is_symbol(position + 1, ':') or self.is_symbol(position + 1, '='):
+            return self._named_arguments(position, configuration, platform)
+        if self.is_symbol(position + 1, '.'):
+            return self._catalog_reference(position, configuration, platform)
+        # Not a notation; leave the token for the caller.
+        return position
+
+    def _named_arguments(self, position, configuration, platform):
+        # group: 'org.x', name: 'y', version: '1.0' (Groovy) or group = "org.x", ... (Kotlin)
+        # Values may also be bare property references, as in version: springVersion.
+        arguments = {}
+        while (self.kind(position) == IDENT and (self.is_symbol(position + 1, ':') or self.is_symbol(position + 1, '='))
+               and self.kind(position + 2) in (STRING, IDENT)):
+            value = self.value(position + 2)
+            arguments[self.value(position)] = value if self.kind(position + 2) == STRING else f"${{{value}}}"
+            position += 3
+            if not self.is_symbol(position, ','):
+                break
+            position += 1
+        if 'group' in arguments and 'name' in arguments:
+            self._add(Declaration(arguments['group'], arguments['name'], arguments.get('version'),
+                                  configuration, platform))
+        return position
+
+    def _catalog_reference(self, position, configuration, platform):
+        parts = [self.value(position)]
+        position += 1
+        while self.is_symbol(position, '.') and self.kind(position + 1) == IDENT:
+            parts.append(self.value(position + 1))
+            position += 2
+        if parts[-1] == 'get' and self.is_symbol(position, '('):
+            parts.pop()
+        if self.catalog is not None and len(parts) > 1:
+            for group_id, artifact_id, version in self.catalog.resolve('.'.join(parts[1:])):
+                self._add(Declaration(group_id, artifact_id, version, configuration, platform))
+        return position
+
+    def _add_coordinates(self, notation, configuration, platform):
+        # group:artifact[:version[:classifier]][@extension]
+        parts = notation.split('@', 1)[0].split(':')
+        if len(parts) < 2 or not parts[0] or not parts[1]:
+            return
+        version = parts[2] if len(parts) > 2 and parts[2] else None
+        self._add(Declaration(parts[0], parts[1], version, configuration, platform))
+
+    def _add(self, declaration):
+        self.scan.declarations.append(declaration)
@@ -1,85 +1,129 @@
+import logging
+import posixpath
 import re
 import requests
-import json
-from functools import lru_cache
+from instrumentation import recorder
 from parsing.base import BaseParser
-from models.dependency import Dependency
+from models.dependency import LOOKUP_FAILED, Dependency
+from parsing.lockfiles import parse_gradle_lockfile
+from parsing.gradle import VersionCatalog, scan_gradle_build
+from parsing.maven import MavenMetadataStore, scan_pom_build
+
+logger = logging.getLogger(__name__)
+
+# Gradle dynamic versions ("1.+", "latest.release"), Maven version ranges and
+# unresolved property references don't name one version.
+DYNAMIC_VERSION_PATTERN = re.compile(r'[+\[\](),$]|^latest\.')
 
 class JavaParser(BaseParser):
-    def __init__(self, internal_packages=None):
+    ecosystem = 'maven'
+
+    def __init__(self, internal_packages=None, resolver=None, client=None, maven=None, license_index=None):
+        super().__init__(resolver, client, license_index)
         self.gradle_file = "build.gradle"
+        self.build_files = ["build.gradle.kts", "build.gradle", "pom.xml"]
         self.lockfile = "gradle.lockfile"
-        self.maven_search_url = "https://search.maven.org/solrsearch/select"
+        self.maven = maven if maven is not None else MavenMetadataStore(client=self.client)
         self.internal_packages = internal_packages or []
 
-    def get_dependency_file_name(self):
-        return self.gradle_file
-
-    def parse_dependencies(self, file_content, lockfile_content=None):
-        ext_versions = self._parse_ext_block(file_content)
-        if lockfile_content:
-            dependencies = self._parse_with_lockfile(file_content, lockfile_content, ext_versions)
-        else:
-            dependencies = self._parse_without_lockfile(file_content, ext_versions)
+    @property
+    def registry_url(self):
+        return self.maven.search_url
 
-        for dep in dependencies:
-            dep.license = self._get_license_info(dep.name, dep.version)
-            if "License not specified" in dep.license or "Not found" in dep.license:
-                print(self.suggest_license_sources(dep.name))
-
-        return dependencies
+    def resolved_version(self, dependency):
+        version = super().resolved_version(dependency)
+        if version is None or DYNAMIC_VERSION_PATTERN.search(version):
+            return None
+        return version
 
-    def _parse_ext_block(self, file_content):
-        ext_versions = {}
-        ext_block_pattern = re.compile(r'ext\s*{([^}]*)}', re.DOTALL)
-        version_pattern = re.compile(r'(\w+)Version\s*=\s*[\'"]([^\'"]+)[\'"]')
+    def get_dependency_file_name(self):
+        return self.gradle_file
 
-        ext_match = ext_block_pattern.search(file_content)
-        if ext_match:
-            ext_block = ext_match.group(1)
-            for match in version_pattern.finditer(ext_block):
-                name, version = match.groups()
-                ext_versions[name.lower()] = version
-        return ext_versions
+    def get_dependency_file_names(self):
+        return self.build_files
 
-    def _parse_with_lockfile(self, gradle_content, lockfile_content, ext_versions):
-        gradle_deps = self._parse_gradle_file(gradle_content, ext_versions)
-        lockfile_deps = self._parse_lockfile(lockfile_content)
+    def parse_dependencies(self, file_content, lockfile_content=None, scan=None):
+        return list(self.iter_dependencies(file_content, lockfile_content, scan))
 
-        dependencies = []
-        for dep in gradle_deps:
-            version = lockfile_deps.get(dep.name, dep.version)
-            dependencies.append(Dependency(dep.name, version, dep.license))
+    def iter_dependencies(self, file_content, lockfile_content=None, scan=None, known_licenses=None):
+        dependencies = self.extract_dependencies(file_content, lockfile_content, scan)
+        return self._suggest_missing_licenses(self.iter_resolved(dependencies, known_licenses))
 
-        return dependencies
+    def iter_resolved(self, dependencies, known_licenses=None):
+        self.apply_known_licenses(dependencies, known_licenses)
+        # Look up every artifact with a few batched search queries first, so
+        # the per-dependency lookups below are served from the store.
+        with recorder.span("maven prefetch", "license", dependencies=len(dependencies)):
+            self.maven.prefetch([tuple(dep.name.split(':', 1)) for dep in dependencies
+                                 if dep.license is None and not self._is_internal(dep.name)
+                                 and self.indexed_license(self.ecosystem, dep.name, dep.version) is None],
+                                self.resolver)
+        return super().iter_resolved(dependencies)
 
-    def _parse_without_lockfile(self, gradle_content, ext_versions):
-        return self._parse_gradle_file(gradle_content, ext_versions)
-
-    def _parse_gradle_file(self, file_content, ext_versions):
-        deps = []
-        dep_pattern = re.compile(r'(implementation|api|compileOnly|runtimeOnly)\s*[\'\"]([^:]+):([^:]+)(?::([^\'\"]*))?[\'\"]')
+    def _suggest_missing_licenses(self, dependencies):
+        for dep in dependencies:
+            if "License not specified" in dep.license or "Not found" in dep.license:
+                logger.debug("%s", self.suggest_license_sources(dep.name))
+            yield dep
 
-        for line in file_content.split('\n'):
-            match = dep_pattern.search(line)
-            if match:
-                _, group_id, artifact_id, version = match.groups()
-                name = f"{group_id}:{artifact_id}"
+    def scan_build(self, file_content, parent=None, catalog=None, gradle_properties=None):
+        """
+        Scan a Gradle (Groovy or Kotlin DSL) or Maven build file.
 
-                if version:
-                    if version.startswith('$'):
-                        var_name = version[1:].lower()  
-                        version = ext_versions.get(var_name, 'Unknown')
-                    elif version.startswith('${') and version.endswith('}'):
-                        var_name = version[2:-1].lower()
-                        version = ext_versions.get(var_name, 'Unknown')
-                else:
-                    var_name = artifact_id.lower()
-                    version = ext_versions.get(var_name, 'Unknown')
+        :param parent: BuildScan of the enclosing project in a multi-module build
+        :param catalog: Content of the build's gradle/libs.versions.toml
+        :param gradle_properties: Content of the project's gradle.properties
+        :return: BuildScan
+        """
+        if file_content.lstrip().startswith('<'):
+            return scan_pom_build(file_content, parent)
+        if catalog is not None and not isinstance(catalog, VersionCatalog):
+            try:
+                catalog = VersionCatalog(catalog)
+            except ValueError as e:
+                logger.warning("Version catalog couldn't be read. Error: %s", e)
+                catalog = None
+        return scan_gradle_build(file_content, parent, catalog, gradle_properties)
+
+    def extract_dependencies(self, file_content, lockfile_content=None, scan=None):
+        """
+        :param scan: BuildScan of ``file_content`` if the caller already has one
+        :return: One Dependency per declared module, in declaration order.
+                 Versions come from the lockfile when there is one; modules
+                 without a resolvable version get "Unknown".
+        """
+        scan = scan or self.scan_build(file_content)
+        locked = self._parse_lockfile(lockfile_content) if lockfile_content else {}
 
-                deps.append(Dependency(name, version, "Unknown"))
+        properties = {name.lower(): value for name, value in scan.properties.items()}
 
-        return deps
+        dependencies = {}
+        for declaration in scan.declarations:
+            name = declaration.name
+            version = locked.get(name) or declaration.version or self._version_property(declaration, scan, properties)
+            if name not in dependencies or dependencies[name].version == 'Unknown':
+                dependencies[name] = Dependency(name, version or 'Unknown', None, self.ecosystem)
+        return list(dependencies.values())
+
+    @staticmethod
+    def _version_property(declaration, scan, properties):
+        # Fall back to a property named after the artifact, e.g. springCoreVersion
+        # or spring-core.version for org.springframework:spring-core.
+        artifact_id = declaration.artifact_id.lower()
+        version = properties.get(artifact_id.replace('-', '') + 'version') or properties.get(artifact_id + '.version')
+        return version or scan.managed_version(declaration.group_id, declaration.artifact_id)
+
+    def lookup_license(self, dependency):
+        return self._get_license_info(dependency.name, dependency.version)
+
+    def get_lockfile_names(self):
+        return [self.lockfile]
+
+    def build_graph(self, file_content, lockfile_name, lockfile_content):
+        direct_names = None
+        if file_content is not None:
+            direct_names = [declaration.name for declaration in self.scan_build(file_content).declarations]
+        return parse_gradle_lockfile(lockfile_content, direct_names)
 
     def _parse_lockfile(self, file_content):
         dependencies = {}
@@ -96,39 +140,35 @@ class JavaParser(BaseParser):
 
         return dependencies
 
-    @lru_cache(maxsize=100)
+    def _is_internal(self, dependency_name):
+        return any(internal_name.lower() in dependency_name.lower() for internal_name in self.internal_packages)
+
     def _get_license_info(self, dependency_name, version):
-        if any(internal_name.lower() in dependency_name.lower() for internal_name in self.internal_packages):
+        if self._is_internal(dependency_name):
             return 'Internal'
+        license_info = self.indexed_license(self.ecosystem, dependency_name, version)
+        if license_info is not None:
+            return license_info
 
         group_id, artifact_id = dependency_name.split(':')
-        
-        params = {
-            'q': f'g:"{group_id}" AND a:"{artifact_id}"',
-            'rows': 1,
-            'wt': 'json'
-        }
-        
+
         try:
-            response = requests.get(self.maven_search_url, params=params)
-            response.raise_for_status()
-            data = response.json()
-            
-            if data['response']['docs']:
-                doc = data['response']['docs'][0]
-                print(f"Maven Central data for {dependency_name}:")
-                print(json.dumps(doc, indent=2))
-                license = doc.get('license', [])
-                if license:
-                    return ', '.join(license)
-                else:
-                    return 'License not specified in Maven Central'
-            else:
-                print(f"No data found in Maven Central for {dependency_name}")
+            doc = self.maven.doc(group_id, artifact_id)
+            if doc is None:
                 return 'Not found in Maven Central'
+
+            licenses = doc.get('license', [])
+            if not licenses:
+                if not version or version == 'Unknown' or '$' in version:
+                    version = doc.get('latestVersion') or doc.get('v')
+                if version:
+                    licenses = self.maven.pom_licenses(group_id, artifact_id, version)
+            if licenses:
+                return ', '.join(licenses)
+            return 'License not specified in Maven Central'
         except requests.RequestException as e:
-            print(f"Error fetching info for {dependency_name}: {str(e)}")
-            return 'Error fetching information'
+            logger.warning("Error fetching info for %s: %s", dependency_name, e)
+            return LOOKUP_FAILED
 
     def suggest_license_sources(self, dependency_name):
         group_id, artifact_id = dependency_name.split(':')
@@ -150,4 +190,63 @@ class JavaParser(BaseParser):
         
         :param internal_packages: List of strings representing internal package names
         """
-        self.internal_packages = internal_packages
\ No newline at end of file
+        self.internal_packages = internal_packages
+
+
+class JavaBuildContext:
+    """
+    Carries build state down a repository's directory tree, so that each
+    subproject of a multi-module Gradle or Maven build sees the properties
+    and managed versions of the projects above it and the nearest
+    ``gradle/libs.versions.toml`` catalog.
+
+    Directories must be scanned parents first, which is the order
+    ``GitHubAPI.group_by_directory`` returns them in. Every build file is
+    scanned once, so a build with hundreds of subprojects is handled in
+    linear time.
+    """
+
+    def __init__(self, catalogs=None):
+        self.catalogs = dict(catalogs or {})
+        self.scans = {}
+
+    @classmethod
+    def from_manifests(cls, manifests):
+        """
+        :param manifests: Dict mapping repository paths to file contents
+        """
+        catalogs = {}
+        for path, content in manifests.items():
+            directory, file_name = posixpath.split(path)
+            if file_name == 'libs.versions.toml' and posixpath.basename(directory) == 'gradle':
+                catalogs[posixpath.dirname(directory)] = content
+        return cls(catalogs)
+
+    def scan(self, parser, directory, file_content, gradle_properties=None):
+        parent = self._nearest(self.scans, directory)
+        catalog = self._nearest(self.catalogs, directory)
+        if catalog is not None and not isinstance(catalog, VersionCatalog):
+            catalog = self._catalog(directory)
+        scan = parser.scan_build(file_content, parent, catalog, gradle_properties)
+        self.scans[directory] = scan
+        return scan
+
+    def _catalog(self, directory):
+        # Parse each catalog once and keep the parsed form in its place.
+        while directory not in self.catalogs:
+            directory = posixpath.dirname(directory)
+        try:
+            self.catalogs[directory] = VersionCatalog(self.catalogs[directory])
+        except ValueError as e:
+            logger.warning("Version catalog couldn't be read. Error: %s", e)
+            self.catalogs[directory] = None
+        return self.catalogs[directory]
+
+    @staticmethod
+    def _nearest(values, directory):
+        while True:
+            if directory in values:
+                return values[directory]
+            if not directory:
+                return None
+            directory = posixpath.dirname(directory)
@@ -1,35 +1,66 @@
 import json
+import logging
 import requests
-import semver
-import hashlib
-from uuid import uuid4
+from instrumentation import recorder
 from parsing.base import BaseParser
-from models.dependency import Dependency
+from parsing.lockfiles import parse_package_lock, parse_yarn_lock
+from parsing.packument import PackumentStore
+from parsing.semver_range import version_key
+from models.dependency import LOOKUP_FAILED, Dependency
+
+logger = logging.getLogger(__name__)
 
 class JavaScriptParser(BaseParser):
-    def __init__(self):
-        self.npm_url = "https://registry.npmjs.org/{package}"
+    ecosystem = 'npm'
+
+    def __init__(self, resolver=None, packuments=None, client=None, license_index=None):
+        super().__init__(resolver, client, license_index)
+        self.packuments = packuments if packuments is not None else PackumentStore(client=self.client)
+        self.npm_url = self.packuments.registry_url
+
+    @property
+    def registry_url(self):
+        return self.npm_url
 
     def get_dependency_file_name(self):
         return "package.json"
 
     def parse_dependencies(self, file_content):
+        return list(self.iter_dependencies(file_content))
+
+    def iter_dependencies(self, file_content, known_licenses=None):
+        dependencies = self.extract_dependencies(file_content)
+        return self.iter_resolved(dependencies, known_licenses)
+
+    def extract_dependencies(self, file_content):
         dependencies = []
         package_json = json.loads(file_content)
 
         for dep_type in ['dependencies', 'devDependencies']:
             if dep_type in package_json:
                 for name, version in package_json[dep_type].items():
-                    license_info = self.get_license_info(name, version)
-                    dependencies.append(Dependency(name, version, license_info))
+                    dependencies.append(Dependency(name, version, None, self.ecosystem))
 
         return dependencies
 
+    def lookup_license(self, dependency):
+        return self.get_license_info(dependency.name, dependency.version)
+
+    def get_lockfile_names(self):
+        return ["package-lock.json", "yarn.lock"]
+
+    def build_graph(self, file_content, lockfile_name, lockfile_content):
+        if lockfile_name == "yarn.lock":
+            return parse_yarn_lock(lockfile_content, file_content)
+        return parse_package_lock(lockfile_content)
+
     def get_license_info(self, package_name, version):
+        license_info = self.indexed_license(self.ecosystem, package_name, version)
+        if license_info is not None:
+            return license_info
+
         try:
-            response = requests.get(self.npm_url.format(package=package_name))
-            response.raise_for_status()
-            data = response.json()
+            data = self.packuments.get(package_name)
 
             if version in data.get('versions', {}):
                 specific_version = data['versions'][version]
@@ -47,102 +78,43 @@ class JavaScriptParser(BaseParser):
                 return 'Unknown'
 
         except requests.RequestException as e:
-            print(f"Error fetching license info for {package_name}: {str(e)}")
-            return "Unknown"
-
-    def generate_cyclonedx_sbom(self, repo_info, dependencies):
-        sbom = {
-            "bomFormat": "CycloneDX",
-            "specVersion": "1.6",
-            "serialNumber": f"urn:uuid:{uuid4()}",
-            "version": 1,
-            "metadata": {
-                "timestamp": self.get_timestamp(),
-                "tools": [
-                    {
-                        "vendor": "Your Tool Name",
-                        "name": "Your Tool Name",
-                        "version": "1.0.0"
-                    }
-                ],
-                "component": {
-                    "type": "application",
-                    "name": repo_info['name'],
-                    "version": "1.0.0"
-                }
-            },
-            "components": []
-        }
-
-        for dep in dependencies:
-            component = self.generate_component(dep)
-            sbom["components"].append(component)
-
-        return json.dumps(sbom, indent=2)
-
-    def generate_component(self, dep):
-        component = {
-            "type": "library",
-            "name": dep.name,
-            "version": dep.version,
-        }
-
-        npm_info = self.fetch_npm_package_info(dep.name, dep.version)
-        if npm_info:
-            component.update(self.get_component_details(dep.name, npm_info))
-        else:
-            component.update({
-                "purl": f"pkg:npm/{dep.name}@{dep.version}",
-                "bom-ref": f"pkg:npm/{dep.name}@{dep.version}"
-            })
-
-        if dep.license:
-            component["licenses"] = [{"license": {"id": dep.license}}]
-
-        return component
-
-    def get_component_details(self, package_name, npm_info):
-        resolved_version = npm_info["version"]
-        hash_content = f"{package_name}@{resolved_version}".encode('utf-8')
-        sha1_hash = hashlib.sha1(hash_content).hexdigest()
-
-        details = {
-            "description": npm_info["description"],
-            "version": resolved_version,
-            "hashes": [{"alg": "SHA-1", "content": sha1_hash}],
-            "purl": f"pkg:npm/{package_name}@{resolved_version}",
-            "bom-ref": f"pkg:npm/{package_name}@{resolved_version}",
-            "externalReferences": []
-        }
-
-        if npm_info["homepage"]:
-            details["externalReferences"].append({"type": "website", "url": npm_info["homepage"]})
-        if npm_info["bugs"]:
-            details["externalReferences"].append({"type": "issue-tracker", "url": npm_info["bugs"]})
-        if npm_info["repository"]:
-            details["externalReferences"].append({"type": "vcs", "url": npm_info["repository"]})
-
-        return details
+            logger.warning("Error fetching license info for %s: %s", package_name, e)
+            return LOOKUP_FAILED
+
+    def resolved_version(self, dependency):
+        if version_key(dependency.version) is not None:
+            return dependency.version
+        if dependency.version.startswith('file:'):
+            return None
+        try:
+            return self.max_satisfying(dependency.name, dependency.version)
+        except (requests.RequestException, KeyError, ValueError) as e:
+            logger.debug("Could not resolve %s@%s: %s", dependency.name, dependency.version, e)
+            return None
+
+    def max_satisfying(self, package_name, version_range):
+        """
+        :return: The highest published version satisfying ``version_range``
+                 (or the dist-tag it names), or None if there is none
+        """
+        data = self.packuments.get(package_name)
+        with recorder.span("max_satisfying", "semver", package=package_name, range=version_range):
+            version = self.packuments.versions(package_name).max_satisfying(version_range, data.get('dist-tags'))
+        return version if version in data.get('versions', {}) else None
 
     def fetch_npm_package_info(self, package_name, version_range):
         if version_range.startswith('file:'):
-            print(f"Local file dependency detected for {package_name}. Skipping npm info fetch.")
+            logger.debug("Local file dependency detected for %s. Skipping npm info fetch.", package_name)
             return None
 
         try:
-            response = requests.get(self.npm_url.format(package=package_name))
-            response.raise_for_status()
-            data = response.json()
-            
-            versions = list(data['versions'].keys())
-            parsed_range = self.parse_version_range(version_range)
-            valid_versions = [v for v in versions if self.version_satisfies(v, parsed_range)]
+            data = self.packuments.get(package_name)
+            latest_valid_version = self.max_satisfying(package_name, version_range)
 
-            if not valid_versions:
-                print(f"No valid version found for {package_name}@{version_range}")
+            if latest_valid_version is None:
+                logger.warning("No valid version found for %s@%s", package_name, version_range)
                 return None
-            
-            latest_valid_version = max(valid_versions, key=semver.VersionInfo.parse)
+
             version_data = data['versions'][latest_valid_version]
             
             return {
@@ -150,37 +122,11 @@ class JavaScriptParser(BaseParser):
                 "description": version_data.get("description", ""),
                 "repository": version_data.get("repository", {}).get("url", ""),
                 "homepage": version_data.get("homepage", ""),
-                "bugs": version_data.get("bugs", {}).get("url", "")
+                "bugs": version_data.get("bugs", {}).get("url", ""),
+                "dist": version_data.get("dist", {})
             }
         except requests.RequestException as e:
-            print(f"Error fetching npm info for {package_name}@{version_range}: {str(e)}")
+            logger.warning("Error fetching npm info for %s@%s: %s", package_name, version_range, e)
         except (KeyError, ValueError) as e:
-            print(f"Error parsing npm info for {package_name}@{version_range}: {str(e)}")
+            logger.warning("Error parsing npm info for %s@%s: %s", package_name, version_range, e)
         return None
-
-    @staticmethod
-    def parse_version_range(version_range):
-        if version_range.startswith('^'):
-            base_version = version_range[1:]
-            major = int(base_version.split('.')[0])
-            return f">={base_version} <{major+1}.0.0"
-        elif version_range.startswith('~'):
-            base_version = version_range[1:]
-            major, minor = map(int, base_version.split('.')[:2])
-            return f">={base_version} <{major}.{minor+1}.0"
-        else:
-            return version_range
-
-    @staticmethod
-    def version_satisfies(version, range_str):
-        if range_str.startswith('>='):
-            min_version, max_version = range_str.split()
-            return semver.VersionInfo.parse(version) >= semver.VersionInfo.parse(min_version[2:]) and \
-                   semver.VersionInfo.parse(version) < semver.VersionInfo.parse(max_version[1:])
-        else:
-            return semver.match(version, range_str)
-
-    @staticmethod
-    def get_timestamp():
-        from datetime import datetime
-        return datetime.utcnow().isoformat() + "Z"
\ No newline at end of file
@@ -0,0 +1,239 @@
+import json
+import re
+from models.graph import DependencyGraph, DEV, OPTIONAL
+
+try:
+    import tomllib
+except ImportError:
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+NPM_DEPENDENCY_FIELDS = ('dependencies', 'optionalDependencies', 'peerDependencies')
+
+
+def parse_package_lock(file_content):
+    """
+    Build the full dependency graph from a ``package-lock.json`` (lockfile
+    version 2 or 3). Edges follow node's module resolution: a dependency of
+    ``node_modules/a`` is looked up in ``node_modules/a/node_modules`` first
+    and then in each enclosing ``node_modules`` directory.
+    """
+    lock = json.loads(file_content)
+    packages = lock.get('packages')
+    if packages is None:
+        raise ValueError("package-lock.json v1 is not supported, regenerate it with npm 7 or later")
+
+    root = packages.get('', {})
+    graph = DependencyGraph(root.get('name', lock.get('name', '')), root.get('version', lock.get('version', '')))
+
+    nodes = {'': graph.ROOT}
+    for path, entry in packages.items():
+        if path == '' or entry.get('link'):
+            continue
+        name = entry.get('name') or path.rsplit('node_modules/', 1)[-1]
+        flags = (DEV if entry.get('dev') else 0) | (OPTIONAL if entry.get('optional') else 0)
+        nodes[path] = graph.add_node(name, entry.get('version', ''), _npm_license(entry), flags)
+
+    # Workspace links point at the package directory they resolve to.
+    for path, entry in packages.items():
+        if entry.get('link') and entry.get('resolved') in nodes:
+            nodes[path] = nodes[entry['resolved']]
+
+    for path, entry in packages.items():
+        source = nodes.get(path)
+        if source is None:
+            continue
+        fields = NPM_DEPENDENCY_FIELDS + (('devDependencies',) if path == '' else ())
+        for field in fields:
+            for dep_name in entry.get(field, {}):
+                target = nodes.get(_resolve_node_module(packages, path, dep_name))
+                if target is None:
+                    continue
+                if source == graph.ROOT:
+                    graph.mark_direct(target, DEV if field == 'devDependencies' else 0)
+                else:
+                    graph.add_edge(source, target)
+
+    return graph.freeze()
+
+
+def _resolve_node_module(packages, path, name):
+    while True:
+        candidate = f"{path}/node_modules/{name}" if path else f"node_modules/{name}"
+        if candidate in packages:
+            return candidate
+        if not path:
+            return None
+        parent = path.rfind('/node_modules/')
+        path = path[:parent] if parent >= 0 else ''
+
+
+def _npm_license(entry):
+    license_info = entry.get('license') or entry.get('licenses')
+    if isinstance(license_info, list):
+        return ', '.join(lic.get('type', str(lic)) if isinstance(lic, dict) else str(lic) for lic in license_info)
+    if isinstance(license_info, dict):
+        return license_info.get('type', str(license_info))
+    return license_info or None
+
+
+def parse_yarn_lock(file_content, package_json=None):
+    """
+    Build the dependency graph from a ``yarn.lock`` in either the classic
+    (v1) or the Berry (v2+) format.
+
+    yarn.lock doesn't say which packages the project depends on directly, so
+    those come from ``package_json`` (or the Berry workspace entry). Without
+    either, every package nothing else depends on counts as direct.
+    """
+    entries = []
+    current = None
+    section = None
+    for raw_line in file_content.splitlines():
+        stripped = raw_line.strip()
+        if not stripped or stripped.startswith('#'):
+            continue
+        indent = len(raw_line) - len(raw_line.lstrip(' '))
+        if indent == 0:
+            descriptors = [d.strip().strip('"') for d in stripped.rstrip(':').split(',')]
+            current = {'descriptors': descriptors, 'version': '', 'dependencies': []}
+            if not descriptors[0].startswith('__metadata'):
+                entries.append(current)
+            section = None
+        elif current is None:
+            continue
+        elif indent <= 2:
+            key, value = _split_yarn_field(stripped)
+            section = key if value == '' else None
+            if key == 'version':
+                current['version'] = value
+        elif section in ('dependencies', 'optionalDependencies'):
+            current['dependencies'].append(_split_yarn_field(stripped))
+
+    graph = DependencyGraph()
+    descriptors = {}
+    workspace_root = None
+    for entry in entries:
+        name, _ = _split_descriptor(entry['descriptors'][0])
+        if any('@workspace:.' == d[len(name):] for d in entry['descriptors']):
+            workspace_root = entry
+            continue
+        entry['node'] = graph.add_node(name, entry['version'])
+        for descriptor in entry['descriptors']:
+            descriptors[_split_descriptor(descriptor)] = entry['node']
+
+    for entry in entries:
+        source = entry.get('node', graph.ROOT if entry is workspace_root else None)
+        if source is None:
+            continue
+        for dep_name, dep_range in entry['dependencies']:
+            target = descriptors.get((dep_name, _normalize_yarn_range(dep_range)))
+            if target is None:
+                continue
+            if source == graph.ROOT:
+                graph.mark_direct(target)
+            else:
+                graph.add_edge(source, target)
+
+    if package_json is not None:
+        manifest = json.loads(package_json)
+        for field in ('dependencies', 'devDependencies', 'optionalDependencies'):
+            for dep_name, dep_range in manifest.get(field, {}).items():
+                target = descriptors.get((dep_name, _normalize_yarn_range(dep_range)))
+                if target is not None:
+                    graph.mark_direct(target, DEV if field == 'devDependencies' else 0)
+    elif workspace_root is None:
+        graph.mark_unreferenced_as_direct()
+
+    return graph.freeze()
+
+
+def _split_yarn_field(line):
+    if line.startswith('"'):
+        end = line.index('"', 1)
+        key, rest = line[1:end], line[end + 1:]
+    else:
+        parts = line.split(None, 1)
+        key, rest = parts[0], parts[1] if len(parts) > 1 else ''
+    key = key.rstrip(':')
+    return key, rest.strip().lstrip(':').strip().strip('"')
+
+
+def _split_descriptor(descriptor):
+    separator = descriptor.index('@', 1)
+    return descriptor[:separator], _normalize_yarn_range(descriptor[separator + 1:])
+
+
+def _normalize_yarn_range(version_range):
+    return version_range[4:] if version_range.startswith('npm:') else version_range
+
+
+def parse_poetry_lock(file_content, direct_names=None):
+    """
+    Build the dependency graph from a ``poetry.lock``.
+
+    :param direct_names: Names of the project's own dependencies; without
+                         them every package nothing else depends on counts
+                         as direct
+    """
+    if tomllib is None:
+        raise ValueError("Reading poetry.lock needs Python 3.11 or the tomli package")
+
+    lock = tomllib.loads(file_content)
+    graph = DependencyGraph()
+    nodes = {}
+    for package in lock.get('package', []):
+        flags = DEV if package.get('category') == 'dev' else 0
+        nodes[normalize_python_name(package['name'])] = graph.add_node(package['name'], package['version'], None, flags)
+
+    for package in lock.get('package', []):
+        source = nodes[normalize_python_name(package['name'])]
+        for dep_name in package.get('dependencies', {}):
+            target = nodes.get(normalize_python_name(dep_name))
+            if target is not None:
+                graph.add_edge(source, target)
+
+    _mark_direct_by_name(graph, nodes, direct_names, normalize_python_name)
+    return graph.freeze()
+
+
+def normalize_python_name(name):
+    return re.sub(r'[-_.]+', '-', name).lower()
+
+
+def parse_gradle_lockfile(file_content, direct_names=None):
+    """
+    Build a graph from a ``gradle.lockfile``. The lockfile lists every
+    resolved module but not who depends on whom, so modules declared in the
+    build file hang off the root and everything else is transitive without
+    edges.
+    """
+    graph = DependencyGraph()
+    nodes = {}
+    for line in file_content.splitlines():
+        line = line.strip()
+        if not line or line.startswith('#') or line.startswith('empty='):
+            continue
+        coordinates, _, configurations = line.partition('=')
+        parts = coordinates.split(':')
+        if len(parts) < 3:
+            continue
+        name = f"{parts[0]}:{parts[1]}"
+        configurations = [c for c in configurations.split(',') if c]
+        flags = DEV if configurations and all(c.startswith('test') for c in configurations) else 0
+        nodes[name] = graph.add_node(name, parts[2], None, flags)
+
+    _mark_direct_by_name(graph, nodes, direct_names, lambda name: name)
+    return graph.freeze()
+
+
+def _mark_direct_by_name(graph, nodes, direct_names, normalize):
+    if direct_names is None:
+        graph.mark_unreferenced_as_direct()
+        return
+    for name in direct_names:
+        target = nodes.get(normalize(name))
+        if target is not None:
+            graph.mark_direct(target)
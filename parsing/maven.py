@@ -0,0 +1,229 @@
+import io
+import os
+import re
+import threading
+import xml.etree.ElementTree as ElementTree
+import requests
+from client import RegistryClient
+from models.build import BuildScan, Declaration
+
+MAVEN_SEARCH_URL = os.environ.get("SBOMBER_MAVEN_SEARCH_URL", "https://search.maven.org/solrsearch/select")
+MAVEN_REPOSITORY_URL = os.environ.get("SBOMBER_MAVEN_REPOSITORY_URL", "https://repo1.maven.org/maven2").rstrip("/")
+PROPERTY_PATTERN = re.compile(r'\$\{([^}]+)\}')
+DEPENDENCY_FIELDS = ('groupId', 'artifactId', 'version', 'scope', 'type')
+
+
+class MavenMetadataStore:
+    """
+    Maven Central metadata of one parser, keyed on coordinates. A run shares
+    its parsers across repositories, and so this store too.
+
+    Search documents are fetched in batches: ``prefetch`` OR-combines up to
+    ``chunk_size`` ``g:/a:`` pairs into one Solr query. When the search index
+    has no license for an artifact, the license is read from its POM,
+    following ``<parent>`` POMs the way Maven inherits them. Each POM is
+    fetched at most once, however many artifacts share it.
+    """
+
+    def __init__(self, client=None, search_url=MAVEN_SEARCH_URL, repository_url=MAVEN_REPOSITORY_URL,
+                 chunk_size=50, max_parent_depth=5):
+        self.client = client or RegistryClient()
+        self.search_url = search_url
+        self.repository_url = repository_url
+        self.chunk_size = chunk_size
+        self.max_parent_depth = max_parent_depth
+        self._docs = {}
+        self._pom_licenses = {}
+        self._key_locks = {}
+        self._lock = threading.Lock()
+        self._errors = {}
+
+    def prefetch(self, coordinates, resolver):
+        """
+        Fetch the search documents for many ``(group, artifact)`` pairs with
+        as few queries as possible. Chunks are queried in parallel on
+        ``resolver``. A failed chunk is remembered for this store, so its
+        artifacts report the error instead of being queried one by one.
+        """
+        missing = sorted({coordinate for coordinate in coordinates if coordinate not in self._docs})
+        chunks = [missing[i:i + self.chunk_size] for i in range(0, len(missing), self.chunk_size)]
+        resolver.map(self.search_url, self._search_chunk, chunks)
+
+    def doc(self, group_id, artifact_id):
+        """
+        :return: The search document for the artifact, or None if Maven
+                 Central doesn't know it
+        """
+        coordinate = (group_id, artifact_id)
+        if coordinate in self._errors:
+            raise self._errors[coordinate]
+        if coordinate not in self._docs:
+            self._search_chunk([coordinate])
+            if coordinate in self._errors:
+                raise self._errors[coordinate]
+        return self._docs[coordinate]
+
+    def pom_licenses(self, group_id, artifact_id, version, depth=0):
+        """
+        :return: License names declared in the artifact's POM or inherited
+                 from its parents, [] if there are none
+        """
+        key = (group_id, artifact_id, version)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.RLock())
+
+        with key_lock:
+            if key in self._pom_licenses:
+                return self._pom_licenses[key]
+
+            try:
+                pom = self.client.get_text(self.pom_url(group_id, artifact_id, version), 'maven')
+            except requests.HTTPError as e:
+                if e.response is None or e.response.status_code != 404:
+                    raise
+                pom = None
+
+            try:
+                licenses, parent = self.parse_pom(pom) if pom else ([], None)
+            except ElementTree.ParseError:
+                licenses, parent = [], None
+            if not licenses and parent and depth < self.max_parent_depth:
+                licenses = self.pom_licenses(*parent, depth=depth + 1)
+            self._pom_licenses[key] = licenses
+            return licenses
+
+    def pom_url(self, group_id, artifact_id, version):
+        return f"{self.repository_url}/{group_id.replace('.', '/')}/{artifact_id}/{version}/{artifact_id}-{version}.pom"
+
+    @staticmethod
+    def parse_pom(content):
+        """
+        :return: Tuple of (license names, parent coordinates or None)
+        """
+        root = ElementTree.fromstring(content)
+        # Strip the POM namespace, if any, so lookups work for both forms.
+        for element in root.iter():
+            if isinstance(element.tag, str) and '}' in element.tag:
+                element.tag = element.tag.split('}', 1)[1]
+
+        licenses = [name.text.strip() for name in root.findall('licenses/license/name') if name.text]
+        parent = None
+        parent_element = root.find('parent')
+        if parent_element is not None:
+            parent = tuple(parent_element.findtext(field, '').strip() for field in ('groupId', 'artifactId', 'version'))
+            if not all(parent) or '${' in parent[2]:
+                parent = None
+        return licenses, parent
+
+    def _search_chunk(self, coordinates):
+        query = ' OR '.join(f'(g:"{group_id}" AND a:"{artifact_id}")' for group_id, artifact_id in coordinates)
+        params = {
+            'q': query,
+            'rows': len(coordinates),
+            'wt': 'json'
+        }
+        try:
+            data = self.client.get_json(self.search_url, 'maven', params=params)
+        except requests.RequestException as e:
+            for coordinate in coordinates:
+                self._errors[coordinate] = e
+            return
+
+        found = {(doc.get('g'), doc.get('a')): doc for doc in data['response']['docs']}
+        with self._lock:
+            for coordinate in coordinates:
+                self._docs[coordinate] = found.get(coordinate)
+
+    def clear(self):
+        with self._lock:
+            self._docs.clear()
+            self._pom_licenses.clear()
+            self._key_locks.clear()
+            self._errors.clear()
+
+
+def scan_pom_build(content, parent=None):
+    """
+    Scan a project's ``pom.xml`` with ``iterparse``, clearing elements as
+    soon as they are read so memory doesn't grow with the size of the file.
+
+    Dependencies are taken from ``<dependencies>``; ``<dependencyManagement>``
+    supplies versions for dependencies that don't declare one, and its
+    ``import``-scoped BOMs are reported as platform declarations. ``${...}``
+    references are interpolated from ``<properties>``, the project
+    coordinates and the inherited properties once the whole file is read.
+
+    :param parent: BuildScan of the parent module, whose properties and
+                   managed versions are inherited
+    :return: BuildScan
+    """
+    scan = BuildScan(parent)
+    properties = {}
+    dependencies = []
+    managed = []
+    path = []
+    current = None
+
+    for event, element in ElementTree.iterparse(io.BytesIO(content.encode('utf-8')), events=('start', 'end')):
+        tag = element.tag.split('}', 1)[-1] if isinstance(element.tag, str) else None
+        if event == 'start':
+            path.append(tag)
+            if tag == 'dependency' and path[-2:-1] == ['dependencies']:
+                current = {}
+            continue
+
+        text = (element.text or '').strip()
+        depth = len(path)
+        if current is not None and tag in DEPENDENCY_FIELDS and path[-2] == 'dependency':
+            current[tag] = text
+        elif tag == 'dependency' and current is not None:
+            if path[1:3] == ['dependencyManagement', 'dependencies'] and depth == 4:
+                managed.append(current)
+            elif path[1] == 'dependencies' and depth == 3:
+                dependencies.append(current)
+            current = None
+        elif depth == 3 and path[1] == 'properties':
+            properties[tag] = text
+        elif depth == 2 and tag in ('groupId', 'artifactId', 'version'):
+            properties[f"project.{tag}"] = text
+        elif depth == 3 and path[1] == 'parent' and tag in ('groupId', 'version'):
+            properties[f"project.parent.{tag}"] = text
+
+        path.pop()
+        if depth <= 3:
+            element.clear()
+
+    for field in ('groupId', 'version'):
+        properties.setdefault(f"project.{field}", properties.get(f"project.parent.{field}", ''))
+    for name in list(properties):
+        if name.startswith('project.'):
+            properties['pom.' + name[len('project.'):]] = properties[name]
+    scan.properties.update(properties)
+
+    for dependency in managed:
+        group_id, artifact_id, version = (_interpolate(dependency.get(field), scan.properties)
+                                          for field in ('groupId', 'artifactId', 'version'))
+        if dependency.get('scope') == 'import' and dependency.get('type') == 'pom':
+            scan.declarations.append(Declaration(group_id, artifact_id, version, 'import', platform=True))
+        elif version:
+            scan.managed[(group_id, artifact_id)] = version
+
+    for dependency in dependencies:
+        group_id, artifact_id, version = (_interpolate(dependency.get(field), scan.properties)
+                                          for field in ('groupId', 'artifactId', 'version'))
+        if not group_id or not artifact_id:
+            continue
+        scan.declarations.append(Declaration(group_id, artifact_id, version or scan.managed_version(group_id, artifact_id),
+                                             dependency.get('scope') or 'compile'))
+    return scan
+
+
+def _interpolate(value, properties, depth=0):
+    if not value or '${' not in value:
+        return value or None
+    if depth > 10:
+        return None
+    resolved = PROPERTY_PATTERN.sub(lambda match: properties.get(match.group(1), match.group()), value)
+    if resolved == value:
+        return None
+    return _interpolate(resolved, properties, depth + 1)
@@ -0,0 +1,78 @@
+import os
+import threading
+import requests
+from client import RegistryClient
+from parsing.semver_range import VersionIndex
+
+NPM_REGISTRY_URL = os.environ.get("SBOMBER_NPM_REGISTRY_URL", "https://registry.npmjs.org").rstrip("/") + "/{package}"
+VERSION_FIELDS = ('license', 'licenses', 'description', 'repository', 'homepage', 'bugs')
+DIST_FIELDS = ('shasum', 'integrity', 'tarball')
+
+
+class PackumentStore:
+    """
+    Per-run store of npm packuments.
+
+    Each package is fetched and decoded at most once, no matter how many
+    threads or code paths ask for it. With ``slim`` enabled only the fields
+    the parser reads are kept, so large packuments don't pile up in memory.
+    """
+
+    def __init__(self, registry_url=NPM_REGISTRY_URL, slim=True, client=None):
+        self.registry_url = registry_url
+        self.client = client or RegistryClient()
+        self.slim = slim
+        self._packuments = {}
+        self._indexes = {}
+        self._errors = {}
+        self._package_locks = {}
+        self._lock = threading.Lock()
+
+    def get(self, package_name):
+        with self._lock:
+            package_lock = self._package_locks.setdefault(package_name, threading.Lock())
+
+        with package_lock:
+            if package_name in self._packuments:
+                return self._packuments[package_name]
+            if package_name in self._errors:
+                raise self._errors[package_name]
+
+            try:
+                packument = self.client.get_json(self.registry_url.format(package=package_name), 'npm')
+            except requests.RequestException as e:
+                self._errors[package_name] = e
+                raise
+
+            if self.slim:
+                packument = self.slim_packument(packument)
+            self._packuments[package_name] = packument
+            return packument
+
+    def versions(self, package_name):
+        """
+        :return: VersionIndex over the package's published versions, built once per package
+        """
+        index = self._indexes.get(package_name)
+        if index is None:
+            index = VersionIndex(self.get(package_name).get('versions', {}))
+            self._indexes[package_name] = index
+        return index
+
+    def __len__(self):
+        return len(self._packuments)
+
+    @staticmethod
+    def slim_packument(packument):
+        versions = {}
+        for version, version_data in packument.get('versions', {}).items():
+            versions[version] = {field: version_data[field] for field in VERSION_FIELDS if field in version_data}
+            if 'dist' in version_data:
+                versions[version]['dist'] = {field: version_data['dist'][field] for field in DIST_FIELDS
+                                             if field in version_data['dist']}
+
+        slim = {'versions': versions, 'dist-tags': packument.get('dist-tags', {})}
+        for field in ('license', 'licenses'):
+            if field in packument:
+                slim[field] = packument[field]
+        return slim
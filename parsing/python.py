@@ -1,16 +1,39 @@
+import logging
+import os
 import re
 import requests
 from parsing.base import BaseParser
-from models.dependency import Dependency
+from models.dependency import LOOKUP_FAILED, Dependency
+from parsing.lockfiles import parse_poetry_lock
+
+logger = logging.getLogger(__name__)
+
+PYPI_URL = os.environ.get("SBOMBER_PYPI_URL", "https://pypi.org").rstrip("/") + "/pypi/{package}/json"
+INFO_FIELDS = ('license', 'summary', 'home_page', 'project_urls', 'version')
 
 class PythonParser(BaseParser):
-    def __init__(self):
-        self.pypi_url = "https://pypi.org/pypi/{package}/json"
+    ecosystem = 'pypi'
+
+    def __init__(self, resolver=None, client=None, license_index=None):
+        super().__init__(resolver, client, license_index)
+        self.pypi_url = PYPI_URL
+        self._projects = {}
+
+    @property
+    def registry_url(self):
+        return self.pypi_url
 
     def get_dependency_file_name(self):
         return "requirements.txt"
 
     def parse_dependencies(self, file_content):
+        return list(self.iter_dependencies(file_content))
+
+    def iter_dependencies(self, file_content, known_licenses=None):
+        dependencies = self.extract_dependencies(file_content)
+        return self.iter_resolved(dependencies, known_licenses)
+
+    def extract_dependencies(self, file_content):
         dependencies = []
         dep_pattern = re.compile(r'^([^=<>]+)([=<>]+)?(.+)?$')
         
@@ -21,21 +44,64 @@ class PythonParser(BaseParser):
                 if match:
                     name = match.group(1).strip()
                     version = match.group(3).strip() if match.group(3) else "Latest"
-                    license_info = self.get_license_info(name)
-                    dependencies.append(Dependency(name, version, license_info))
+                    dependencies.append(Dependency(name, version, None, self.ecosystem))
                 else:
-                    # Log or handle unparseable line
-                    print(f"Warning: Could not parse line: {line}")
+                    logger.warning("Could not parse requirement line: %s", line)
         
         return dependencies
 
-    def get_license_info(self, package_name):
+    def lookup_license(self, dependency):
+        return self.get_license_info(dependency.name, dependency.version)
+
+    def resolved_version(self, dependency):
+        if dependency.version != "Latest":
+            return super().resolved_version(dependency)
+        # An unpinned requirement installs the latest release.
         try:
-            response = requests.get(self.pypi_url.format(package=package_name))
-            response.raise_for_status()
-            data = response.json()
-            return data['info'].get('license', 'Unknown')
+            return self.project(dependency.name)['info'].get('version')
+        except (requests.RequestException, KeyError, ValueError) as e:
+            logger.debug("Could not resolve the latest version of %s: %s", dependency.name, e)
+            return None
+
+    def get_lockfile_names(self):
+        return ["poetry.lock"]
+
+    def build_graph(self, file_content, lockfile_name, lockfile_content):
+        direct_names = None
+        if file_content is not None:
+            direct_names = [dep.name for dep in self.extract_dependencies(file_content)]
+        return parse_poetry_lock(lockfile_content, direct_names)
+
+    def get_license_info(self, package_name, version=None):
+        license_info = self.indexed_license(self.ecosystem, package_name, version)
+        if license_info is not None:
+            return license_info
+
+        try:
+            return self.project(package_name)['info'].get('license') or 'Unknown'
         except requests.RequestException as e:
-            print(f"Error fetching license info for {package_name}: {str(e)}")
-            return "Unknown"
+            logger.warning("Error fetching license info for %s: %s", package_name, e)
+            return LOOKUP_FAILED
+
+    def project(self, package_name):
+        """
+        The package's PyPI metadata, fetched once per parser and slimmed down
+        to what the license lookup and the SBOM need.
+
+        :return: Dict with ``info`` (the INFO_FIELDS of the JSON API's info)
+                 and ``releases``, mapping versions to (sha256, URL) of the
+                 source distribution, or the first file if there is none
+        """
+        project = self._projects.get(package_name)
+        if project is None:
+            data = self.client.get_json(self.pypi_url.format(package=package_name), 'pypi')
+            releases = {}
+            for version, files in (data.get('releases') or {}).items():
+                files = sorted(files, key=lambda file: file.get('packagetype') != 'sdist')
+                if files and files[0].get('digests', {}).get('sha256'):
+                    releases[version] = (files[0]['digests']['sha256'], files[0].get('url'))
+            project = {'info': {field: data['info'][field] for field in INFO_FIELDS if field in data['info']},
+                       'releases': releases}
+            self._projects[package_name] = project
+        return project
 
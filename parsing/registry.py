@@ -0,0 +1,41 @@
+"""
+Parsers by repository language, imported on first use.
+
+Only the parsers a scan actually needs are loaded: a Python-only scan never
+imports the npm parser, its packument store or the semver range matcher,
+and a JavaScript scan never imports the Gradle and POM scanners.
+"""
+import importlib
+
+# Language, lower-cased, -> "module:class" of its parser. Languages that
+# share a parser share one instance per run.
+PARSERS = {
+    'java': 'parsing.java:JavaParser',
+    'kotlin': 'parsing.java:JavaParser',
+    'python': 'parsing.python:PythonParser',
+    'javascript': 'parsing.javascript:JavaScriptParser',
+    'typescript': 'parsing.javascript:JavaScriptParser',
+}
+
+
+def register_parser(language, target):
+    """
+    :param target: "module:class" of a BaseParser subclass
+    """
+    PARSERS[language.lower()] = target
+
+
+def parser_target(language):
+    """
+    :return: The "module:class" parsing ``language``
+    :raises ValueError: If no parser handles the language
+    """
+    target = PARSERS.get((language or '').lower())
+    if target is None:
+        raise ValueError(f"Unsupported language: {language}")
+    return target
+
+
+def parser_class(language):
+    module_name, _, class_name = parser_target(language).partition(':')
+    return getattr(importlib.import_module(module_name), class_name)
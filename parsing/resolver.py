@@ -0,0 +1,70 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+
+class LicenseResolver:
+    """
+    Fans registry lookups out over a shared thread pool.
+
+    Every registry host gets its own semaphore so that a single slow or
+    strict registry can't take over the whole pool. Results are returned in
+    the same order as the input, so the manifest order is preserved.
+    """
+
+    def __init__(self, max_workers=16, per_host_limit=8):
+        self.max_workers = max(1, max_workers)
+        self.per_host_limit = max(1, per_host_limit)
+        self._executor = None
+        self._host_semaphores = {}
+        self._lock = threading.Lock()
+
+    def map(self, url, func, items):
+        """
+        Call ``func`` for every item, at most ``per_host_limit`` at a time
+        against the host of ``url``.
+
+        :param url: Any URL on the registry host the lookups go to
+        :param func: Callable taking a single item
+        :param items: Iterable of items to resolve
+        :return: List of results in input order
+        """
+        return list(self.imap(url, func, items))
+
+    def imap(self, url, func, items):
+        """
+        Like ``map``, but returns an iterator that yields each result, in
+        input order, as soon as it and everything before it are done.
+        """
+        items = list(items)
+        if self.max_workers == 1 or len(items) <= 1:
+            return (func(item) for item in items)
+
+        semaphore = self._host_semaphore(urlparse(url).netloc if url else "")
+
+        def call(item):
+            with semaphore:
+                return func(item)
+
+        return self._get_executor().map(call, items)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix="license-resolver")
+            return self._executor
+
+    def _host_semaphore(self, host):
+        with self._lock:
+            semaphore = self._host_semaphores.get(host)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self.per_host_limit)
+                self._host_semaphores[host] = semaphore
+            return semaphore
@@ -0,0 +1,301 @@
+import re
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+
+VERSION_PATTERN = re.compile(
+    r'^\s*[=v]*\s*(\d+)\.(\d+)\.(\d+)'
+    r'(?:-([0-9A-Za-z-]+(?:\.[0-9A-Za-z-]+)*))?'
+    r'(?:\+[0-9A-Za-z-]+(?:\.[0-9A-Za-z-]+)*)?\s*$'
+)
+PARTIAL_PATTERN = re.compile(
+    r'^[=v]*(\d+|[xX*])(?:\.(\d+|[xX*])(?:\.(\d+|[xX*])'
+    r'(?:-([0-9A-Za-z-]+(?:\.[0-9A-Za-z-]+)*))?'
+    r'(?:\+[0-9A-Za-z-]+(?:\.[0-9A-Za-z-]+)*)?)?)?$'
+)
+COMPARATOR_PATTERN = re.compile(r'(<=|>=|<|>|=|~>|~|\^)?\s*([^\s<>=~^]+)')
+HYPHEN_PATTERN = re.compile(r'^\s*(\S+)\s+-\s+(\S+)\s*$')
+
+# Sorts below every prerelease of a version, so "<1.3.0-0" excludes 1.3.0-alpha.
+MIN_PRERELEASE = (0,)
+RELEASE = (1,)
+
+
+def version_key(version):
+    """
+    Turn a semver string into a tuple that sorts in semver precedence order.
+
+    :return: Tuple key, or None if the string isn't a valid version
+    """
+    match = VERSION_PATTERN.match(version)
+    if not match:
+        return None
+    major, minor, patch, prerelease = match.groups()
+    return (int(major), int(minor), int(patch), _prerelease_key(prerelease))
+
+
+def _prerelease_key(prerelease):
+    if not prerelease:
+        return RELEASE
+    identifiers = []
+    for part in prerelease.split('.'):
+        identifiers.append((0, int(part)) if part.isdigit() else (1, part))
+    return (0,) + tuple(identifiers)
+
+
+def _is_wildcard(part):
+    return part is None or part in ('x', 'X', '*')
+
+
+class Comparator:
+    def __init__(self, lower=None, lower_inclusive=True, upper=None, upper_inclusive=False, prerelease_base=None):
+        self.lower = lower
+        self.lower_inclusive = lower_inclusive
+        self.upper = upper
+        self.upper_inclusive = upper_inclusive
+        self.prerelease_base = prerelease_base
+
+
+class ComparatorSet:
+    """
+    A space-separated list of comparators. Their intersection is always a
+    single interval of versions, so the set is stored as one lower and one
+    upper bound.
+    """
+
+    def __init__(self, comparators):
+        self.lower = None
+        self.lower_inclusive = True
+        self.upper = None
+        self.upper_inclusive = False
+        # Prereleases only match when a comparator names a prerelease of the
+        # same major.minor.patch, as in node-semver.
+        self.prerelease_bases = set()
+
+        for comparator in comparators:
+            if comparator.lower is not None and (
+                    self.lower is None or comparator.lower > self.lower
+                    or (comparator.lower == self.lower and not comparator.lower_inclusive)):
+                self.lower = comparator.lower
+                self.lower_inclusive = comparator.lower_inclusive
+            if comparator.upper is not None and (
+                    self.upper is None or comparator.upper < self.upper
+                    or (comparator.upper == self.upper and not comparator.upper_inclusive)):
+                self.upper = comparator.upper
+                self.upper_inclusive = comparator.upper_inclusive
+            if comparator.prerelease_base is not None:
+                self.prerelease_bases.add(comparator.prerelease_base)
+
+    def contains(self, key):
+        if self.lower is not None:
+            if key < self.lower or (key == self.lower and not self.lower_inclusive):
+                return False
+        if self.upper is not None:
+            if key > self.upper or (key == self.upper and not self.upper_inclusive):
+                return False
+        if key[3] != RELEASE and key[:3] not in self.prerelease_bases:
+            return False
+        return True
+
+    def max_satisfying(self, index):
+        keys = index.keys
+        if self.upper is None:
+            position = len(keys)
+        elif self.upper_inclusive:
+            position = bisect_right(keys, self.upper)
+        else:
+            position = bisect_left(keys, self.upper)
+
+        while position > 0:
+            position -= 1
+            key = keys[position]
+            if self.lower is not None and (key < self.lower or (key == self.lower and not self.lower_inclusive)):
+                return None
+            if key[3] == RELEASE or key[:3] in self.prerelease_bases:
+                return position
+        return None
+
+
+class VersionRange:
+    """
+    A compiled npm version range.
+
+    Supports the full node-semver range grammar: ``||`` alternatives,
+    hyphen ranges, x-ranges, ``~`` and ``^`` ranges, primitive comparators
+    and prerelease tags. Compile once with ``VersionRange.compile`` and
+    match against a ``VersionIndex``.
+    """
+
+    def __init__(self, range_str):
+        self.range_str = range_str
+        self.sets = [self._parse_set(part) for part in range_str.split('||')]
+
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def compile(range_str):
+        return VersionRange(range_str)
+
+    def satisfies(self, version):
+        key = version_key(version)
+        return key is not None and any(comparator_set.contains(key) for comparator_set in self.sets)
+
+    def max_satisfying(self, index):
+        """
+        :return: Highest version in ``index`` that satisfies the range, or None
+        """
+        best = None
+        for comparator_set in self.sets:
+            position = comparator_set.max_satisfying(index)
+            if position is not None and (best is None or position > best):
+                best = position
+        return index.versions[best] if best is not None else None
+
+    def _parse_set(self, text):
+        text = text.strip()
+        hyphen = HYPHEN_PATTERN.match(text)
+        if hyphen:
+            return ComparatorSet(self._hyphen(*hyphen.groups()))
+
+        comparators = []
+        position = 0
+        while position < len(text):
+            if text[position].isspace():
+                position += 1
+                continue
+            match = COMPARATOR_PATTERN.match(text, position)
+            if not match:
+                raise ValueError(f"Invalid version range: {self.range_str}")
+            operator, partial = match.groups()
+            comparators.extend(self._comparators(operator or '', partial))
+            position = match.end()
+
+        if not comparators:
+            comparators.append(Comparator())
+        return ComparatorSet(comparators)
+
+    def _partial(self, partial):
+        match = PARTIAL_PATTERN.match(partial)
+        if not match:
+            raise ValueError(f"Invalid version in range {self.range_str}: {partial}")
+        major, minor, patch, prerelease = match.groups()
+        if _is_wildcard(major):
+            return None, None, None, None
+        if _is_wildcard(minor):
+            return int(major), None, None, None
+        if _is_wildcard(patch):
+            return int(major), int(minor), None, None
+        return int(major), int(minor), int(patch), prerelease
+
+    def _comparators(self, operator, partial):
+        major, minor, patch, prerelease = self._partial(partial)
+        base = None
+        if patch is not None and prerelease:
+            base = (major, minor, patch)
+        exact = (major, minor, patch, _prerelease_key(prerelease)) if patch is not None else None
+
+        if operator in ('', '='):
+            if major is None:
+                return [Comparator()]
+            if exact is not None:
+                return [Comparator(exact, True, exact, True, base)]
+            return [Comparator(*self._xrange(major, minor))]
+
+        if operator in ('~', '~>'):
+            if major is None:
+                return [Comparator()]
+            lower = exact or (major, minor or 0, 0, RELEASE)
+            if minor is None:
+                upper = (major + 1, 0, 0, MIN_PRERELEASE)
+            else:
+                upper = (major, minor + 1, 0, MIN_PRERELEASE)
+            return [Comparator(lower, True, upper, False, base)]
+
+        if operator == '^':
+            if major is None:
+                return [Comparator()]
+            lower = exact or (major, minor or 0, 0, RELEASE)
+            if major > 0 or minor is None:
+                upper = (major + 1, 0, 0, MIN_PRERELEASE)
+            elif minor > 0 or patch is None:
+                upper = (0, minor + 1, 0, MIN_PRERELEASE)
+            else:
+                upper = (0, 0, patch + 1, MIN_PRERELEASE)
+            return [Comparator(lower, True, upper, False, base)]
+
+        if major is None:
+            # ">=*" and "<=*" match everything, "<*" and ">*" match nothing.
+            if operator in ('>=', '<='):
+                return [Comparator()]
+            return [Comparator(upper=(0, 0, 0, MIN_PRERELEASE))]
+
+        if operator == '>':
+            if exact is not None:
+                return [Comparator(lower=exact, lower_inclusive=False, prerelease_base=base)]
+            lower = (major + 1, 0, 0, RELEASE) if minor is None else (major, minor + 1, 0, RELEASE)
+            return [Comparator(lower=lower)]
+        if operator == '>=':
+            return [Comparator(lower=exact or (major, minor or 0, 0, RELEASE), prerelease_base=base)]
+        if operator == '<':
+            upper = exact or (major, minor or 0, 0, MIN_PRERELEASE)
+            return [Comparator(upper=upper, prerelease_base=base)]
+        if operator == '<=':
+            if exact is not None:
+                return [Comparator(upper=exact, upper_inclusive=True, prerelease_base=base)]
+            return [Comparator(upper=self._xrange(major, minor)[2])]
+        raise ValueError(f"Invalid operator in range {self.range_str}: {operator}")
+
+    @staticmethod
+    def _xrange(major, minor):
+        if minor is None:
+            return (major, 0, 0, RELEASE), True, (major + 1, 0, 0, MIN_PRERELEASE), False
+        return (major, minor, 0, RELEASE), True, (major, minor + 1, 0, MIN_PRERELEASE), False
+
+    def _hyphen(self, start, end):
+        major, minor, patch, prerelease = self._partial(start)
+        comparators = []
+        if major is not None:
+            lower = (major, minor or 0, patch or 0, _prerelease_key(prerelease if patch is not None else None))
+            base = (major, minor, patch) if patch is not None and prerelease else None
+            comparators.append(Comparator(lower=lower, prerelease_base=base))
+
+        major, minor, patch, prerelease = self._partial(end)
+        if major is not None:
+            if patch is not None:
+                base = (major, minor, patch) if prerelease else None
+                comparators.append(Comparator(upper=(major, minor, patch, _prerelease_key(prerelease)),
+                                              upper_inclusive=True, prerelease_base=base))
+            else:
+                comparators.append(Comparator(upper=self._xrange(major, minor)[2]))
+        return comparators
+
+
+class VersionIndex:
+    """
+    The published versions of one package, parsed once and sorted by semver
+    precedence so that range matching is a bisect instead of a scan.
+    """
+
+    def __init__(self, versions):
+        parsed = []
+        for version in versions:
+            key = version_key(version)
+            if key is not None:
+                parsed.append((key, version))
+        parsed.sort()
+        self.keys = [key for key, _ in parsed]
+        self.versions = [version for _, version in parsed]
+
+    def __len__(self):
+        return len(self.versions)
+
+    def max_satisfying(self, version_range, dist_tags=None):
+        """
+        Find the highest published version matching ``version_range``, which
+        may also be a dist-tag such as ``latest``.
+
+        :raises ValueError: If the range can't be parsed
+        """
+        version_range = version_range.strip()
+        if dist_tags and version_range in dist_tags:
+            tagged = dist_tags[version_range]
+            return tagged if version_key(tagged) is not None else None
+        return VersionRange.compile(version_range).max_satisfying(self)
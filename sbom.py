@@ -0,0 +1,212 @@
+"""
+CycloneDX components for every ecosystem, built by one SbomBuilder from
+per-ecosystem adapters.
+
+The builder writes the fields every component has: name, version, purl,
+bom-ref and license. An adapter adds what only the registry knows: the
+version a range resolves to, a description, artifact hashes and external
+references. Adapters read the metadata through the parser that resolved
+the licenses, so it normally comes out of the parser's in-memory store or
+the metadata cache without another request.
+"""
+import base64
+import re
+import requests
+from models.dependency import LOOKUP_FAILED, UNPINNED_VERSIONS, package_url
+
+SPDX_ID_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9.+-]*$')
+UNKNOWN_LICENSES = {'', 'Unknown', 'UNKNOWN', LOOKUP_FAILED}
+
+
+def license_choice(license_info):
+    """
+    :return: CycloneDX license entry: an ``id`` for what looks like an SPDX
+             identifier, otherwise a free-form ``name``; None when unknown
+    """
+    if license_info is None or license_info.strip() in UNKNOWN_LICENSES:
+        return None
+    if SPDX_ID_PATTERN.match(license_info):
+        return {"license": {"id": license_info}}
+    return {"license": {"name": license_info}}
+
+
+class ComponentInfo:
+    """
+    Registry metadata of one component, as found by an adapter.
+
+    :param version: The concrete version, when the dependency names a range
+    :param hashes: List of (CycloneDX algorithm, hex digest)
+    :param references: List of (CycloneDX reference type, URL)
+    """
+
+    __slots__ = ('version', 'description', 'hashes', 'references')
+
+    def __init__(self, version=None, description=None, hashes=(), references=()):
+        self.version = version
+        self.description = description
+        self.hashes = list(hashes)
+        self.references = [(kind, url) for kind, url in references if url]
+
+
+class EcosystemAdapter:
+    """
+    Adapter for an ecosystem without registry metadata: components get a
+    purl and a license only. Subclasses override ``info``.
+    """
+
+    def __init__(self, parser):
+        self.parser = parser
+        self.ecosystem = parser.ecosystem
+
+    def bom_ref(self, name, version):
+        return package_url(self.ecosystem, name, version) or f"{name}@{version}"
+
+    def info(self, dep):
+        """
+        :return: ComponentInfo, or None if the registry doesn't know the package
+        """
+        return None
+
+
+class NpmAdapter(EcosystemAdapter):
+    """
+    Resolves the range to the highest matching published version and takes
+    the hashes from its ``dist`` entry: ``shasum`` and the SHA-512
+    ``integrity`` of the tarball.
+    """
+
+    def info(self, dep):
+        npm_info = self.parser.fetch_npm_package_info(dep.name, dep.version)
+        if not npm_info:
+            return None
+        dist = npm_info.get("dist") or {}
+        hashes = []
+        if dist.get("shasum"):
+            hashes.append(("SHA-1", dist["shasum"]))
+        for integrity in (dist.get("integrity") or "").split():
+            algorithm, _, digest = integrity.partition("-")
+            if algorithm in ("sha256", "sha384", "sha512"):
+                hashes.append((f"SHA-{algorithm[3:]}", base64.b64decode(digest).hex()))
+        return ComponentInfo(
+            version=npm_info["version"],
+            description=npm_info["description"],
+            hashes=hashes,
+            references=[("website", npm_info["homepage"]), ("issue-tracker", npm_info["bugs"]),
+                        ("vcs", npm_info["repository"]), ("distribution", dist.get("tarball"))],
+        )
+
+
+class PypiAdapter(EcosystemAdapter):
+    """
+    Reads the project from the PyPI JSON API. Hashes are those of the
+    release's source distribution, or its first wheel when it has none.
+    """
+
+    # project_urls labels, lower-cased, and the reference types they map to.
+    PROJECT_URL_TYPES = {
+        "homepage": "website", "home": "website", "documentation": "documentation", "docs": "documentation",
+        "source": "vcs", "source code": "vcs", "repository": "vcs", "code": "vcs",
+        "issues": "issue-tracker", "bug tracker": "issue-tracker", "tracker": "issue-tracker",
+        "changelog": "release-notes",
+    }
+
+    def info(self, dep):
+        try:
+            project = self.parser.project(dep.name)
+        except (requests.RequestException, KeyError, ValueError):
+            return None
+        metadata = project['info']
+        references = [("website", metadata.get('home_page'))]
+        for label, url in (metadata.get('project_urls') or {}).items():
+            kind = self.PROJECT_URL_TYPES.get(label.lower())
+            if kind is not None:
+                references.append((kind, url))
+
+        hashes = []
+        release = project['releases'].get(dep.version) if dep.version not in UNPINNED_VERSIONS else None
+        if release is not None:
+            sha256, url = release
+            hashes.append(("SHA-256", sha256))
+            references.append(("distribution", url))
+        return ComponentInfo(description=metadata.get('summary'), hashes=hashes,
+                             references=_unique(references))
+
+
+class MavenAdapter(EcosystemAdapter):
+    """
+    Maven Central search documents carry no hashes, and fetching the
+    ``.sha1`` of every artifact would cost a request per component, so
+    Maven components only get references: the artifact page and the jar.
+    """
+
+    def info(self, dep):
+        if ':' not in dep.name:
+            return None
+        group_id, artifact_id = dep.name.split(':', 1)
+        references = [("website", f"https://central.sonatype.com/artifact/{group_id}/{artifact_id}")]
+        if dep.version not in UNPINNED_VERSIONS and '$' not in dep.version:
+            jar_url = self.parser.maven.pom_url(group_id, artifact_id, dep.version)[:-len(".pom")] + ".jar"
+            references = [("website", f"{references[0][1]}/{dep.version}"), ("distribution", jar_url)]
+        return ComponentInfo(references=references)
+
+
+# Ecosystem -> adapter class; ecosystems without one get EcosystemAdapter.
+ADAPTERS = {
+    'npm': NpmAdapter,
+    'pypi': PypiAdapter,
+    'maven': MavenAdapter,
+}
+
+
+def register_adapter(ecosystem, adapter_class):
+    ADAPTERS[ecosystem] = adapter_class
+
+
+def adapter_for(parser):
+    return ADAPTERS.get(parser.ecosystem, EcosystemAdapter)(parser)
+
+
+class SbomBuilder:
+    """
+    Builds CycloneDX components for dependencies from any parser, with one
+    adapter per parser.
+    """
+
+    def __init__(self):
+        self._adapters = {}
+
+    def adapter(self, parser):
+        adapter = self._adapters.get(id(parser))
+        if adapter is None:
+            adapter = self._adapters[id(parser)] = adapter_for(parser)
+        return adapter
+
+    def bom_ref(self, parser, name, version):
+        return self.adapter(parser).bom_ref(name, version)
+
+    def component(self, parser, dep):
+        adapter = self.adapter(parser)
+        info = adapter.info(dep)
+        version = info.version if info is not None and info.version else dep.version
+
+        component = {"type": "library", "name": dep.name, "version": version}
+        if info is not None and info.description:
+            component["description"] = info.description
+        if info is not None and info.hashes:
+            component["hashes"] = [{"alg": algorithm, "content": digest} for algorithm, digest in info.hashes]
+        ref = adapter.bom_ref(dep.name, version)
+        component["purl"] = ref
+        component["bom-ref"] = ref
+        if info is not None and info.references:
+            component["externalReferences"] = [{"type": kind, "url": url} for kind, url in info.references]
+        license_entry = license_choice(dep.license)
+        if license_entry is not None:
+            component["licenses"] = [license_entry]
+        return component
+
+
+def _unique(references):
+    unique = {}
+    for reference in references:
+        unique.setdefault(reference, None)
+    return list(unique)
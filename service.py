@@ -0,0 +1,529 @@
+"""
+Long-running analysis service: ``python main.py --serve [HOST:]PORT``.
+
+A local HTTP API takes repository and manifest jobs and runs them on a
+pool of job threads. The threads share one set of services: the metadata
+cache, the per-host connection pools and the license resolver, so what
+one job looked up is warm for the next. Identical registry requests that
+are in flight at the same time are coalesced by the RegistryClient.
+
+Each job gets its own parsers, and with them its own in-memory packument,
+PyPI and Maven stores. Those stores never expire and remember failed
+lookups, which is right for one run but not for a daemon: the metadata
+cache is what stays warm between jobs, with its TTLs and revalidation.
+
+    POST   /jobs              submit a job, returns 202 with its id
+    GET    /jobs              list jobs
+    GET    /jobs/<id>         poll a job; ?wait=<seconds> blocks until it finishes
+    GET    /jobs/<id>/events  stream the job's events as JSON Lines until it finishes
+    DELETE /jobs/<id>         cancel a job that hasn't started
+    GET    /health            queue, cache and per-host request counters
+
+A job body names either a repository, as a GitHub URL or a path on the
+server's disk under ``--serve-root`` (local paths are refused without it):
+
+    {"repo": "https://github.com/owner/repo", "priority": 5, "discovery": "tree", "transitive": false}
+
+or carries the files to analyze:
+
+    {"files": {"package.json": "...", "package-lock.json": "..."}, "transitive": true}
+
+``output`` (json, jsonl, csv, console or cyclonedx) also renders the
+finished result as a document. Jobs with a higher ``priority`` start
+first. At most ``jobs_per_host`` jobs run at once against the same source
+host, so one slow GitHub doesn't tie up every thread, and registry
+lookups stay within the resolver's per-host limit across all jobs.
+"""
+import copy
+import io
+import itertools
+import json
+import logging
+import os
+import posixpath
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from github import GitHubAPI
+from incremental import AnalysisStore
+from instrumentation import recorder
+from local import LANGUAGE_MANIFESTS, is_local
+from output import SINKS, create_sink
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = {DONE, FAILED, CANCELLED}
+
+DISCOVERY_MODES = ("root", "tree", "tarball")
+MAX_BODY_SIZE = 64 * 1024 * 1024
+MAX_WAIT = 300
+# With --stats or --trace, the spans kept for the report at shutdown.
+MAX_SPANS = 100000
+
+
+class JobError(ValueError):
+    pass
+
+
+class MemoryRepository:
+    """
+    Stands in for GitHubAPI for a manifest job: the files posted with the
+    job are the whole repository.
+    """
+
+    group_by_directory = staticmethod(GitHubAPI.group_by_directory)
+
+    def __init__(self, files):
+        self.files = files
+
+    def get_repo_info(self, repo_url=None):
+        language = None
+        for file_name, manifest_language in LANGUAGE_MANIFESTS:
+            if any(posixpath.basename(path) == file_name for path in self.files):
+                language = manifest_language
+                break
+        return {"name": "manifest", "full_name": None, "language": language, "default_branch": None}
+
+    def get_commit_sha(self, repo_url=None, ref=None):
+        return None
+
+    def get_dependency_file(self, repo_url, file_name):
+        if file_name not in self.files:
+            raise FileNotFoundError(f"{file_name} was not submitted")
+        return self.files[file_name]
+
+    def find_manifests(self, repo_url, ref, file_names, resolver=None):
+        file_names = set(file_names)
+        return {path: content for path, content in self.files.items() if posixpath.basename(path) in file_names}
+
+    find_manifests_in_tarball = find_manifests
+
+
+class Job:
+    def __init__(self, params, priority, host):
+        self.id = uuid.uuid4().hex
+        self.params = params
+        self.priority = priority
+        self.host = host
+        self.status = QUEUED
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.document = None
+        self.error = None
+        self.events = []
+        self.changed = threading.Condition()
+        self.add_event("status", status=QUEUED)
+
+    def add_event(self, event, **fields):
+        with self.changed:
+            self.events.append({"event": event, **fields})
+            self.changed.notify_all()
+
+    def set_status(self, status, **fields):
+        with self.changed:
+            self.status = status
+            if status == RUNNING:
+                self.started_at = time.time()
+            elif status in FINISHED:
+                self.finished_at = time.time()
+        self.add_event("status", status=status, **fields)
+
+    def wait(self, timeout):
+        with self.changed:
+            self.changed.wait_for(lambda: self.status in FINISHED, timeout)
+
+    def iter_events(self, timeout=None):
+        """
+        Yield every event so far, then each new one as it happens, until the
+        job finishes or no event arrives for ``timeout`` seconds.
+        """
+        index = 0
+        while True:
+            with self.changed:
+                if not self.changed.wait_for(lambda: index < len(self.events) or self.status in FINISHED, timeout):
+                    return
+                events = self.events[index:]
+                finished = self.status in FINISHED
+            index += len(events)
+            yield from events
+            if finished and index == len(self.events):
+                return
+
+    def summary(self, with_result=True):
+        summary = {
+            "id": self.id,
+            "status": self.status,
+            "priority": self.priority,
+            "repo": self.params.get("repo"),
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if self.error is not None:
+            summary["error"] = self.error
+        if with_result and self.result is not None:
+            summary["result"] = self.result
+            if self.document is not None:
+                summary["document"] = self.document
+        return summary
+
+
+class AnalysisService:
+    """
+    Job queue and job threads over one shared set of services, see the
+    module docstring.
+
+    :param args: Parsed command line; its cache, concurrency, license index,
+                 advisories and internal packages apply to every job, and
+                 ``serve_root`` is the directory local paths must be under
+    """
+
+    def __init__(self, args, workers=4, jobs_per_host=4, max_finished=1000):
+        from main import create_services
+
+        self.args = args
+        self.workers = max(1, workers)
+        self.jobs_per_host = max(1, jobs_per_host)
+        self.max_finished = max_finished
+        self.cache, self.transport, self.client, self.resolver = create_services(args)
+        self.github_token = os.environ.get('GITHUB_TOKEN')
+        self.github_api = GitHubAPI(self.github_token, self.client)
+        self.store = AnalysisStore(args.cache_dir) if args.incremental else None
+        self.local_root = os.path.realpath(args.serve_root) if getattr(args, "serve_root", None) else None
+        self.jobs = {}
+        self._queue = []
+        self._sequence = itertools.count()
+        self._running = {}
+        self._condition = threading.Condition()
+        self._threads = []
+        self._stopping = False
+
+    def start(self):
+        for number in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-{number}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self):
+        from main import close_services
+
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join()
+        close_services(self.cache, self.transport, self.client, self.resolver)
+        if self.store is not None:
+            self.store.close()
+
+    def submit(self, params):
+        """
+        :return: The queued Job
+        :raises JobError: If the job description is invalid
+        """
+        params = self._validate(params)
+        if "repo" in params:
+            host = "local" if is_local(params["repo"]) else urlparse(params["repo"]).netloc or "github.com"
+        else:
+            host = None
+        job = Job(params, params.get("priority", 0), host)
+        with self._condition:
+            self.jobs[job.id] = job
+            self._queue.append((-job.priority, next(self._sequence), job))
+            self._queue.sort(key=lambda item: item[:2])
+            self._condition.notify()
+        logger.info("Queued job %s (%s)", job.id, params.get("repo") or "manifest")
+        return job
+
+    def cancel(self, job_id):
+        """
+        :return: Whether the job was still queued and is now cancelled
+        """
+        with self._condition:
+            for index, (_, _, job) in enumerate(self._queue):
+                if job.id == job_id:
+                    del self._queue[index]
+                    break
+            else:
+                return False
+        job.set_status(CANCELLED)
+        self._forget_finished()
+        return True
+
+    def health(self):
+        with self._condition:
+            queued = len(self._queue)
+            running = dict(self._running)
+        return {
+            "status": "ok",
+            "workers": self.workers,
+            "queued": queued,
+            "running": sum(running.values()),
+            "running_per_host": running,
+            "jobs": len(self.jobs),
+            "cache": dict(self.client.stats),
+            "hosts": self.transport.stats(),
+        }
+
+    def _validate(self, params):
+        if not isinstance(params, dict):
+            raise JobError("The job must be a JSON object")
+        if ("repo" in params) == ("files" in params):
+            raise JobError("A job needs either 'repo' or 'files'")
+        if "repo" in params:
+            if not isinstance(params["repo"], str) or not params["repo"]:
+                raise JobError("'repo' must be a repository URL or a path")
+            path = self._local_path(params["repo"])
+            if path is not None:
+                params = dict(params, repo=path)
+            elif not self.github_token:
+                raise JobError("GITHUB_TOKEN is not set on the server, so only posted files and local paths "
+                               "under --serve-root can be analyzed")
+        else:
+            files = params["files"]
+            if (not isinstance(files, dict) or not files
+                    or not all(isinstance(path, str) and isinstance(content, str) for path, content in files.items())):
+                raise JobError("'files' must map file paths to their contents")
+        if not isinstance(params.get("priority", 0), int):
+            raise JobError("'priority' must be an integer")
+        if params.get("discovery") not in (None,) + DISCOVERY_MODES:
+            raise JobError(f"'discovery' must be one of {', '.join(DISCOVERY_MODES)}")
+        if params.get("output") not in (None, *SINKS):
+            raise JobError(f"'output' must be one of {', '.join(SINKS)}")
+        return params
+
+    def _local_path(self, repo):
+        """
+        :return: The real path of a job's local repository, relative paths
+                 being taken from the root, or None for a GitHub URL
+        :raises JobError: If the path is outside the root, or there is no root
+        """
+        if self.local_root is None:
+            if is_local(repo):
+                raise JobError("Local paths can't be analyzed; start the service with --serve-root to allow "
+                               "paths under a directory")
+            return None
+        path = os.path.realpath(os.path.join(self.local_root, repo))
+        if not is_local(path):
+            return None
+        if os.path.commonpath([path, self.local_root]) != self.local_root:
+            raise JobError("'repo' must be under the service's --serve-root")
+        return path
+
+    def _work(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            try:
+                self._run(job)
+            finally:
+                with self._condition:
+                    self._running[job.host] -= 1
+                    self._condition.notify_all()
+                self._forget_finished()
+
+    def _next_job(self):
+        # The highest-priority job whose source host has a free slot.
+        with self._condition:
+            while not self._stopping:
+                for index, (_, _, job) in enumerate(self._queue):
+                    if job.host is None or self._running.get(job.host, 0) < self.jobs_per_host:
+                        del self._queue[index]
+                        self._running[job.host] = self._running.get(job.host, 0) + 1
+                        job.set_status(RUNNING)
+                        return job
+                self._condition.wait()
+            return None
+
+    def _job_args(self, params, local):
+        args = copy.copy(self.args)
+        args.transitive = bool(params.get("transitive", self.args.transitive))
+        args.discovery = params.get("discovery") or self.args.discovery or ("tree" if local else "root")
+        args.output = params.get("output") or "json"
+        return args
+
+    def _run(self, job):
+        from main import analyze_repository, repository_source
+
+        try:
+            if "repo" in job.params:
+                repo_url = job.params["repo"]
+                args = self._job_args(job.params, is_local(repo_url))
+                source = repository_source(repo_url, self.github_api, args)
+                store = self.store
+            else:
+                repo_url = "manifest"
+                args = self._job_args(dict(job.params, discovery="tree"), True)
+                source = MemoryRepository(job.params["files"])
+                store = None
+            # Fresh parsers, so their stores don't outlive the job; see the module docstring.
+            repo_info, groups = analyze_repository(repo_url, args, source, self.resolver, self.client, {}, store)
+
+            projects = []
+            collected = []
+            for path, manifest_name, parser, dependencies, graph in groups:
+                resolved = []
+                for dep in dependencies:
+                    resolved.append(dep)
+                    job.add_event("dependency", path=path, manifest=manifest_name, dependency=dep.to_dict())
+                project = {"path": path, "manifest": manifest_name, "ecosystem": parser.ecosystem,
+                           "dependencies": [dep.to_dict() for dep in resolved]}
+                job.add_event("project", path=path, manifest=manifest_name, ecosystem=parser.ecosystem,
+                              dependencies=len(resolved))
+                projects.append(project)
+                collected.append((path, manifest_name, parser, resolved, graph))
+
+            job.result = {"repo": job.params.get("repo"), "language": repo_info.get('language'),
+                          "projects": projects}
+            if 'incremental' in repo_info:
+                job.result["incremental"] = repo_info['incremental']
+            if job.params.get("output"):
+                out = io.StringIO()
+                create_sink(args.output, out, grouped=args.discovery != "root",
+                            vulnerabilities=bool(args.advisories)).write_groups(repo_info, collected)
+                job.document = out.getvalue()
+            job.set_status(DONE)
+            logger.info("Finished job %s", job.id)
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+            job.set_status(FAILED, error=job.error)
+            logger.warning("Job %s failed: %s", job.id, job.error, exc_info=self.args.verbose)
+
+    def _forget_finished(self):
+        with self._condition:
+            finished = [job for job in self.jobs.values() if job.status in FINISHED]
+            for job in sorted(finished, key=lambda job: job.finished_at)[:max(0, len(finished) - self.max_finished)]:
+                del self.jobs[job.id]
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    # Set on the subclass made by make_server.
+    service = None
+
+    def log_message(self, format, *args):
+        logger.debug("%s %s", self.address_string(), format % args)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = url.path.strip("/").split("/")
+        if parts == ["health"]:
+            return self._send_json(200, self.service.health())
+        if parts == ["jobs"]:
+            with self.service._condition:
+                jobs = list(self.service.jobs.values())
+            return self._send_json(200, {"jobs": [job.summary(with_result=False) for job in jobs]})
+
+        job = self._job(parts)
+        if job is None:
+            return
+        if len(parts) == 2:
+            wait = parse_qs(url.query).get("wait")
+            if wait:
+                try:
+                    job.wait(min(float(wait[0]), MAX_WAIT))
+                except ValueError:
+                    return self._send_json(400, {"error": "'wait' must be a number of seconds"})
+            return self._send_json(200, job.summary())
+        if parts[2:] == ["events"]:
+            return self._stream_events(job)
+        self._send_json(404, {"error": "Not found"})
+
+    def do_POST(self):
+        if urlparse(self.path).path.strip("/") != "jobs":
+            return self._send_json(404, {"error": "Not found"})
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            return self._send_json(400, {"error": "Invalid Content-Length"})
+        if length > MAX_BODY_SIZE:
+            return self._send_json(413, {"error": "The job is too large"})
+        try:
+            job = self.service.submit(json.loads(self.rfile.read(length) or b"null"))
+        except (JobError, ValueError) as e:
+            return self._send_json(400, {"error": str(e)})
+        self._send_json(202, job.summary(), {"Location": f"/jobs/{job.id}"})
+
+    def do_DELETE(self):
+        parts = urlparse(self.path).path.strip("/").split("/")
+        job = self._job(parts)
+        if job is None:
+            return
+        if len(parts) != 2:
+            return self._send_json(404, {"error": "Not found"})
+        if not self.service.cancel(job.id):
+            return self._send_json(409, {"error": f"Job is {job.status}", "status": job.status})
+        self._send_json(200, job.summary())
+
+    def _job(self, parts):
+        job = self.service.jobs.get(parts[1]) if len(parts) >= 2 and parts[0] == "jobs" else None
+        if job is None:
+            self._send_json(404, {"error": "No such job"})
+        return job
+
+    def _stream_events(self, job):
+        # HTTP/1.0 without a Content-Length: the stream ends when the
+        # connection is closed after the job finishes.
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        try:
+            for event in job.iter_events(timeout=MAX_WAIT):
+                self.wfile.write(json.dumps(event).encode("utf-8") + b"\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def make_server(service, host="127.0.0.1", port=0):
+    handler = type("BoundServiceHandler", (ServiceHandler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def parse_address(address):
+    """
+    :return: Tuple of (host, port) from "PORT" or "HOST:PORT"
+    """
+    host, _, port = address.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def serve(args):
+    host, port = parse_address(args.serve)
+    if recorder.enabled:
+        recorder.limit(MAX_SPANS)
+    service = AnalysisService(args, workers=args.workers, jobs_per_host=args.jobs_per_host).start()
+    server = make_server(service, host, port)
+    logger.info("Serving on http://%s:%s with %s job threads", *server.server_address[:2], service.workers)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The modules live at the repository root and import each other by their
+# top-level names, as they do when main.py is run from there.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,103 @@
+"""
+Matching npm dependencies declared with ranges against OSV advisories,
+with the versions resolved from the fake npm registry in
+benchmarks/fake_upstream.py, which publishes 1.0.0 to 1.0.4 and 2.0.0.
+"""
+import io
+import json
+import pickle
+import threading
+import pytest
+from advisories import AdvisoryIndex, PackageIntervals
+from benchmarks.fake_upstream import FakeUpstream
+from client import RegistryClient
+from models.dependency import UNKNOWN_VULNERABILITIES, Dependency
+from output import CycloneDxSink
+from parsing.javascript import JavaScriptParser
+from parsing.packument import PackumentStore
+from parsing.resolver import LicenseResolver
+from parsing.semver_range import version_key
+
+ADVISORY = {
+    "id": "GHSA-1",
+    "summary": "Prototype pollution",
+    "affected": [{"package": {"ecosystem": "npm", "name": "lodash"},
+                  "ranges": [{"type": "SEMVER", "events": [{"introduced": "0"}, {"fixed": "1.0.5"}]}]}],
+}
+
+
+@pytest.fixture(scope="module")
+def parser():
+    with FakeUpstream() as upstream:
+        client = RegistryClient()
+        yield JavaScriptParser(resolver=LicenseResolver(max_workers=1), client=client,
+                               packuments=PackumentStore(upstream.url("npm") + "/{package}", client=client))
+
+
+@pytest.fixture
+def index():
+    index = AdvisoryIndex()
+    index.add(ADVISORY)
+    return index
+
+
+def annotate(index, parser, *versions):
+    return list(index.annotate([Dependency("lodash", version, "MIT", "npm") for version in versions], parser))
+
+
+def test_ranges_match_the_version_they_resolve_to(index, parser):
+    caret, tilde, exact, fixed = annotate(index, parser, "^1.0.0", "~1.0", "1.0.2", "^2.0.0")
+    assert [advisory.id for advisory in caret.vulnerabilities] == ["GHSA-1"]
+    assert [advisory.id for advisory in tilde.vulnerabilities] == ["GHSA-1"]
+    assert [advisory.id for advisory in exact.vulnerabilities] == ["GHSA-1"]
+    assert fixed.vulnerabilities == ()
+    assert caret.to_dict()["vulnerabilities"] == ["GHSA-1"]
+    assert fixed.to_dict()["vulnerabilities"] == []
+
+
+def test_unresolvable_versions_are_unknown(index, parser):
+    unresolvable, local = annotate(index, parser, "^9.0.0", "file:../lodash")
+    assert unresolvable.vulnerabilities is UNKNOWN_VULNERABILITIES
+    assert local.vulnerabilities is UNKNOWN_VULNERABILITIES
+    assert unresolvable.to_dict()["vulnerabilities"] is None
+    assert pickle.loads(pickle.dumps(unresolvable)).vulnerabilities is UNKNOWN_VULNERABILITIES
+
+
+def test_packages_without_advisories_are_not_resolved(index, parser):
+    dep = next(index.annotate([Dependency("left-pad", "^9.0.0", "MIT", "npm")], parser))
+    assert dep.vulnerabilities == () and dep.vulnerabilities is not UNKNOWN_VULNERABILITIES
+
+
+def test_cyclonedx_lists_the_advisory_for_the_resolved_component(index, parser):
+    out = io.StringIO()
+    groups = [("", "package.json", parser, annotate(index, parser, "^1.0.0", "^9.0.0"), None)]
+    CycloneDxSink(out, vulnerabilities=True).write_groups({"name": "bench"}, groups)
+    bom = json.loads(out.getvalue())
+
+    assert bom["components"][0]["bom-ref"] == "pkg:npm/lodash@1.0.4"
+    assert bom["vulnerabilities"][0]["affects"] == [{"ref": "pkg:npm/lodash@1.0.4"}]
+    assert bom["components"][1]["properties"] == [{"name": "sbomber:vulnerabilities", "value": "unknown"}]
+
+
+def test_concurrent_first_matches_see_a_complete_index():
+    intervals = PackageIntervals()
+    for minor in range(5000):
+        intervals.add_range(f"GHSA-{minor}", version_key(f"1.{minor}.0"), version_key(f"1.{minor}.5"), False)
+    barrier = threading.Barrier(8)
+    results, errors = [], []
+
+    def match():
+        barrier.wait()
+        try:
+            results.append(intervals.match("1.42.3", version_key("1.42.3")))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=match) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert results == [("GHSA-42",)] * 8
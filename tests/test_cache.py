@@ -0,0 +1,35 @@
+import os
+from cache import MetadataCache
+
+
+def stored_size(cache):
+    return cache._conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+
+
+def test_running_total_follows_puts_replacements_and_evictions(tmp_path):
+    cache = MetadataCache(str(tmp_path), max_size=100_000)
+    for number in range(1000):
+        cache.put(f"npm:package-{number}", 'npm', os.urandom(300))
+        cache.get("npm:package-0")
+    cache.put("npm:package-0", 'npm', os.urandom(50))
+
+    assert cache.size() == stored_size(cache) <= 100_000
+    # Package 0 was read after every put, so it outlived the others.
+    assert cache.get("npm:package-0") is not None
+    assert cache.get("npm:package-1") is None
+    cache.close()
+
+    reopened = MetadataCache(str(tmp_path), max_size=100_000)
+    assert reopened.size() == stored_size(reopened)
+    reopened.close()
+
+
+def test_total_is_seeded_for_caches_without_one(tmp_path):
+    cache = MetadataCache(str(tmp_path))
+    cache.put("pypi:requests", 'pypi', b"{}" * 100)
+    cache._conn.execute('DROP TABLE totals')
+    cache.close()
+
+    cache = MetadataCache(str(tmp_path))
+    assert cache.size() == stored_size(cache) > 0
+    cache.close()
@@ -0,0 +1,46 @@
+"""
+Batch workers, with npm served by benchmarks/fake_upstream.py.
+"""
+import functools
+import sys
+import pytest
+import fleet
+import parsing.javascript
+from benchmarks.fake_upstream import FakeUpstream
+from main import parse_arguments
+from models.dependency import LOOKUP_FAILED
+from parsing.packument import PackumentStore
+
+
+@pytest.fixture(scope="module")
+def upstream():
+    with FakeUpstream() as upstream:
+        yield upstream
+
+
+@pytest.fixture
+def worker(upstream, monkeypatch):
+    monkeypatch.setattr(parsing.javascript, "PackumentStore",
+                        functools.partial(PackumentStore, upstream.url("npm") + "/{package}"))
+    monkeypatch.setattr(sys, "stdout", sys.stdout)
+    monkeypatch.setattr(fleet, "_worker", {})
+    fleet._init_worker(parse_arguments(["--batch", "-", "--no-cache"]))
+    yield
+    fleet._worker['resolver'].shutdown()
+    fleet._worker['client'].transport.close()
+
+
+def checkout(path):
+    path.mkdir()
+    (path / "package.json").write_text('{"dependencies": {"left-pad": "^1.0.0"}}')
+    return str(path)
+
+
+def test_a_failed_lookup_does_not_outlive_its_repository(worker, upstream, tmp_path):
+    upstream.script("npm", (404, {}))
+    record = fleet._analyze_repository(checkout(tmp_path / "first"))
+    assert record["status"] == "ok"
+    assert record["projects"][0]["dependencies"][0]["license"] == LOOKUP_FAILED
+
+    record = fleet._analyze_repository(checkout(tmp_path / "second"))
+    assert record["projects"][0]["dependencies"][0]["license"] not in (LOOKUP_FAILED, "Unknown", None)
@@ -0,0 +1,70 @@
+"""
+Tree discovery against the fake GitHub from benchmarks/fake_upstream.py.
+"""
+import pytest
+from benchmarks.fake_upstream import FakeUpstream
+from cache import MetadataCache
+from client import RegistryClient
+from github import TARBALL_THRESHOLD, GitHubAPI
+from parsing.resolver import LicenseResolver
+
+FILE_NAMES = ["package.json", "requirements.txt"]
+
+
+@pytest.fixture(scope="module")
+def upstream():
+    with FakeUpstream() as upstream:
+        yield upstream
+
+
+def github_api(upstream, client):
+    api = GitHubAPI("token", client)
+    api.base_url = upstream.url("github")
+    return api
+
+
+def discover(upstream, api, repo, ref):
+    upstream.reset_stats()
+    manifests = api.find_manifests(f"https://github.com/{repo}", ref, FILE_NAMES, LicenseResolver(max_workers=4))
+    return manifests, sum(upstream.stats()["github"]["statuses"].values())
+
+
+def project(size):
+    files = {f"packages/package-{number}/package.json": f'{{"name": "package-{number}"}}' for number in range(size)}
+    files["README.md"] = "# monorepo"
+    return files
+
+
+def test_few_manifests_are_fetched_as_blobs(upstream):
+    files = project(3)
+    upstream.add_repository("test/small", "JavaScript", files)
+
+    manifests, requests_made = discover(upstream, github_api(upstream, RegistryClient()), "test/small", "main")
+
+    assert manifests == {path: content for path, content in files.items() if path.endswith("package.json")}
+    assert requests_made == 1 + 3
+
+
+def test_many_manifests_come_from_one_tarball(upstream, tmp_path):
+    files = project(TARBALL_THRESHOLD + 10)
+    upstream.add_repository("test/monorepo", "JavaScript", files)
+    expected = {path: content for path, content in files.items() if path.endswith("package.json")}
+    cache = MetadataCache(str(tmp_path))
+    api = github_api(upstream, RegistryClient(cache=cache))
+
+    manifests, requests_made = discover(upstream, api, "test/monorepo", "main")
+    assert manifests == expected
+    assert requests_made == 2
+
+    # The tarball's files were cached as blobs, so a new listing needs
+    # nothing else, and a change only downloads the blob that changed.
+    manifests, requests_made = discover(upstream, api, "test/monorepo", "v2")
+    assert manifests == expected
+    assert requests_made == 1
+
+    files["packages/package-0/package.json"] = '{"name": "package-0", "version": "2.0.0"}'
+    expected["packages/package-0/package.json"] = files["packages/package-0/package.json"]
+    manifests, requests_made = discover(upstream, api, "test/monorepo", "v3")
+    assert manifests == expected
+    assert requests_made == 2
+    cache.close()
@@ -0,0 +1,103 @@
+"""
+--incremental runs over a local checkout, against the fake npm registry
+and PyPI from benchmarks/fake_upstream.py.
+"""
+import json
+import os
+import pytest
+from benchmarks.fake_upstream import FakeUpstream
+from client import RegistryClient
+from incremental import AnalysisStore
+from local import LocalRepository
+from main import analyze_repository, group_records, parse_arguments
+from models.dependency import LOOKUP_FAILED
+from parsing.javascript import JavaScriptParser
+from parsing.packument import PackumentStore
+from parsing.python import PythonParser
+from parsing.resolver import LicenseResolver
+
+COMMIT = "0123456789abcdef0123456789abcdef01234567"
+
+
+@pytest.fixture(scope="module")
+def upstream():
+    with FakeUpstream() as upstream:
+        yield upstream
+
+
+@pytest.fixture
+def checkout(tmp_path):
+    (tmp_path / ".git").mkdir()
+    (tmp_path / ".git" / "HEAD").write_text(COMMIT + "\n")
+    (tmp_path / "requirements.txt").write_text("alpha==1.0.0\nbeta==1.1.0\n")
+    (tmp_path / "package.json").write_text(json.dumps({"dependencies": {"gamma": "^1.0.0"}}))
+    return tmp_path
+
+
+def analyze(upstream, checkout, cache_dir, pypi_up=True):
+    args = parse_arguments([str(checkout), "--incremental", "--cache-dir", str(cache_dir)])
+    client = RegistryClient()
+    resolver = LicenseResolver(max_workers=1)
+    python = PythonParser(resolver=resolver, client=client)
+    python.pypi_url = upstream.url("pypi") + ("/pypi" if pypi_up else "/down") + "/{package}/json"
+    javascript = JavaScriptParser(resolver=resolver, client=client,
+                                  packuments=PackumentStore(upstream.url("npm") + "/{package}", client=client))
+    parsers = {"parsing.python:PythonParser": python, "parsing.javascript:JavaScriptParser": javascript}
+    store = AnalysisStore(args.cache_dir)
+    try:
+        repo_info, groups = analyze_repository(args.repo_url, args, LocalRepository(args.repo_url), resolver, client,
+                                               parsers=parsers, store=store)
+        records = {record["manifest"]: record["dependencies"] for record in group_records(groups)}
+    finally:
+        store.close()
+    return records, repo_info["incremental"]
+
+
+def licenses(records, manifest):
+    return [dep["license"] for dep in records[manifest]]
+
+
+def test_failed_lookups_are_retried_on_an_unchanged_commit(upstream, checkout, tmp_path_factory):
+    cache_dir = tmp_path_factory.mktemp("cache")
+    records, _ = analyze(upstream, checkout, cache_dir, pypi_up=False)
+    assert licenses(records, "requirements.txt") == [LOOKUP_FAILED, LOOKUP_FAILED]
+
+    records, stats = analyze(upstream, checkout, cache_dir)
+    assert LOOKUP_FAILED not in licenses(records, "requirements.txt")
+    assert not stats["commit_unchanged"]
+    assert stats["manifests_changed"] == 1 and stats["manifests_unchanged"] == 1
+
+    records, stats = analyze(upstream, checkout, cache_dir)
+    assert stats["commit_unchanged"]
+    assert LOOKUP_FAILED not in licenses(records, "requirements.txt")
+
+
+def test_packages_without_a_license_are_settled(upstream, checkout, tmp_path_factory):
+    cache_dir = tmp_path_factory.mktemp("cache")
+    (checkout / "requirements.txt").write_text("alpha==1.0.0\nunlicensed-beta==1.1.0\n")
+    (checkout / "package.json").write_text(json.dumps({"dependencies": {"unlicensed-gamma": "^1.0.0"}}))
+    records, _ = analyze(upstream, checkout, cache_dir)
+    assert licenses(records, "requirements.txt")[1] == "Unknown"
+    assert licenses(records, "package.json") == ["Unknown"]
+
+    upstream.reset_stats()
+    records, stats = analyze(upstream, checkout, cache_dir)
+    assert stats["commit_unchanged"]
+    assert licenses(records, "requirements.txt")[1] == "Unknown"
+    assert sum(sum(service["statuses"].values()) for service in upstream.stats().values()) == 0
+
+
+def test_manifests_are_hashed_on_their_own(upstream, checkout, tmp_path_factory):
+    cache_dir = tmp_path_factory.mktemp("cache")
+    analyze(upstream, checkout, cache_dir)
+    (checkout / "requirements.txt").write_text("alpha==1.0.0\nbeta==1.2.0\n")
+    os.remove(checkout / ".git" / "HEAD")
+
+    records, stats = analyze(upstream, checkout, cache_dir)
+    assert stats["manifests_changed"] == 1 and stats["manifests_unchanged"] == 1
+    assert [dep["version"] for dep in records["requirements.txt"]] == ["1.0.0", "1.2.0"]
+
+
+def test_incremental_needs_the_cache(tmp_path):
+    with pytest.raises(SystemExit):
+        parse_arguments([str(tmp_path), "--incremental", "--no-cache"])
@@ -0,0 +1,49 @@
+"""
+Local checkouts and tarballs.
+"""
+import io
+import logging
+import tarfile
+from local import LocalRepository
+
+LOGO = b"\x89PNG\r\n\x1a\n\xff\xfe\x00binary"
+
+
+def make_tarball(path, files):
+    with tarfile.open(path, "w:gz") as archive:
+        for name, content in files.items():
+            member = tarfile.TarInfo(name)
+            member.size = len(content)
+            archive.addfile(member, io.BytesIO(content))
+    return str(path)
+
+
+def test_tarball_root_reads_only_root_files(tmp_path, caplog):
+    tarball = make_tarball(tmp_path / "proj.tar.gz", {
+        "proj/logo.png": LOGO,
+        "proj/README.md": b"# proj",
+        "proj/requirements.txt": b"alpha==1.0.0\n",
+        "proj/poetry.lock": b"",
+        "proj/gradle/libs.versions.toml": b"[versions]\n",
+        "proj/sub/package.json": b"{}",
+    })
+    repository = LocalRepository(tarball)
+
+    assert repository.get_repo_info()["language"] == "Python"
+    assert repository.get_dependency_file(None, "requirements.txt") == "alpha==1.0.0\n"
+    assert sorted(repository._tarball_root_files()) == ["gradle/libs.versions.toml", "poetry.lock",
+                                                        "requirements.txt"]
+    assert "logo.png" not in caplog.text
+
+
+def test_undecodable_manifests_are_skipped(tmp_path, caplog):
+    tarball = make_tarball(tmp_path / "proj.tar.gz", {
+        "proj/package.json": LOGO,
+        "proj/sub/package.json": b"{}",
+    })
+
+    with caplog.at_level(logging.WARNING):
+        manifests = LocalRepository(tarball).find_manifests(None, None, ["package.json"])
+
+    assert manifests == {"sub/package.json": "{}"}
+    assert "Skipping proj/package.json" in caplog.text
@@ -0,0 +1,30 @@
+"""
+Defaults of the base parser.
+"""
+from models.dependency import Dependency
+from parsing.base import BaseParser
+
+
+class ListParser(BaseParser):
+    ecosystem = 'generic'
+
+    def get_dependency_file_name(self):
+        return "deps.txt"
+
+    def get_lockfile_names(self):
+        return ["deps.lock"]
+
+    def parse_dependencies(self, file_content):
+        return [Dependency(*line.split(), 'MIT', self.ecosystem) for line in file_content.splitlines()]
+
+    def lookup_license(self, dependency):
+        return 'MIT'
+
+
+def test_build_graph_defaults_to_the_manifest_dependencies():
+    graph = ListParser().build_graph("alpha 1.0\nbeta 2.0\n", "deps.lock", "")
+
+    assert [(dep.name, dep.version, dep.license) for dep in graph.to_dependencies()] == [
+        ("alpha", "1.0", "MIT"), ("beta", "2.0", "MIT")]
+    assert all(graph.is_direct(node) for node in graph.nodes())
+    assert len(ListParser().build_graph(None, "deps.lock", "")) == 1
@@ -0,0 +1,75 @@
+"""
+LicenseResolver against the fake PyPI from benchmarks/fake_upstream.py,
+with latency injected into every response.
+"""
+import threading
+import time
+import pytest
+import requests
+from benchmarks.fake_upstream import FakeUpstream
+from client import RegistryClient
+from parsing.python import PythonParser
+from parsing.resolver import LicenseResolver
+
+LATENCY = 0.05
+REQUIREMENTS = "".join(f"package-{number}==1.{number % 10}.0\n" for number in reversed(range(24)))
+
+
+@pytest.fixture(scope="module")
+def upstream():
+    with FakeUpstream(latency=LATENCY, jitter=0.5) as upstream:
+        yield upstream
+
+
+def python_parser(upstream, resolver):
+    parser = PythonParser(resolver=resolver, client=RegistryClient())
+    parser.pypi_url = upstream.url("pypi") + "/pypi/{package}/json"
+    return parser
+
+
+def resolve(upstream, resolver):
+    parser = python_parser(upstream, resolver)
+    start = time.perf_counter()
+    try:
+        dependencies = parser.parse_dependencies(REQUIREMENTS)
+    finally:
+        resolver.shutdown()
+    return dependencies, time.perf_counter() - start
+
+
+def test_concurrent_resolution_keeps_manifest_order(upstream):
+    sequential, sequential_time = resolve(upstream, LicenseResolver(max_workers=1))
+    concurrent, concurrent_time = resolve(upstream, LicenseResolver(max_workers=16, per_host_limit=8))
+
+    expected = [line.split("==")[0] for line in REQUIREMENTS.splitlines()]
+    assert [dep.name for dep in concurrent] == expected
+    assert [(dep.name, dep.version, dep.license) for dep in concurrent] == \
+        [(dep.name, dep.version, dep.license) for dep in sequential]
+    assert all(dep.license not in (None, "Unknown") for dep in concurrent)
+    # 24 lookups, 8 at a time, take three round trips instead of 24.
+    assert sequential_time >= 24 * LATENCY * 0.5
+    assert concurrent_time < sequential_time / 3
+
+
+def test_lookups_are_bounded_per_host(upstream):
+    resolver = LicenseResolver(max_workers=16, per_host_limit=4)
+    lock = threading.Lock()
+    in_flight = [0, 0]
+
+    def lookup(number):
+        with lock:
+            in_flight[0] += 1
+            in_flight[1] = max(in_flight[1], in_flight[0])
+        try:
+            return requests.get(f"{upstream.url('pypi')}/pypi/package-{number}/json").json()["info"]["name"]
+        finally:
+            with lock:
+                in_flight[0] -= 1
+
+    try:
+        names = resolver.map(upstream.url("pypi"), lookup, range(16))
+    finally:
+        resolver.shutdown()
+
+    assert names == [f"package-{number}" for number in range(16)]
+    assert in_flight[1] == 4
@@ -0,0 +1,129 @@
+"""
+Lazy parser loading, and CycloneDX SBOMs for every ecosystem built from a
+fixed set of dependencies, with registry metadata served by
+benchmarks/fake_upstream.py.
+"""
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+import pytest
+from benchmarks.fake_upstream import FakeUpstream
+from client import RegistryClient
+from models.dependency import Dependency
+from output import CycloneDxSink
+from parsing.java import JavaParser
+from parsing.javascript import JavaScriptParser
+from parsing.maven import MavenMetadataStore
+from parsing.packument import PackumentStore
+from parsing.python import PythonParser
+from parsing.resolver import LicenseResolver
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ECOSYSTEM_MODULES = ["parsing.gradle", "parsing.java", "parsing.javascript", "parsing.maven", "parsing.packument",
+                     "parsing.python", "parsing.semver_range"]
+STARTUP = """
+import json, sys, time
+start = time.perf_counter()
+from main import get_parser
+get_parser(sys.argv[1])
+print(json.dumps({"seconds": time.perf_counter() - start,
+                  "loaded": sorted(name for name in %r if name in sys.modules)}))
+""" % ECOSYSTEM_MODULES
+
+
+def startup(language):
+    output = subprocess.run([sys.executable, "-c", STARTUP, language], cwd=ROOT, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output)
+
+
+@pytest.mark.parametrize("language, loaded", [
+    ("Python", ["parsing.python"]),
+    ("JavaScript", ["parsing.javascript", "parsing.packument", "parsing.semver_range"]),
+    ("Kotlin", ["parsing.gradle", "parsing.java", "parsing.maven"]),
+])
+def test_only_the_needed_parser_is_imported(language, loaded):
+    result = startup(language)
+    assert result["loaded"] == loaded
+    # A generous bound: the point is catching an import of everything, not timing.
+    assert result["seconds"] < 5
+
+
+@pytest.fixture(scope="module")
+def parsers():
+    with FakeUpstream() as upstream:
+        client = RegistryClient()
+        resolver = LicenseResolver(max_workers=1)
+        python = PythonParser(resolver=resolver, client=client)
+        python.pypi_url = upstream.url("pypi") + "/pypi/{package}/json"
+        yield upstream, {
+            "npm": JavaScriptParser(resolver=resolver, client=client,
+                                    packuments=PackumentStore(upstream.url("npm") + "/{package}", client=client)),
+            "pypi": python,
+            "maven": JavaParser(resolver=resolver, client=client,
+                                maven=MavenMetadataStore(client, search_url=f"{upstream.url('maven')}/solrsearch/select",
+                                                         repository_url=f"{upstream.url('maven')}/maven2")),
+        }
+
+
+def fixture_groups(parsers, count=1):
+    dependencies = {
+        "npm": [Dependency(f"left-pad-{number}", "^1.0.0", "MIT", "npm") for number in range(count)],
+        "pypi": [Dependency(f"Requests_{number}", "1.2.0", "Apache-2.0", "pypi") for number in range(count)],
+        "maven": [Dependency(f"org.example:lib-{number}", "1.0.1", "Apache License 2.0", "maven")
+                  for number in range(count)],
+    }
+    return [(ecosystem, f"manifest-{ecosystem}", parsers[ecosystem], dependencies[ecosystem], None)
+            for ecosystem in ("npm", "pypi", "maven")]
+
+
+def write_sbom(groups):
+    out = io.StringIO()
+    CycloneDxSink(out, grouped=True).write_groups({"name": "fixture", "full_name": "owner/fixture"}, groups)
+    return json.loads(out.getvalue())
+
+
+def test_sbom_covers_every_ecosystem(parsers):
+    upstream, parsers = parsers
+    bom = write_sbom(fixture_groups(parsers) + fixture_groups(parsers))
+    npm, pypi, maven = bom["components"]
+
+    assert bom["bomFormat"] == "CycloneDX"
+    assert [component["bom-ref"] for component in bom["components"]] == [
+        "pkg:npm/left-pad-0@1.0.4", "pkg:pypi/requests-0@1.2.0", "pkg:maven/org.example/lib-0@1.0.1"]
+
+    assert [item["alg"] for item in npm["hashes"]] == ["SHA-1", "SHA-512"]
+    assert [len(item["content"]) for item in npm["hashes"]] == [40, 128]
+    assert npm["licenses"] == [{"license": {"id": "MIT"}}]
+    assert {"type": "distribution", "url": f"{upstream.url('npm')}/left-pad-0/-/left-pad-0-1.0.4.tgz"} \
+        in npm["externalReferences"]
+
+    assert [item["alg"] for item in pypi["hashes"]] == ["SHA-256"]
+    assert pypi["description"] == "Benchmark package Requests_0"
+    assert {"type": "distribution", "url": f"{upstream.url('pypi')}/packages/Requests_0-1.2.0.tar.gz"} \
+        in pypi["externalReferences"]
+
+    assert "hashes" not in maven
+    assert maven["licenses"] == [{"license": {"name": "Apache License 2.0"}}]
+    assert {"type": "distribution", "url": f"{upstream.url('maven')}/maven2/org/example/lib-0/1.0.1/lib-0-1.0.1.jar"} \
+        in maven["externalReferences"]
+
+
+def test_sbom_throughput(parsers):
+    upstream, parsers = parsers
+    groups = fixture_groups(parsers, 200)
+    write_sbom(groups)
+
+    upstream.reset_stats()
+    start = time.perf_counter()
+    bom = write_sbom(groups)
+    per_second = len(bom["components"]) / (time.perf_counter() - start)
+    assert len(bom["components"]) == 600
+    # The second SBOM is built from the metadata the parsers hold in memory.
+    assert sum(sum(stats["statuses"].values()) for stats in upstream.stats().values()) == 0
+    # Thousands per second on a laptop, see benchmarks/sbom_bench.py; the
+    # floor leaves room for slow CI machines.
+    assert per_second > 300
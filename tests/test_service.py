@@ -0,0 +1,110 @@
+"""
+The service's HTTP API, with PyPI served by benchmarks/fake_upstream.py.
+"""
+import http.client
+import json
+import threading
+import pytest
+import parsing.python
+from benchmarks.fake_upstream import FakeUpstream
+from instrumentation import Recorder
+from main import parse_arguments
+from models.dependency import LOOKUP_FAILED
+from service import AnalysisService, make_server
+
+
+@pytest.fixture(scope="module")
+def upstream():
+    with FakeUpstream() as upstream:
+        yield upstream
+
+
+@pytest.fixture
+def root(tmp_path):
+    checkout = tmp_path / "root" / "checkout"
+    checkout.mkdir(parents=True)
+    (checkout / "requirements.txt").write_text("alpha==1.0.0\n")
+    (tmp_path / "outside").mkdir()
+    (tmp_path / "outside" / "requirements.txt").write_text("beta==1.0.0\n")
+    return tmp_path / "root"
+
+
+@pytest.fixture
+def connect(root, tmp_path, monkeypatch):
+    servers = []
+
+    def connect(*extra):
+        monkeypatch.delenv("GITHUB_TOKEN", raising=False)
+        args = parse_arguments(["--serve", "0", "--no-cache", "--workers", "1"] + list(extra))
+        service = AnalysisService(args, workers=1).start()
+        server = make_server(service)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append((server, service))
+        return service, lambda: http.client.HTTPConnection(*server.server_address[:2], timeout=30)
+
+    yield connect
+    for server, service in servers:
+        server.shutdown()
+        server.server_close()
+        service.stop()
+
+
+def request(connection, method, path, body=None, headers=None):
+    connection.request(method, path, body=body, headers=headers or {})
+    response = connection.getresponse()
+    return response.status, json.loads(response.read() or b"null")
+
+
+def run_job(connection, body):
+    status, job = request(connection, "POST", "/jobs", json.dumps(body))
+    assert status == 202, job
+    return request(connection, "GET", f"/jobs/{job['id']}?wait=30")[1]
+
+
+def test_malformed_content_length_is_rejected(connect):
+    _, connection = connect()
+    connection = connection()
+    connection.putrequest("POST", "/jobs")
+    connection.putheader("Content-Length", "lots")
+    connection.endheaders()
+    response = connection.getresponse()
+    assert response.status == 400
+    assert json.loads(response.read()) == {"error": "Invalid Content-Length"}
+
+
+def test_local_paths_need_a_root(connect, root):
+    _, connection = connect()
+    status, body = request(connection(), "POST", "/jobs", json.dumps({"repo": str(root / "checkout")}))
+    assert status == 400 and "--serve-root" in body["error"]
+
+
+def test_local_paths_must_be_under_the_root(connect, root):
+    _, connection = connect("--serve-root", str(root))
+    for repo in ("/", str(root.parent / "outside"), "../outside"):
+        status, body = request(connection(), "POST", "/jobs", json.dumps({"repo": repo}))
+        assert status == 400, repo
+
+
+def test_each_job_gets_fresh_parser_state(connect, root, upstream, monkeypatch):
+    _, connection = connect("--serve-root", str(root))
+    monkeypatch.setattr(parsing.python, "PYPI_URL", upstream.url("pypi") + "/down/{package}/json")
+    job = run_job(connection(), {"repo": "checkout"})
+    assert job["status"] == "done"
+    assert job["repo"] == str((root / "checkout").resolve())
+    assert job["result"]["projects"][0]["dependencies"][0]["license"] == LOOKUP_FAILED
+
+    monkeypatch.setattr(parsing.python, "PYPI_URL", upstream.url("pypi") + "/pypi/{package}/json")
+    job = run_job(connection(), {"repo": "checkout"})
+    assert job["result"]["projects"][0]["dependencies"][0]["license"] not in (LOOKUP_FAILED, "Unknown", None)
+
+
+def test_recorder_keeps_the_last_spans_when_limited():
+    recorder = Recorder()
+    recorder.enable("service")
+    recorder.limit(10)
+    for number in range(25):
+        with recorder.span(f"job {number}"):
+            pass
+    assert [span[0] for span in recorder.spans] == [f"job {number}" for number in range(15, 25)]
+    assert recorder.dropped == 15
+    assert "15 earlier ones were dropped" in recorder.summary()[0]
@@ -0,0 +1,120 @@
+"""
+Transport against the fake upstream from benchmarks/fake_upstream.py, with
+scripted 429/503 answers and rate-limit headers.
+"""
+import threading
+import time
+import pytest
+from benchmarks.fake_upstream import FakeUpstream
+from transport import TokenBucket, Transport
+
+
+@pytest.fixture(scope="module")
+def shared_upstream():
+    with FakeUpstream() as upstream:
+        yield upstream
+
+
+@pytest.fixture
+def upstream(shared_upstream):
+    shared_upstream.reset_stats()
+    return shared_upstream
+
+
+@pytest.fixture
+def transport():
+    transport = Transport(pool_size=4)
+    yield transport
+    transport.close()
+
+
+def host(upstream, service):
+    return upstream.url(service).split("://", 1)[1]
+
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_retries_after_the_delay_the_server_asks_for(upstream, transport, status):
+    upstream.script("npm", (status, {"Retry-After": "1"}))
+
+    start = time.monotonic()
+    response = transport.get(upstream.url("npm") + "/left-pad")
+    elapsed = time.monotonic() - start
+
+    assert response.status_code == 200
+    assert response.json()["name"] == "left-pad"
+    assert 0.9 <= elapsed < 3
+    assert upstream.stats()["npm"]["statuses"] == {status: 1, 200: 1}
+    stats = transport.stats()[host(upstream, "npm")]
+    assert stats["retries"] == 1
+    assert stats["statuses"] == {status: 1, 200: 1}
+
+
+def test_exhausted_rate_limit_blocks_until_the_reset(upstream, transport):
+    reset = time.time() + 1
+    upstream.script("github", (None, {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": str(reset)}))
+    url = upstream.url("github") + "/rate_limit"
+
+    transport.get(url)
+    transport.get(url)
+
+    assert time.time() >= reset
+    stats = transport.stats()[host(upstream, "github")]
+    assert stats["requests"] == 2
+    assert stats["retries"] == 0
+    assert stats["throttled"] == 1
+    assert 0.5 < stats["throttle_wait"] < 2
+
+
+def test_low_rate_limit_paces_requests_over_the_window(upstream, transport):
+    # 16 requests left in an 8 second window: two per second.
+    headers = {"X-RateLimit-Remaining": "16", "X-RateLimit-Reset": str(time.time() + 8)}
+    upstream.script("npm", *[(None, headers)] * 5)
+
+    start = time.monotonic()
+    for _ in range(5):
+        transport.get(upstream.url("npm") + "/left-pad")
+    elapsed = time.monotonic() - start
+
+    # The first request sets the rate and the second uses the bucket's one
+    # token; the other three wait about half a second each.
+    assert 1.2 <= elapsed < 3
+    assert transport.stats()[host(upstream, "npm")]["throttled"] == 3
+
+
+def test_token_bucket_paces_to_its_rate():
+    bucket = TokenBucket(rate=20)
+
+    start = time.monotonic()
+    for _ in range(21):
+        bucket.acquire()
+    elapsed = time.monotonic() - start
+
+    assert 0.9 <= elapsed < 1.5
+
+
+def test_connections_are_reused_per_host(upstream, transport):
+    for number in range(20):
+        transport.get(upstream.url("npm") + f"/package-{number}")
+        transport.get(upstream.url("pypi") + f"/pypi/package-{number}/json")
+
+    stats = upstream.stats()
+    assert sum(stats["npm"]["statuses"].values()) == sum(stats["pypi"]["statuses"].values()) == 20
+    assert stats["npm"]["connections"] == stats["pypi"]["connections"] == 1
+    assert transport.stats()[host(upstream, "npm")]["connections"] == 1
+    assert transport.stats()[host(upstream, "pypi")]["connections"] == 1
+
+
+def test_concurrent_requests_share_the_pool(upstream, transport):
+    def fetch(start):
+        for number in range(start, start + 10):
+            transport.get(upstream.url("npm") + f"/package-{number}")
+
+    threads = [threading.Thread(target=fetch, args=(start * 10,)) for start in range(transport.pool_size)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = upstream.stats()["npm"]
+    assert sum(stats["statuses"].values()) == 10 * transport.pool_size
+    assert stats["connections"] <= transport.pool_size
@@ -0,0 +1,244 @@
+import logging
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from instrumentation import recorder
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Per-host throttle.
+
+    With no ``rate`` the bucket only enforces explicit blocks, e.g. until a
+    rate-limit window resets. Once a rate is set, callers are paced to it.
+    """
+
+    def __init__(self, rate=None, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.blocked_until = 0
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        waited = 0
+        while True:
+            with self._lock:
+                now = time.time()
+                delay = self.blocked_until - now
+                if delay <= 0:
+                    if self.rate is None:
+                        return waited
+                    self._refill()
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return waited
+                    delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def block_until(self, timestamp):
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, timestamp)
+
+    def set_rate(self, rate):
+        with self._lock:
+            self._refill()
+            self.rate = rate
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.rate is not None:
+            self.tokens = min(self.capacity, self.tokens + (now - self._last) * self.rate)
+        self._last = now
+
+
+class HostStats:
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0
+        self.throttle_wait = 0.0
+        self.statuses = {}
+
+    def as_dict(self):
+        return {
+            'requests': self.requests,
+            'retries': self.retries,
+            'throttled': self.throttled,
+            'throttle_wait': round(self.throttle_wait, 3),
+            'statuses': dict(self.statuses),
+        }
+
+
+class Transport:
+    """
+    Shared HTTP transport with one keep-alive session pool per host.
+
+    Failed requests (connection errors, 429 and 5xx) are retried with
+    jittered exponential backoff, honouring ``Retry-After``. GitHub-style
+    ``X-RateLimit-Remaining`` / ``X-RateLimit-Reset`` headers feed a
+    per-host token bucket. When the remaining budget runs low, requests are
+    spread over the rest of the window, and they stop entirely at zero.
+    """
+
+    def __init__(self, pool_size=16, max_retries=4, backoff_factor=0.5, max_backoff=60,
+                 timeout=30, low_watermark=50):
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.low_watermark = low_watermark
+        self._sessions = {}
+        self._buckets = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def request(self, method, url, **kwargs):
+        host = urlparse(url).netloc
+        session, bucket, stats = self._host_state(host)
+        kwargs.setdefault('timeout', self.timeout)
+
+        attempt = 0
+        while True:
+            waited = bucket.acquire()
+            with self._lock:
+                stats.requests += 1
+                if waited:
+                    stats.throttled += 1
+                    stats.throttle_wait += waited
+            if waited:
+                recorder.count("throttle_wait", host, amount=waited)
+
+            try:
+                with recorder.span(host, "http", method=method, url=url, attempt=attempt) as span:
+                    response = session.request(method, url, **kwargs)
+                    span.set('status', response.status_code)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                recorder.count("http", host, type(e).__name__)
+                if attempt >= self.max_retries:
+                    raise
+                logger.debug("%s %s failed, retrying: %s", method, url, e)
+                self._retry(host, stats, self._backoff(attempt))
+                attempt += 1
+                continue
+
+            with self._lock:
+                stats.statuses[response.status_code] = stats.statuses.get(response.status_code, 0) + 1
+            recorder.count("http", host, response.status_code)
+            self._observe_rate_limit(bucket, response)
+
+            if not self._should_retry(response) or attempt >= self.max_retries:
+                return response
+
+            delay = self._retry_after(response)
+            response.close()
+            logger.debug("%s %s answered %s, retrying", method, url, response.status_code)
+            if delay is None:
+                self._retry(host, stats, self._backoff(attempt))
+            else:
+                # Retry-After applies to the whole host, not just this request.
+                bucket.block_until(time.time() + delay)
+                self._retry(host, stats, 0)
+            attempt += 1
+
+    def stats(self):
+        with self._lock:
+            result = {}
+            for host, stats in self._stats.items():
+                host_stats = stats.as_dict()
+                host_stats['connections'] = self._connections_opened(self._sessions[host])
+                result[host] = host_stats
+            return result
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+
+    def _host_state(self, host):
+        with self._lock:
+            if host not in self._sessions:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                self._sessions[host] = session
+                self._buckets[host] = TokenBucket()
+                self._stats[host] = HostStats()
+            return self._sessions[host], self._buckets[host], self._stats[host]
+
+    def _retry(self, host, stats, delay):
+        with self._lock:
+            stats.retries += 1
+        recorder.count("retry", host)
+        time.sleep(delay)
+
+    def _backoff(self, attempt):
+        return random.uniform(0, min(self.max_backoff, self.backoff_factor * (2 ** attempt)))
+
+    @staticmethod
+    def _should_retry(response):
+        if response.status_code in RETRY_STATUSES:
+            return True
+        return response.status_code == 403 and response.headers.get('X-RateLimit-Remaining') == '0'
+
+    def _retry_after(self, response):
+        value = response.headers.get('Retry-After')
+        if value is None:
+            if response.headers.get('X-RateLimit-Remaining') == '0':
+                # The bucket is already blocked until the reset.
+                return 0
+            return None
+        try:
+            delay = float(value)
+        except ValueError:
+            try:
+                delay = parsedate_to_datetime(value).timestamp() - time.time()
+            except (TypeError, ValueError):
+                return None
+        return max(0, delay)
+
+    def _observe_rate_limit(self, bucket, response):
+        remaining = response.headers.get('X-RateLimit-Remaining')
+        reset = response.headers.get('X-RateLimit-Reset')
+        if remaining is None or reset is None:
+            return
+        try:
+            remaining = int(remaining)
+            reset = float(reset)
+        except ValueError:
+            return
+
+        if remaining <= 0:
+            logger.warning("Rate limit exhausted for %s, waiting %ss for the window to reset",
+                           urlparse(response.url).netloc, max(0, int(reset - time.time())))
+            bucket.block_until(reset)
+            bucket.set_rate(None)
+        elif remaining < self.low_watermark:
+            bucket.set_rate(remaining / max(reset - time.time(), 1))
+        else:
+            bucket.set_rate(None)
+
+    @staticmethod
+    def _connections_opened(session):
+        opened = 0
+        for adapter in set(session.adapters.values()):
+            for key in adapter.poolmanager.pools.keys():
+                pool = adapter.poolmanager.pools.get(key)
+                if pool is not None:
+                    opened += pool.num_connections
+        return opened